@@ -2,5 +2,6 @@
 
 from app.api.connector import router as connector_router
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
 
-__all__ = ["connector_router", "health_router"]
+__all__ = ["connector_router", "health_router", "metrics_router"]
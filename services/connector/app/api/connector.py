@@ -9,6 +9,7 @@ from fastapi import APIRouter, HTTPException, status
 from app.config import settings
 from app.connectors.executor import ConnectorExecutor
 from app.models import ToolCallRequest, ToolCallResponse, ConnectorBindingInfo
+from app.tracing import TracingTransport
 from app.vault.client import vault_client
 
 logger = structlog.get_logger()
@@ -140,7 +141,10 @@ async def _get_connector_binding(
     url = f"{settings.control_plane_url}/api/v1/connectors/bindings/{binding_id}"
 
     try:
-        async with httpx.AsyncClient(timeout=settings.control_plane_timeout) as client:
+        async with httpx.AsyncClient(
+            timeout=settings.control_plane_timeout,
+            transport=TracingTransport("control-plane"),
+        ) as client:
             response = await client.get(
                 url,
                 params={"org_id": org_id, "project_id": project_id},
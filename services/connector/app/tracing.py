@@ -0,0 +1,143 @@
+"""Distributed tracing with W3C trace context (OpenTelemetry).
+
+Continues the caller's trace (server span per request) and propagates it to
+the Control Plane and Vault with a client span per call. External API calls
+made by connectors are not traced, so trace context never leaves the
+platform.
+
+Spans are exported by the exporter named in ``tracing_exporter``: ``none``
+(trace context is still propagated), ``file`` (JSON lines in
+``tracing_file_path``) or ``otlp`` (OTLP/HTTP to ``tracing_otlp_endpoint``).
+"""
+
+import os
+
+import httpx
+import structlog
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.config import settings
+
+logger = structlog.get_logger()
+
+SERVICE_NAME = "cmp-connector"
+
+tracer = trace.get_tracer(SERVICE_NAME)
+
+_provider: TracerProvider | None = None
+
+
+def create_exporter(name: str) -> SpanExporter | None:
+    """Create the span exporter called ``name``."""
+    if name == "none":
+        return None
+    if name == "file":
+        out = open(settings.tracing_file_path, "a")
+        return ConsoleSpanExporter(
+            out=out,
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    raise ValueError(f"Unknown tracing exporter: {name}")
+
+
+def setup_tracing() -> None:
+    """Install the tracer provider for the configured exporter."""
+    global _provider
+
+    exporter = create_exporter(settings.tracing_exporter)
+    if exporter is None or _provider is not None:
+        return
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info("Tracing enabled", exporter=settings.tracing_exporter)
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop span export."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+class TracingMiddleware:
+    """ASGI middleware continuing the caller's trace with a server span.
+
+    The span stays open until a streamed response has been fully sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        method = scope["method"]
+
+        with tracer.start_as_current_span(
+            f"{method} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as span:
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    span.set_attribute("http.response.status_code", status_code)
+                    if status_code >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+class TracingTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport adding a client span and trace context to each request."""
+
+    def __init__(self, peer: str, **kwargs):
+        super().__init__(**kwargs)
+        self.peer = peer
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        span = tracer.start_span(
+            f"{request.method} {self.peer}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "http.request.method": request.method,
+                "url.full": str(request.url),
+                "peer.service": self.peer,
+            },
+        )
+        propagate.inject(request.headers, context=trace.set_span_in_context(span))
+
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, type(e).__name__))
+            span.end()
+            raise
+
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        # Streamed responses are still being read; the span covers the
+        # time to response headers
+        span.end()
+        return response
+
@@ -10,6 +10,7 @@ import httpx
 import structlog
 
 from app.config import settings
+from app.tracing import TracingTransport
 
 logger = structlog.get_logger()
 
@@ -45,7 +46,7 @@ class VaultClient:
             # Authenticate with Vault
             auth_url = f"{settings.vault_addr}/v1/{settings.vault_mount_path}/login"
 
-            async with httpx.AsyncClient(timeout=10) as client:
+            async with httpx.AsyncClient(timeout=10, transport=TracingTransport("vault")) as client:
                 response = await client.post(
                     auth_url,
                     json={
@@ -106,7 +107,7 @@ class VaultClient:
         full_path = f"{settings.vault_addr}/v1/{path}"
 
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
+            async with httpx.AsyncClient(timeout=10, transport=TracingTransport("vault")) as client:
                 response = await client.get(
                     full_path,
                     headers={"X-Vault-Token": token},
@@ -131,7 +132,7 @@ class VaultClient:
     async def check_health(self) -> bool:
         """Check if Vault is healthy and accessible."""
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
+            async with httpx.AsyncClient(timeout=5, transport=TracingTransport("vault")) as client:
                 response = await client.get(f"{settings.vault_addr}/v1/sys/health")
                 # Vault returns 200 for initialized+unsealed, 429 for standby
                 return response.status_code in (200, 429)
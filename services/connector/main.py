@@ -19,8 +19,10 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.api import connector_router, health_router
+from app.api import connector_router, health_router, metrics_router
 from app.config import settings
+from app.loop_monitor import LoadSheddingMiddleware, loop_monitor
+from app.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
 
 # Configure structured logging
 structlog.configure(
@@ -66,6 +68,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject new requests with 503 while the event loop lags
+app.add_middleware(LoadSheddingMiddleware)
+
+# Continue the caller's trace for every request
+app.add_middleware(TracingMiddleware)
+
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -85,6 +93,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.on_event("startup")
 async def startup():
     """Initialize service on startup."""
+    setup_tracing()
+    loop_monitor.start()
     logger.info(
         "Connector Gateway starting...",
         vault_addr=settings.vault_addr,
@@ -97,11 +107,14 @@ async def startup():
 async def shutdown():
     """Cleanup on shutdown."""
     logger.info("Connector Gateway shutting down...")
+    await loop_monitor.aclose()
+    shutdown_tracing()
 
 
 # Include routers
 app.include_router(health_router)
 app.include_router(connector_router)
+app.include_router(metrics_router)
 
 
 if __name__ == "__main__":
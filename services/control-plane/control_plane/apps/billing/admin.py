@@ -22,7 +22,15 @@ class LedgerEntryAdmin(admin.ModelAdmin):
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
-    list_display = ["wallet", "instance", "amount", "status", "created_at", "settled_at"]
+    list_display = [
+        "wallet",
+        "instance",
+        "amount",
+        "status",
+        "created_at",
+        "expires_at",
+        "settled_at",
+    ]
     list_filter = ["status"]
     search_fields = ["wallet__organization__name"]
     readonly_fields = ["id", "created_at", "settled_at"]
@@ -2,9 +2,22 @@
 
 from django.urls import path
 
-from .views import BillingAuthorizeView, BillingSettleView
+from .views import (
+    BillingAuthorizeView,
+    BillingLeaseReleaseView,
+    BillingLeaseView,
+    BillingSettleBatchView,
+    BillingSettleView,
+)
 
 urlpatterns = [
     path("authorize", BillingAuthorizeView.as_view(), name="billing-authorize"),
     path("settle", BillingSettleView.as_view(), name="billing-settle"),
+    path("settle:batch", BillingSettleBatchView.as_view(), name="billing-settle-batch"),
+    path("leases", BillingLeaseView.as_view(), name="billing-lease"),
+    path(
+        "leases/<uuid:lease_id>/release",
+        BillingLeaseReleaseView.as_view(),
+        name="billing-lease-release",
+    ),
 ]
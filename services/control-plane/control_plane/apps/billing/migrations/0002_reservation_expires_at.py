@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -83,6 +83,11 @@ class Reservation(models.Model):
     A reservation holds credits for a pending operation.
 
     Created when authorizing a run, settled when complete.
+
+    A reservation with ``expires_at`` set is a credit lease: a block of
+    credits held by a gateway instance, which authorizes runs against it
+    locally and releases it with the usage of every run it covered. Expired
+    leases stop counting against the wallet's available balance.
     """
 
     class Status(models.TextChoices):
@@ -108,6 +113,7 @@ class Reservation(models.Model):
         choices=Status.choices,
         default=Status.PENDING,
     )
+    expires_at = models.DateTimeField(null=True, blank=True)  # Set for leases
     created_at = models.DateTimeField(auto_now_add=True)
     settled_at = models.DateTimeField(null=True, blank=True)
 
@@ -116,3 +122,8 @@ class Reservation(models.Model):
 
     def __str__(self):
         return f"Reservation({self.amount} {self.status})"
+
+    @property
+    def is_lease(self) -> bool:
+        """Whether this reservation is a gateway credit lease."""
+        return self.expires_at is not None
@@ -62,6 +62,9 @@ class BillingSettleRequestSerializer(serializers.Serializer):
     reservation_id = serializers.UUIDField()
     instance_id = serializers.UUIDField()
     usage = serializers.DictField(child=serializers.IntegerField(min_value=0), required=False)
+    # False releases the reservation without a debit (the run failed or
+    # never reached the Runner)
+    billable = serializers.BooleanField(default=True)
 
 
 class BillingSettleResponseSerializer(serializers.Serializer):
@@ -69,5 +72,55 @@ class BillingSettleResponseSerializer(serializers.Serializer):
 
     debited = serializers.IntegerField()
     balance = serializers.IntegerField()
-    ledger_entry_id = serializers.UUIDField()
-    status = serializers.ChoiceField(choices=["settled", "pending_reconciliation"])
+    ledger_entry_id = serializers.UUIDField(allow_null=True)
+    status = serializers.ChoiceField(choices=["settled", "cancelled", "pending_reconciliation"])
+
+
+class BillingSettleBatchRequestSerializer(serializers.Serializer):
+    """Serializer for bulk billing settle request."""
+
+    settlements = BillingSettleRequestSerializer(many=True, allow_empty=False)
+
+
+class BillingSettleBatchResultSerializer(serializers.Serializer):
+    """Serializer for one result of a bulk billing settle."""
+
+    reservation_id = serializers.UUIDField()
+    debited = serializers.IntegerField()
+    balance = serializers.IntegerField()
+    ledger_entry_id = serializers.UUIDField(allow_null=True)
+    status = serializers.ChoiceField(choices=["settled", "cancelled", "not_found"])
+
+
+class BillingSettleBatchResponseSerializer(serializers.Serializer):
+    """Serializer for bulk billing settle response."""
+
+    results = BillingSettleBatchResultSerializer(many=True)
+
+
+class BillingLeaseRequestSerializer(serializers.Serializer):
+    """Serializer for credit lease request."""
+
+    instance_id = serializers.UUIDField()
+    requested_amount = serializers.IntegerField(min_value=1)
+    ttl_seconds = serializers.IntegerField(min_value=1, default=60)
+
+
+class BillingLeaseResponseSerializer(serializers.Serializer):
+    """Serializer for credit lease response."""
+
+    allowed = serializers.BooleanField()
+    lease_id = serializers.CharField(allow_blank=True)
+    amount = serializers.IntegerField()
+    balance = serializers.IntegerField()
+    expires_at = serializers.DateTimeField(allow_null=True)
+
+
+class BillingLeaseReleaseRequestSerializer(serializers.Serializer):
+    """Serializer for credit lease release request."""
+
+    usages = serializers.ListField(
+        child=serializers.DictField(child=serializers.IntegerField(min_value=0)),
+        required=False,
+        default=list,
+    )
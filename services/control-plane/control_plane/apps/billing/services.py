@@ -2,9 +2,11 @@
 
 import logging
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Optional
 
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from control_plane.apps.instances.models import Instance
@@ -17,6 +19,10 @@ logger = logging.getLogger(__name__)
 # Default budget per run if not specified
 DEFAULT_RUN_BUDGET = 10
 
+# Bounds for gateway credit leases
+MAX_LEASE_AMOUNT = 10000
+MAX_LEASE_TTL_SECONDS = 600
+
 
 @dataclass
 class AuthorizeResult:
@@ -38,6 +44,17 @@ class SettleResult:
     status: str
 
 
+@dataclass
+class LeaseResult:
+    """Result of lease acquisition."""
+
+    allowed: bool
+    lease_id: str
+    amount: int
+    balance: int
+    expires_at: Optional[datetime]
+
+
 class BillingService:
     """Service for billing operations."""
 
@@ -67,13 +84,7 @@ class BillingService:
         budget = requested_budget if requested_budget > 0 else DEFAULT_RUN_BUDGET
 
         # Check balance
-        # Available = balance - pending reservations
-        pending_reservations = Reservation.objects.filter(
-            wallet=wallet,
-            status=Reservation.Status.PENDING,
-        ).aggregate(total=models.Sum("amount"))["total"] or 0
-
-        available = wallet.balance - pending_reservations
+        available = cls._available_credits(wallet)
 
         if available < budget:
             logger.warning(
@@ -121,11 +132,14 @@ class BillingService:
         reservation_id: str,
         instance_id: str,
         usage: Optional[dict] = None,
+        billable: bool = True,
     ) -> SettleResult:
         """
         Settle a reservation and debit actual usage.
 
-        Calculates credit cost based on usage metrics.
+        Calculates credit cost based on usage metrics. Runs that are not
+        billable (failed, or never reached the Runner) release the
+        reservation without a debit or ledger entry.
         """
         # Get reservation
         try:
@@ -146,7 +160,19 @@ class BillingService:
                 debited=0,
                 balance=reservation.wallet.balance,
                 ledger_entry_id=str(ledger_entry.id) if ledger_entry else "",
-                status="settled",
+                status=cls._settled_status(reservation),
+            )
+
+        if not billable:
+            reservation.status = Reservation.Status.CANCELLED
+            reservation.settled_at = timezone.now()
+            reservation.save()
+            logger.info(f"Released reservation {reservation_id} without a debit")
+            return SettleResult(
+                debited=0,
+                balance=reservation.wallet.balance,
+                ledger_entry_id="",
+                status="cancelled",
             )
 
         # Calculate credit cost from usage
@@ -189,6 +215,271 @@ class BillingService:
             status="settled",
         )
 
+    @classmethod
+    @transaction.atomic
+    def settle_batch(cls, settlements: list[dict]) -> list[SettleResult]:
+        """
+        Settle many reservations in one transaction.
+
+        Each item is {"reservation_id", "instance_id", "usage", "billable"}
+        and is priced (or released) exactly as settle() would do it.
+        Unknown reservations are reported with status "not_found" instead
+        of failing the batch, and already-settled ones are idempotent no-ops.
+
+        Returns one result per item, in order.
+        """
+        reservation_ids = {str(item["reservation_id"]) for item in settlements}
+        # Lock the reservations (in a stable order) before checking their
+        # status, so a replayed or retried batch racing this one waits and
+        # then sees them settled instead of debiting them again
+        reservations = {
+            str(reservation.id): reservation
+            for reservation in Reservation.objects.select_for_update()
+            .filter(id__in=reservation_ids)
+            .order_by("id")
+        }
+
+        # Lock every affected wallet once, in a stable order
+        wallet_ids = sorted({reservation.wallet_id for reservation in reservations.values()})
+        wallets = {
+            wallet.id: wallet
+            for wallet in Wallet.objects.select_for_update().filter(id__in=wallet_ids).order_by("id")
+        }
+        existing_entries = {
+            entry.reference_id: entry
+            for entry in LedgerEntry.objects.filter(reference_id__in=reservation_ids)
+        }
+
+        now = timezone.now()
+        outcomes: list[tuple[Optional[Reservation], int, Optional[LedgerEntry], str]] = []
+        new_entries: list[LedgerEntry] = []
+        settled: list[Reservation] = []
+
+        for item in settlements:
+            reservation_id = str(item["reservation_id"])
+            reservation = reservations.get(reservation_id)
+
+            if reservation is None:
+                outcomes.append((None, 0, None, "not_found"))
+                continue
+
+            if (
+                reservation.status != Reservation.Status.PENDING
+                or reservation_id in existing_entries
+            ):
+                # Already settled (possibly earlier in this batch)
+                outcomes.append((
+                    reservation,
+                    0,
+                    existing_entries.get(reservation_id),
+                    cls._settled_status(reservation),
+                ))
+                continue
+
+            if not item.get("billable", True):
+                reservation.status = Reservation.Status.CANCELLED
+                reservation.settled_at = now
+                settled.append(reservation)
+                outcomes.append((reservation, 0, None, "cancelled"))
+                continue
+
+            usage = item.get("usage") or {}
+            debited = min(cls._calculate_credit_cost(usage), reservation.amount)
+            wallet = wallets[reservation.wallet_id]
+            wallet.balance -= debited
+            wallet.updated_at = now
+
+            ledger_entry = LedgerEntry(
+                wallet_id=reservation.wallet_id,
+                amount=-debited,
+                entry_type=LedgerEntry.EntryType.USAGE,
+                reference_id=reservation_id,
+                instance_id=reservation.instance_id,
+                metadata={"usage": usage},
+            )
+            new_entries.append(ledger_entry)
+            existing_entries[reservation_id] = ledger_entry
+
+            reservation.status = Reservation.Status.SETTLED
+            reservation.settled_at = now
+            settled.append(reservation)
+
+            outcomes.append((reservation, debited, ledger_entry, "settled"))
+
+        LedgerEntry.objects.bulk_create(new_entries)
+        Reservation.objects.bulk_update(settled, ["status", "settled_at"])
+        Wallet.objects.bulk_update(
+            [wallets[reservation.wallet_id] for reservation in settled],
+            ["balance", "updated_at"],
+        )
+
+        logger.info(
+            f"Settled batch of {len(settlements)}: "
+            f"{len(settled)} settled or cancelled, "
+            f"{sum(1 for o in outcomes if o[3] == 'not_found')} not found"
+        )
+
+        return [
+            SettleResult(
+                debited=debited,
+                balance=wallets[reservation.wallet_id].balance if reservation else 0,
+                ledger_entry_id=str(ledger_entry.id) if ledger_entry else "",
+                status=outcome_status,
+            )
+            for reservation, debited, ledger_entry, outcome_status in outcomes
+        ]
+
+    @classmethod
+    @transaction.atomic
+    def acquire_lease(
+        cls,
+        instance_id: str,
+        requested_amount: int,
+        ttl_seconds: int,
+    ) -> LeaseResult:
+        """
+        Lease a block of credits to a gateway for local run authorization.
+
+        Grants up to the requested amount (less if the wallet cannot cover
+        it, but never less than one run's default budget).
+        """
+        try:
+            instance = Instance.objects.select_related(
+                "organization__wallet"
+            ).get(id=instance_id)
+        except Instance.DoesNotExist:
+            raise ResourceNotFoundError(f"Instance {instance_id} not found")
+
+        # Lock the wallet so concurrent leases cannot oversubscribe it
+        wallet = Wallet.objects.select_for_update().get(id=instance.organization.wallet.id)
+
+        available = cls._available_credits(wallet)
+        amount = min(requested_amount, MAX_LEASE_AMOUNT, available)
+
+        if amount < DEFAULT_RUN_BUDGET:
+            logger.warning(
+                f"Insufficient credits to lease for instance {instance_id}: "
+                f"available={available}, requested={requested_amount}"
+            )
+            return LeaseResult(
+                allowed=False,
+                lease_id="",
+                amount=0,
+                balance=wallet.balance,
+                expires_at=None,
+            )
+
+        ttl = min(max(ttl_seconds, 1), MAX_LEASE_TTL_SECONDS)
+        reservation = Reservation.objects.create(
+            wallet=wallet,
+            instance=instance,
+            amount=amount,
+            status=Reservation.Status.PENDING,
+            expires_at=timezone.now() + timedelta(seconds=ttl),
+        )
+
+        logger.info(
+            f"Leased credits for instance {instance_id}: "
+            f"lease={reservation.id}, amount={amount}, ttl={ttl}s"
+        )
+
+        return LeaseResult(
+            allowed=True,
+            lease_id=str(reservation.id),
+            amount=amount,
+            balance=wallet.balance,
+            expires_at=reservation.expires_at,
+        )
+
+    @classmethod
+    @transaction.atomic
+    def release_lease(
+        cls,
+        lease_id: str,
+        usages: Optional[list[dict]] = None,
+    ) -> SettleResult:
+        """
+        Release a credit lease, debiting the usage of the runs it covered.
+
+        Each run is priced individually, exactly as if it had been settled
+        on its own; the total is capped at the leased amount and the
+        remainder returns to the wallet's available balance.
+        """
+        # Lock the lease before checking its status, so concurrent releases
+        # (the gateway retries them) debit it once
+        try:
+            reservation = Reservation.objects.select_for_update().get(
+                id=lease_id, expires_at__isnull=False
+            )
+        except Reservation.DoesNotExist:
+            raise ResourceNotFoundError(f"Lease {lease_id} not found")
+
+        wallet = Wallet.objects.select_for_update().get(id=reservation.wallet_id)
+
+        if reservation.status != Reservation.Status.PENDING:
+            logger.info(f"Lease {lease_id} already released")
+            ledger_entry = LedgerEntry.objects.filter(reference_id=str(lease_id)).first()
+            return SettleResult(
+                debited=0,
+                balance=wallet.balance,
+                ledger_entry_id=str(ledger_entry.id) if ledger_entry else "",
+                status="settled",
+            )
+
+        usages = usages or []
+        debited = sum(cls._calculate_credit_cost(usage) for usage in usages)
+        debited = min(debited, reservation.amount)
+
+        wallet.balance -= debited
+        wallet.save()
+
+        ledger_entry = LedgerEntry.objects.create(
+            wallet=wallet,
+            amount=-debited,
+            entry_type=LedgerEntry.EntryType.USAGE,
+            reference_id=str(lease_id),
+            instance_id=reservation.instance_id,
+            metadata={"lease": True, "runs": len(usages)},
+        )
+
+        reservation.status = Reservation.Status.SETTLED
+        reservation.settled_at = timezone.now()
+        reservation.save()
+
+        logger.info(
+            f"Released lease {lease_id}: runs={len(usages)}, "
+            f"debited={debited}, returned={reservation.amount - debited}"
+        )
+
+        return SettleResult(
+            debited=debited,
+            balance=wallet.balance,
+            ledger_entry_id=str(ledger_entry.id),
+            status="settled",
+        )
+
+    @classmethod
+    def _settled_status(cls, reservation: Reservation) -> str:
+        """Settlement status reported again for a reservation that is no longer pending."""
+        if reservation.status == Reservation.Status.CANCELLED:
+            return "cancelled"
+        return "settled"
+
+    @classmethod
+    def _available_credits(cls, wallet: Wallet) -> int:
+        """
+        Available = balance - pending reservations.
+
+        Leases past their expiry no longer hold credits.
+        """
+        pending_reservations = Reservation.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+            wallet=wallet,
+            status=Reservation.Status.PENDING,
+        ).aggregate(total=models.Sum("amount"))["total"] or 0
+
+        return wallet.balance - pending_reservations
+
     @classmethod
     def _calculate_credit_cost(cls, usage: dict) -> int:
         """
@@ -13,6 +13,11 @@ from .models import Wallet
 from .serializers import (
     BillingAuthorizeRequestSerializer,
     BillingAuthorizeResponseSerializer,
+    BillingLeaseReleaseRequestSerializer,
+    BillingLeaseRequestSerializer,
+    BillingLeaseResponseSerializer,
+    BillingSettleBatchRequestSerializer,
+    BillingSettleBatchResponseSerializer,
     BillingSettleRequestSerializer,
     BillingSettleResponseSerializer,
     WalletSerializer,
@@ -130,7 +135,8 @@ class BillingSettleView(APIView):
     """
     POST /billing/settle
 
-    Settle a reservation and debit actual usage.
+    Settle a reservation and debit actual usage, or release it without a
+    debit if the run is not billable.
     """
 
     def post(self, request):
@@ -142,13 +148,107 @@ class BillingSettleView(APIView):
             reservation_id=str(serializer.validated_data["reservation_id"]),
             instance_id=str(serializer.validated_data["instance_id"]),
             usage=serializer.validated_data.get("usage"),
+            billable=serializer.validated_data["billable"],
         )
 
         response_serializer = BillingSettleResponseSerializer(
             {
                 "debited": result.debited,
                 "balance": result.balance,
-                "ledger_entry_id": result.ledger_entry_id,
+                "ledger_entry_id": result.ledger_entry_id or None,
+                "status": result.status,
+            }
+        )
+        return Response(response_serializer.data)
+
+
+class BillingSettleBatchView(APIView):
+    permission_classes = [AllowAny]
+    """
+    POST /billing/settle:batch
+
+    Settle many reservations in one transaction.
+    """
+
+    def post(self, request):
+        """Settle a batch of runs."""
+        serializer = BillingSettleBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        settlements = serializer.validated_data["settlements"]
+        results = BillingService.settle_batch(settlements)
+
+        response_serializer = BillingSettleBatchResponseSerializer(
+            {
+                "results": [
+                    {
+                        "reservation_id": item["reservation_id"],
+                        "debited": result.debited,
+                        "balance": result.balance,
+                        "ledger_entry_id": result.ledger_entry_id or None,
+                        "status": result.status,
+                    }
+                    for item, result in zip(settlements, results)
+                ]
+            }
+        )
+        return Response(response_serializer.data)
+
+
+class BillingLeaseView(APIView):
+    permission_classes = [AllowAny]
+    """
+    POST /billing/leases
+
+    Lease a block of credits to a gateway for local run authorization.
+    """
+
+    def post(self, request):
+        """Acquire a credit lease."""
+        serializer = BillingLeaseRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = BillingService.acquire_lease(
+            instance_id=str(serializer.validated_data["instance_id"]),
+            requested_amount=serializer.validated_data["requested_amount"],
+            ttl_seconds=serializer.validated_data["ttl_seconds"],
+        )
+
+        response_serializer = BillingLeaseResponseSerializer(
+            {
+                "allowed": result.allowed,
+                "lease_id": result.lease_id,
+                "amount": result.amount,
+                "balance": result.balance,
+                "expires_at": result.expires_at,
+            }
+        )
+        return Response(response_serializer.data)
+
+
+class BillingLeaseReleaseView(APIView):
+    permission_classes = [AllowAny]
+    """
+    POST /billing/leases/{lease_id}/release
+
+    Release a credit lease, debiting the usage of the runs it covered.
+    """
+
+    def post(self, request, lease_id):
+        """Release a credit lease."""
+        serializer = BillingLeaseReleaseRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = BillingService.release_lease(
+            lease_id=str(lease_id),
+            usages=serializer.validated_data["usages"],
+        )
+
+        response_serializer = BillingSettleResponseSerializer(
+            {
+                "debited": result.debited,
+                "balance": result.balance,
+                "ledger_entry_id": result.ledger_entry_id or None,
                 "status": result.status,
             }
         )
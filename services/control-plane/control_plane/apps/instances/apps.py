@@ -9,3 +9,6 @@ class InstancesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "control_plane.apps.instances"
     verbose_name = "Instances"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers the signal handlers)
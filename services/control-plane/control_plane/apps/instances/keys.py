@@ -0,0 +1,110 @@
+"""API key format.
+
+Keys are ``cmp_sk_<kid>.<random>.<mac>``: ``mac`` is the HMAC-SHA256 of
+everything before it under the ``api_key_mac_keys`` key named ``kid``,
+truncated to 128 bits. The gateway holds the same keyring, so it rejects
+forged or mistyped keys without calling the Control Plane; only keys
+with a valid MAC are looked up.
+
+Keys issued before the keyring existed are ``cmp_sk_<random>`` (no
+``.``) and carry no MAC; they are still accepted by lookup alone.
+
+Keys are rotated by adding the new key first in ``api_key_mac_keys``.
+Removing a key invalidates every API key it signed. The key and keyring
+formats are the contract shared with the gateway, in
+docs/cmp/19-Integration-Contracts-Pack-v1.md (Appendix B).
+
+The stored display prefix is ``cmp_sk_<kid>.`` plus the first
+``PREFIX_RANDOM_CHARS`` characters of the random part, so keys signed by
+the same key can be told apart. Legacy keys keep their first 12
+characters.
+"""
+
+import base64
+import hashlib
+import hmac
+import re
+import secrets
+from typing import Optional
+
+from django.conf import settings
+
+KEY_PREFIX = "cmp_sk_"
+
+# Bytes of the HMAC-SHA256 kept in the key
+MAC_BYTES = 16
+
+# Key ids embedded in keys (same rule as the gateway's app.auth.keyring)
+KID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,16}")
+
+# Characters of the random part shown in the display prefix
+PREFIX_RANDOM_CHARS = 8
+
+# Display prefix length of legacy (unsigned) keys
+LEGACY_PREFIX_CHARS = 12
+
+
+def parse_keyring(value: str) -> dict[str, bytes]:
+    """Parse ``kid:secret,kid:secret`` into an ordered keyring."""
+    keys: dict[str, bytes] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kid, sep, secret = item.partition(":")
+        if not sep or not secret or not KID_PATTERN.fullmatch(kid):
+            raise ValueError(
+                f"api_key_mac_keys entries must be kid:secret, kid matching {KID_PATTERN.pattern}"
+            )
+        keys[kid] = secret.encode()
+    return keys
+
+
+def _mac(secret: bytes, signed: str) -> str:
+    digest = hmac.new(secret, signed.encode(), hashlib.sha256).digest()[:MAC_BYTES]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def generate_api_key() -> str:
+    """Generate a new API key, signed if a keyring is configured."""
+    keys = parse_keyring(settings.API_KEY_MAC_KEYS)
+    if not keys:
+        return f"{KEY_PREFIX}{secrets.token_urlsafe(32)}"
+
+    kid, secret = next(iter(keys.items()))
+    signed = f"{KEY_PREFIX}{kid}.{secrets.token_urlsafe(24)}"
+    return f"{signed}.{_mac(secret, signed)}"
+
+
+def key_prefix(key: str) -> str:
+    """The part of a key stored and shown to identify it."""
+    if not is_signed(key):
+        return key[:LEGACY_PREFIX_CHARS]
+    kid, _, rest = key[len(KEY_PREFIX):].partition(".")
+    return f"{KEY_PREFIX}{kid}.{rest[:PREFIX_RANDOM_CHARS]}"
+
+
+def is_signed(key: str) -> bool:
+    """Whether a key uses the signed format."""
+    return "." in key
+
+
+def verify_api_key_mac(key: str) -> Optional[str]:
+    """
+    Check the MAC of a signed API key.
+
+    Returns None if the key is valid, else the reason it is not.
+    """
+    if not key.startswith(KEY_PREFIX):
+        return "malformed"
+    signed, _, mac = key.rpartition(".")
+    kid, sep, random_part = signed[len(KEY_PREFIX):].partition(".")
+    if not sep or not kid or not random_part or not mac:
+        return "malformed"
+
+    secret = parse_keyring(settings.API_KEY_MAC_KEYS).get(kid)
+    if secret is None:
+        return "unknown_key"
+    if not hmac.compare_digest(mac, _mac(secret, signed)):
+        return "bad_mac"
+    return None
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instances', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apikey',
+            name='key_prefix',
+            field=models.CharField(max_length=32),
+        ),
+    ]
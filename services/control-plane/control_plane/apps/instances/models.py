@@ -104,7 +104,7 @@ class APIKey(models.Model):
         related_name="api_keys",
     )
     name = models.CharField(max_length=255)
-    key_prefix = models.CharField(max_length=12)  # First 8 chars for display
+    key_prefix = models.CharField(max_length=32)  # Shown to identify the key (see keys.key_prefix)
     key_hash = models.CharField(max_length=64)  # SHA256 hash of full key
     last_used_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField(null=True, blank=True)
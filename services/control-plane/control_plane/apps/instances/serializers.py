@@ -105,6 +105,28 @@ class EntitlementsSerializer(serializers.Serializer):
     )
 
 
+class WidgetConfigSerializer(serializers.Serializer):
+    """Serializer for instance widget configuration."""
+
+    instance_id = serializers.UUIDField()
+    branding = serializers.DictField()
+    allowed_origins = serializers.ListField(
+        child=serializers.CharField()
+    )
+
+
+class PlanLimitsSerializer(serializers.Serializer):
+    """Serializer for the plan tier and limits of an instance."""
+
+    instance_id = serializers.UUIDField()
+    org_id = serializers.UUIDField()
+    plan = serializers.CharField()
+    tier = serializers.CharField()
+    limits = serializers.DictField()
+    offering = serializers.CharField()
+    hedge_runs = serializers.BooleanField()
+
+
 class APIKeyCreateSerializer(serializers.Serializer):
     """Serializer for creating an API key."""
 
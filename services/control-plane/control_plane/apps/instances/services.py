@@ -2,16 +2,17 @@
 
 import hashlib
 import logging
-import secrets
 from dataclasses import dataclass
 from typing import Optional
 
 from django.db import transaction
+from django.utils import timezone
 
 from control_plane.apps.offerings.models import OfferingVersion, Plan
 from control_plane.apps.orgs.models import Membership, Organization, Project
 from control_plane.exceptions import DuplicateResourceError, ResourceNotFoundError
 
+from .keys import KEY_PREFIX, generate_api_key, is_signed, key_prefix, verify_api_key_mac
 from .models import APIKey, Instance
 
 logger = logging.getLogger(__name__)
@@ -117,6 +118,58 @@ class InstanceService:
             "capabilities": capabilities,
         }
 
+    @classmethod
+    def get_widget_config(cls, instance_id: str) -> dict:
+        """
+        Get the widget branding and allowed embedding origins for an instance.
+
+        Read from the "widget" section of the effective config, so offering
+        defaults can be overridden per instance.
+        """
+        try:
+            instance = Instance.objects.only("id", "effective_config").get(id=instance_id)
+        except Instance.DoesNotExist:
+            raise ResourceNotFoundError(f"Instance {instance_id} not found")
+
+        widget = (instance.effective_config or {}).get("widget") or {}
+        return {
+            "instance_id": str(instance.id),
+            "branding": widget.get("branding") or {},
+            "allowed_origins": widget.get("allowed_origins") or [],
+        }
+
+    @classmethod
+    def get_plan_limits(cls, instance_id: str) -> dict:
+        """
+        Get the owning org, plan tier and plan limits of an instance.
+
+        The tier is Plan.limits["tier"], defaulting to the plan slug; the
+        Gateway uses it to weight the instance's runs when scheduling.
+
+        Also returns the offering and whether its runs may be hedged (sent
+        to a second Runner replica when slow), read from the "runs" section
+        of the effective config. Only set "hedge" for cheap, idempotent
+        flows such as FAQ or classification agents.
+        """
+        try:
+            instance = Instance.objects.select_related(
+                "plan", "offering_version__offering"
+            ).get(id=instance_id)
+        except Instance.DoesNotExist:
+            raise ResourceNotFoundError(f"Instance {instance_id} not found")
+
+        limits = instance.plan.limits or {}
+        runs = (instance.effective_config or {}).get("runs") or {}
+        return {
+            "instance_id": str(instance.id),
+            "org_id": str(instance.organization_id),
+            "plan": instance.plan.slug,
+            "tier": limits.get("tier") or instance.plan.slug,
+            "limits": limits,
+            "offering": instance.offering_version.offering.slug,
+            "hedge_runs": bool(runs.get("hedge")),
+        }
+
 
 class APIKeyService:
     """Service for API key operations."""
@@ -134,16 +187,14 @@ class APIKeyService:
 
         Returns the full key (only available on creation).
         """
-        # Generate key: cmp_sk_<random>
-        random_part = secrets.token_urlsafe(32)
-        full_key = f"cmp_sk_{random_part}"
-        key_prefix = full_key[:12]
+        # Generate key: cmp_sk_<kid>.<random>.<mac> (see keys.py)
+        full_key = generate_api_key()
         key_hash = hashlib.sha256(full_key.encode()).hexdigest()
 
         api_key = APIKey.objects.create(
             instance=instance,
             name=name,
-            key_prefix=key_prefix,
+            key_prefix=key_prefix(full_key),
             key_hash=key_hash,
             expires_at=expires_at,
         )
@@ -159,11 +210,17 @@ class APIKeyService:
 
         Returns None if key is invalid.
         """
-        if not key.startswith("cmp_sk_"):
+        if not key.startswith(KEY_PREFIX):
             return None
 
+        # Signed keys with a bad MAC cannot exist; skip the lookup
+        if is_signed(key):
+            reason = verify_api_key_mac(key)
+            if reason is not None:
+                logger.debug(f"Rejected API key: {reason}")
+                return None
+
         key_hash = hashlib.sha256(key.encode()).hexdigest()
-        key_prefix = key[:12]
 
         try:
             api_key = APIKey.objects.select_related(
@@ -171,13 +228,12 @@ class APIKeyService:
                 "instance__offering_version",
             ).get(
                 key_hash=key_hash,
-                key_prefix=key_prefix,
+                key_prefix=key_prefix(key),
                 is_active=True,
             )
 
             # Check expiration
             if api_key.expires_at:
-                from django.utils import timezone
                 if api_key.expires_at < timezone.now():
                     return None
 
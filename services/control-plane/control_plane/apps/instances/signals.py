@@ -0,0 +1,67 @@
+"""Signal handlers keeping Gateway caches in step with instances and API keys.
+
+Only changes to what the Gateway caches are pushed: the widget section of
+an instance's effective config, whether its keys work (instance state) and
+whether a key is active. The values before the save are read in pre_save.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from control_plane import gateway
+
+from .models import APIKey, Instance
+
+
+def _widget_config(effective_config: dict) -> dict:
+    """Widget section of an effective config, as served to the Gateway."""
+    return (effective_config or {}).get("widget") or {}
+
+
+@receiver(pre_save, sender=APIKey)
+def api_key_saving(sender, instance: APIKey, update_fields=None, **kwargs):
+    """Remember whether the key was active before the save."""
+    if update_fields is not None and "is_active" not in update_fields:
+        instance._was_active = instance.is_active
+        return
+    instance._was_active = (
+        APIKey.objects.filter(pk=instance.pk).values_list("is_active", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=APIKey)
+def api_key_saved(sender, instance: APIKey, **kwargs):
+    """Revoked keys stop working on every Gateway replica."""
+    if not instance.is_active and getattr(instance, "_was_active", None) is not False:
+        gateway.invalidate_api_keys([instance.key_hash])
+
+
+@receiver(post_delete, sender=APIKey)
+def api_key_deleted(sender, instance: APIKey, **kwargs):
+    """Deleted keys stop working on every Gateway replica."""
+    gateway.invalidate_api_keys([instance.key_hash])
+
+
+@receiver(pre_save, sender=Instance)
+def instance_saving(sender, instance: Instance, **kwargs):
+    """Remember the state and widget config before the save."""
+    instance._gateway_before = (
+        Instance.objects.filter(pk=instance.pk).values("state", "effective_config").first()
+    )
+
+
+@receiver(post_save, sender=Instance)
+def instance_saved(sender, instance: Instance, created: bool, **kwargs):
+    """
+    Edits to the widget config apply on every Gateway replica, and keys of
+    instances that are no longer active stop working there.
+    """
+    if created:
+        return
+    before = getattr(instance, "_gateway_before", None) or {}
+    if _widget_config(before.get("effective_config")) != _widget_config(instance.effective_config):
+        gateway.invalidate_widget_configs([instance.id])
+    if instance.state != Instance.State.ACTIVE and before.get("state") != instance.state:
+        gateway.invalidate_api_keys(
+            list(instance.api_keys.values_list("key_hash", flat=True))
+        )
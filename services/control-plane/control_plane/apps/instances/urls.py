@@ -3,7 +3,13 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import APIKeyRevokeView, InstanceViewSet, StartTrialView
+from .views import (
+    APIKeyRevokeView,
+    InstancePlanLimitsView,
+    InstanceViewSet,
+    InstanceWidgetConfigView,
+    StartTrialView,
+)
 
 router = DefaultRouter()
 router.register(r"", InstanceViewSet, basename="instance")
@@ -16,4 +22,14 @@ urlpatterns = [
         APIKeyRevokeView.as_view(),
         name="apikey-revoke",
     ),
+    path(
+        "<uuid:instance_id>/widget_config",
+        InstanceWidgetConfigView.as_view(),
+        name="instance-widget-config",
+    ),
+    path(
+        "<uuid:instance_id>/plan_limits",
+        InstancePlanLimitsView.as_view(),
+        name="instance-plan-limits",
+    ),
 ]
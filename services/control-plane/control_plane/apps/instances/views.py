@@ -4,6 +4,7 @@ import logging
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -17,6 +18,8 @@ from .serializers import (
     EntitlementsSerializer,
     InstanceCreateSerializer,
     InstanceSerializer,
+    PlanLimitsSerializer,
+    WidgetConfigSerializer,
 )
 from .services import APIKeyService, InstanceService
 
@@ -141,6 +144,36 @@ class APIKeyRevokeView(APIView):
         return Response(serializer.data)
 
 
+class InstanceWidgetConfigView(APIView):
+    permission_classes = [AllowAny]
+    """
+    GET /instances/{instance_id}/widget_config
+
+    Get widget branding and allowed embedding origins (used by the Gateway).
+    """
+
+    def get(self, request, instance_id):
+        """Get widget configuration."""
+        config = InstanceService.get_widget_config(str(instance_id))
+        serializer = WidgetConfigSerializer(config)
+        return Response(serializer.data)
+
+
+class InstancePlanLimitsView(APIView):
+    permission_classes = [AllowAny]
+    """
+    GET /instances/{instance_id}/plan_limits
+
+    Get the owning org, plan tier and plan limits (used by the Gateway).
+    """
+
+    def get(self, request, instance_id):
+        """Get plan limits."""
+        plan_limits = InstanceService.get_plan_limits(str(instance_id))
+        serializer = PlanLimitsSerializer(plan_limits)
+        return Response(serializer.data)
+
+
 class StartTrialView(APIView):
     """
     POST /instances/trial
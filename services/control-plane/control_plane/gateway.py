@@ -0,0 +1,87 @@
+"""Cache invalidations pushed to the Gateway replicas.
+
+The Gateway caches API key introspections and widget configs for a TTL
+(``api_key_cache_ttl_sec``, ``widget_config_cache_ttl_sec``). Revocations
+and config edits must take effect sooner, so they are pushed to the
+internal endpoints of every Gateway replica once the transaction commits.
+Each configured URL is expanded to every address its host resolves to, so
+a headless Service name reaches every pod.
+
+Pushes are sent from a background thread, so the request that committed
+the change does not wait on DNS or the replicas; a single worker keeps
+them in commit order.
+
+Pushes are best effort: a replica that cannot be reached keeps serving
+its cached copy until the cache TTL runs out, which bounds how stale a
+revocation or edit can be.
+"""
+
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Sends the pushes off the request thread
+_pusher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gateway-invalidation")
+
+
+def _replica_urls() -> list[tuple[str, str]]:
+    """(base URL, Host header) for every Gateway replica address."""
+    targets = []
+    for url in settings.GATEWAY_INTERNAL_URLS:
+        parts = urlsplit(url)
+        try:
+            infos = socket.getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            logger.warning(f"Cannot resolve gateway {url}: {e}")
+            continue
+        for address in sorted({info[4][0] for info in infos}):
+            host = f"[{address}]" if ":" in address else address
+            netloc = f"{host}:{parts.port}" if parts.port else host
+            targets.append((urlunsplit(parts._replace(netloc=netloc)).rstrip("/"), parts.netloc))
+    return targets
+
+
+def _push(path: str, payload: dict) -> None:
+    """POST an invalidation to every Gateway replica, logging failures."""
+    if not settings.GATEWAY_INTERNAL_URLS or not settings.GATEWAY_INTERNAL_TOKEN:
+        return
+
+    with httpx.Client(timeout=settings.GATEWAY_INVALIDATION_TIMEOUT) as client:
+        for base_url, host in _replica_urls():
+            try:
+                response = client.post(
+                    f"{base_url}{path}",
+                    json=payload,
+                    headers={"X-Internal-Token": settings.GATEWAY_INTERNAL_TOKEN, "Host": host},
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.warning(f"Gateway invalidation {path} on {base_url} failed: {e}")
+
+
+def _push_on_commit(path: str, payload: dict) -> None:
+    """Queue a push for the background thread once the transaction commits."""
+    transaction.on_commit(lambda: _pusher.submit(_push, path, payload))
+
+
+def invalidate_api_keys(key_hashes: list[str]) -> None:
+    """Drop API keys from every Gateway's cache once the transaction commits."""
+    if not key_hashes:
+        return
+    payload = {"key_hashes": list(key_hashes)}
+    _push_on_commit("/internal/api_keys:invalidate", payload)
+
+
+def invalidate_widget_configs(instance_ids: list[str]) -> None:
+    """Drop widget configs from every Gateway's cache once the transaction commits."""
+    if not instance_ids:
+        return
+    payload = {"instance_ids": [str(instance_id) for instance_id in instance_ids]}
+    _push_on_commit("/internal/widget_config:invalidate", payload)
@@ -41,6 +41,18 @@ class Settings(BaseSettings):
     # Trial credits for new users
     trial_credits: int = 100
 
+    # API key MAC keyring ("kid:secret,..."; the first key signs new keys).
+    # Shared with the gateway, which verifies keys without a lookup.
+    api_key_mac_keys: str = ""
+
+    # Gateway replicas to push cache invalidations to (comma-separated base
+    # URLs; a headless Service name reaches every pod) and the shared
+    # internal token. Without them, changes reach the Gateway when its
+    # caches expire.
+    gateway_internal_urls: str = ""
+    gateway_internal_token: str = ""
+    gateway_invalidation_timeout_sec: float = 2.0
+
     class Config:
         env_prefix = ""
         case_sensitive = False
@@ -225,6 +237,14 @@ VAULT_TOKEN = settings.vault_token
 # Trial Credits
 TRIAL_CREDITS = settings.trial_credits
 
+# API Keys
+API_KEY_MAC_KEYS = settings.api_key_mac_keys
+
+# Gateway cache invalidation
+GATEWAY_INTERNAL_URLS = [u.strip() for u in settings.gateway_internal_urls.split(",") if u.strip()]
+GATEWAY_INTERNAL_TOKEN = settings.gateway_internal_token
+GATEWAY_INVALIDATION_TIMEOUT = settings.gateway_invalidation_timeout_sec
+
 # OpenAPI/Swagger Documentation (drf-spectacular)
 SPECTACULAR_SETTINGS = {
     "TITLE": "GSV Control Plane API",
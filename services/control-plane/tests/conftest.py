@@ -0,0 +1,35 @@
+"""Shared fixtures."""
+
+import pytest
+
+from control_plane.apps.billing.models import Wallet
+from control_plane.apps.instances.models import Instance
+from control_plane.apps.offerings.models import Offering, OfferingVersion, Plan
+from control_plane.apps.orgs.models import Organization, Project
+
+
+@pytest.fixture
+def instance(db):
+    """An active instance whose org wallet holds 1000 credits."""
+    org = Organization.objects.create(name="Acme", slug="acme", owner_id="user-1")
+    Wallet.objects.create(organization=org, balance=1000)
+    project = Project.objects.create(organization=org, name="Default", slug="default")
+    offering = Offering.objects.create(
+        name="Support Agent",
+        slug="support-agent",
+        category=Offering.Category.choices[0][0],
+    )
+    version = OfferingVersion.objects.create(
+        offering=offering,
+        version_label="1.0.0",
+        artifact_s3_key="artifacts/support-agent.zip",
+        artifact_sha256="0" * 64,
+    )
+    plan = Plan.objects.create(offering=offering, name="Free", slug="free", limits={"tier": "free"})
+    return Instance.objects.create(
+        offering_version=version,
+        organization=org,
+        project=project,
+        plan=plan,
+        state=Instance.State.ACTIVE,
+    )
@@ -0,0 +1,92 @@
+"""Tests for signed API keys."""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from control_plane.apps.instances.keys import (
+    generate_api_key,
+    key_prefix,
+    parse_keyring,
+    verify_api_key_mac,
+)
+from control_plane.apps.instances.models import APIKey, Instance
+from control_plane.apps.instances.services import APIKeyService
+
+
+@pytest.fixture
+def keyring(settings):
+    settings.API_KEY_MAC_KEYS = "k2:new-secret,k1:old-secret"
+
+
+def test_keys_are_signed_with_the_first_key(keyring):
+    key = generate_api_key()
+
+    assert key.startswith("cmp_sk_k2.")
+    assert verify_api_key_mac(key) is None
+    assert key_prefix(key) == key[:len("cmp_sk_k2.") + 8]
+
+
+def test_keys_signed_by_any_keyring_key_verify(keyring, settings):
+    settings.API_KEY_MAC_KEYS = "k1:old-secret"
+    old_key = generate_api_key()
+    settings.API_KEY_MAC_KEYS = "k2:new-secret,k1:old-secret"
+
+    assert verify_api_key_mac(old_key) is None
+
+    # Dropping the key invalidates what it signed
+    settings.API_KEY_MAC_KEYS = "k2:new-secret"
+    assert verify_api_key_mac(old_key) == "unknown_key"
+
+
+@pytest.mark.parametrize("tamper, reason", [
+    (lambda key: key[:-2] + ("AA" if not key.endswith("AA") else "BB"), "bad_mac"),
+    (lambda key: key.replace("cmp_sk_k2.", "cmp_sk_k1.", 1), "bad_mac"),
+    (lambda key: key.replace("cmp_sk_k2.", "cmp_sk_k9.", 1), "unknown_key"),
+    (lambda key: key.replace("cmp_sk_", "sk_", 1), "malformed"),
+    (lambda key: key.rpartition(".")[0] + ".", "malformed"),
+])
+def test_tampered_keys_are_rejected(keyring, tamper, reason):
+    assert verify_api_key_mac(tamper(generate_api_key())) == reason
+
+
+def test_keyring_format_is_validated():
+    assert list(parse_keyring(" a:1 , b_2:2 ")) == ["a", "b_2"]
+    for value in ("nokid", "a:", "bad kid:secret", "x" * 17 + ":secret"):
+        with pytest.raises(ValueError):
+            parse_keyring(value)
+
+
+@pytest.mark.django_db
+def test_validate_api_key(instance, keyring):
+    created = APIKeyService.create_api_key(instance, "CI")
+    key = created.full_key
+
+    assert APIKeyService.validate_api_key(key) == instance
+    assert APIKey.objects.get().last_used_at is not None
+
+    forged = key[:-2] + ("AA" if not key.endswith("AA") else "BB")
+    assert APIKeyService.validate_api_key(forged) is None
+
+    instance.state = Instance.State.PAUSED
+    instance.save()
+    assert APIKeyService.validate_api_key(key) is None
+
+    instance.state = Instance.State.ACTIVE
+    instance.save()
+    APIKey.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+    assert APIKeyService.validate_api_key(key) is None
+
+
+@pytest.mark.django_db
+def test_legacy_keys_are_looked_up_without_a_mac(instance, settings):
+    settings.API_KEY_MAC_KEYS = ""
+    legacy_key = APIKeyService.create_api_key(instance, "Old").full_key
+    settings.API_KEY_MAC_KEYS = "k1:secret"
+
+    assert "." not in legacy_key
+    assert APIKeyService.validate_api_key(legacy_key) == instance
+
+    APIKeyService.revoke_api_key(str(APIKey.objects.get().id))
+    assert APIKeyService.validate_api_key(legacy_key) is None
@@ -0,0 +1,74 @@
+"""Tests for billing settlement."""
+
+from django.test import Client
+
+from control_plane.apps.billing.models import LedgerEntry, Reservation, Wallet
+from control_plane.apps.billing.services import BillingService
+
+
+def reserve(instance, budget: int = 10) -> str:
+    return BillingService.authorize(str(instance.id), budget).reservation_id
+
+
+def test_settle_debits_usage(instance):
+    reservation_id = reserve(instance)
+
+    result = BillingService.settle(reservation_id, str(instance.id), {"requests": 1, "tool_calls": 2})
+
+    assert result.debited == 3
+    assert Wallet.objects.get().balance == 997
+    assert LedgerEntry.objects.get().amount == -3
+
+
+def test_unbillable_settle_releases_without_debit(instance):
+    reservation_id = reserve(instance)
+
+    response = Client().post(
+        "/billing/settle",
+        {"reservation_id": reservation_id, "instance_id": str(instance.id), "billable": False},
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200, response.content
+    assert response.json() == {
+        "debited": 0,
+        "balance": 1000,
+        "ledger_entry_id": None,
+        "status": "cancelled",
+    }
+    assert Reservation.objects.get().status == Reservation.Status.CANCELLED
+    assert not LedgerEntry.objects.exists()
+
+    # Settling it again (a retry) is a no-op
+    result = BillingService.settle(reservation_id, str(instance.id), {"requests": 1})
+    assert (result.debited, result.status) == (0, "cancelled")
+    assert Wallet.objects.get().balance == 1000
+
+
+def test_batch_releases_unbillable_items(instance):
+    billed, unbilled = reserve(instance), reserve(instance)
+
+    results = BillingService.settle_batch([
+        {"reservation_id": billed, "instance_id": str(instance.id), "usage": {}},
+        {"reservation_id": unbilled, "instance_id": str(instance.id), "usage": {}, "billable": False},
+    ])
+
+    assert [(r.debited, r.status) for r in results] == [(1, "settled"), (0, "cancelled")]
+    assert Wallet.objects.get().balance == 999
+    assert Reservation.objects.get(id=unbilled).status == Reservation.Status.CANCELLED
+    assert LedgerEntry.objects.count() == 1
+
+
+def test_replayed_batch_debits_once(instance):
+    reservation_id = reserve(instance)
+    item = {"reservation_id": reservation_id, "instance_id": str(instance.id), "usage": {"requests": 2}}
+    unknown = {"reservation_id": "00000000-0000-0000-0000-000000000000", "instance_id": str(instance.id)}
+
+    first = BillingService.settle_batch([item, item, unknown])
+    replayed = BillingService.settle_batch([item])
+
+    assert [(r.debited, r.status) for r in first] == [(2, "settled"), (0, "settled"), (0, "not_found")]
+    assert [(r.debited, r.status) for r in replayed] == [(0, "settled")]
+    assert replayed[0].ledger_entry_id == first[0].ledger_entry_id
+    assert Wallet.objects.get().balance == 998
+    assert LedgerEntry.objects.count() == 1
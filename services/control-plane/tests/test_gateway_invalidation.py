@@ -0,0 +1,77 @@
+"""Tests for cache invalidations pushed to the Gateway."""
+
+import threading
+
+import pytest
+
+from control_plane import gateway
+from control_plane.apps.instances.models import APIKey, Instance
+
+
+@pytest.fixture
+def pushes(monkeypatch):
+    """Pushes sent, as (path, payload, thread name)."""
+    sent = []
+
+    def push(path, payload):
+        sent.append((path, payload, threading.current_thread().name))
+
+    monkeypatch.setattr(gateway, "_push", push)
+    return sent
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    """Run a save's on-commit callbacks and wait for the pushes they queue."""
+    def run(save):
+        with django_capture_on_commit_callbacks(execute=True):
+            save()
+        gateway._pusher.submit(lambda: None).result()
+
+    return run
+
+
+@pytest.fixture
+def api_key(instance):
+    return APIKey.objects.create(instance=instance, name="CI", key_prefix="cmp_sk_t", key_hash="a" * 64)
+
+
+def paths(pushes) -> list[str]:
+    return [path for path, _, _ in pushes]
+
+
+def test_widget_edit_is_pushed_off_the_request_thread(instance, pushes, commit):
+    instance.overrides = {"widget": {"branding": {"brand_name": "Acme"}}}
+    commit(instance.save)
+
+    [(path, payload, thread)] = pushes
+    assert (path, payload) == ("/internal/widget_config:invalidate", {"instance_ids": [str(instance.id)]})
+    assert thread != threading.current_thread().name
+
+
+def test_saves_without_cached_changes_are_not_pushed(instance, api_key, pushes, commit):
+    instance.name = "Renamed"
+    commit(instance.save)
+    commit(lambda: api_key.save(update_fields=["last_used_at"]))
+
+    assert pushes == []
+
+
+def test_pausing_an_instance_revokes_its_keys_once(instance, api_key, pushes, commit):
+    instance.state = Instance.State.PAUSED
+    commit(instance.save)
+    assert paths(pushes) == ["/internal/api_keys:invalidate"]
+    assert pushes[0][1] == {"key_hashes": [api_key.key_hash]}
+
+    instance.name = "Still paused"
+    commit(instance.save)
+    assert len(pushes) == 1
+
+
+def test_revoking_a_key_is_pushed_once(api_key, pushes, commit):
+    api_key.is_active = False
+    commit(api_key.save)
+    commit(api_key.save)
+
+    assert pushes[0][:2] == ("/internal/api_keys:invalidate", {"key_hashes": [api_key.key_hash]})
+    assert len(pushes) == 1
@@ -0,0 +1,72 @@
+"""Tests for gateway credit leases."""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from control_plane.apps.billing.models import LedgerEntry, Reservation, Wallet
+from control_plane.apps.billing.services import MAX_LEASE_TTL_SECONDS, BillingService
+from control_plane.exceptions import ResourceNotFoundError
+
+
+def lease(instance, amount: int, ttl_seconds: int = 60):
+    return BillingService.acquire_lease(str(instance.id), amount, ttl_seconds)
+
+
+def test_leases_cannot_oversubscribe_the_wallet(instance):
+    first = lease(instance, 600)
+    second = lease(instance, 600)
+    third = lease(instance, 600)
+
+    assert (first.allowed, first.amount) == (True, 600)
+    assert (second.allowed, second.amount) == (True, 400)  # What is left
+    assert (third.allowed, third.amount) == (False, 0)
+    assert Wallet.objects.get().balance == 1000  # Held, not debited
+
+
+def test_lease_ttl_is_capped(instance):
+    result = lease(instance, 100, ttl_seconds=86400)
+
+    assert result.expires_at <= timezone.now() + timedelta(seconds=MAX_LEASE_TTL_SECONDS)
+
+
+def test_expired_leases_stop_holding_credits(instance):
+    lease(instance, 1000)
+    Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert lease(instance, 1000).amount == 1000
+
+
+def test_release_debits_each_run_once(instance):
+    lease_id = lease(instance, 100).lease_id
+    usages = [{"requests": 1, "tool_calls": 2}, {"requests": 1}]
+
+    released = BillingService.release_lease(lease_id, usages)
+    # The gateway retries releases whose response it did not get
+    retried = BillingService.release_lease(lease_id, usages)
+
+    assert (released.debited, released.balance) == (4, 996)
+    assert (retried.debited, retried.balance) == (0, 996)
+    assert retried.ledger_entry_id == released.ledger_entry_id
+    assert LedgerEntry.objects.count() == 1
+    assert Reservation.objects.get().status == Reservation.Status.SETTLED
+
+    # Released credits are available again
+    assert lease(instance, 1000).amount == 996
+
+
+def test_release_debit_is_capped_at_the_lease(instance):
+    lease_id = lease(instance, 10).lease_id
+
+    result = BillingService.release_lease(lease_id, [{"requests": 1, "tool_calls": 50}])
+
+    assert result.debited == 10
+    assert Wallet.objects.get().balance == 990
+
+
+def test_only_leases_can_be_released(instance):
+    reservation_id = BillingService.authorize(str(instance.id), 10).reservation_id
+
+    with pytest.raises(ResourceNotFoundError):
+        BillingService.release_lease(reservation_id, [])
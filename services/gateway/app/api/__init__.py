@@ -1,6 +1,8 @@
 """API routes."""
 
+from .internal import router as internal_router
+from .metrics import router as metrics_router
 from .runs import router as runs_router
 from .widget import router as widget_router
 
-__all__ = ["runs_router", "widget_router"]
+__all__ = ["internal_router", "metrics_router", "runs_router", "widget_router"]
@@ -0,0 +1,240 @@
+"""Run admission, billing and Runner streaming.
+
+Shared by every endpoint that executes runs (``/v1/runs`` and the widget
+conversation socket) so plan limits, credit reservation, settlement and
+relaying of streamed output behave the same way everywhere.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+from app.billing.client import AuthorizeResult, billing_client
+from app.billing.lease import credit_leases
+from app.billing.settlement import settlement_queue
+from app.billing.speculation import balance_hints
+from app.config import settings
+from app.ratelimit import RateLimited, RunPermit, run_limiter
+from app.routing.deadline import DeadlineExceeded, run_deadline
+from app.routing.runner import runner_client
+from app.routing.scheduler import run_scheduler
+from app.telemetry import RunTracker, record_settlement_failure, timed_stage
+from app.upstream import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Credits reserved per run
+RUN_BUDGET = 10
+
+# Usage settled for a run abandoned after it reached the Runner (client
+# disconnect or deadline): Langflow worked on it but reported nothing
+DISPATCHED_RUN_USAGE = {"requests": 1}
+
+
+class UsageInfo(BaseModel):
+    """Usage information from run."""
+
+    llm_tokens_in: int = 0
+    llm_tokens_out: int = 0
+    tool_calls: int = 0
+    requests: int = 0
+
+
+class BillingInfo(BaseModel):
+    """Billing information from run.
+
+    With deferred settlement (credit leases or batched settlement) the
+    status is "pending_reconciliation" and debited is the reserved budget.
+    """
+
+    debited: int
+    balance: int
+    status: str = "settled"
+
+
+@dataclass
+class RunProgress:
+    """How far a run got, to settle what it consumed if it is abandoned."""
+
+    dispatched: bool = False  # Sent to the Runner
+    failed: bool = False  # Failed at the Runner or upstream of it
+
+    @property
+    def usage(self) -> Optional[dict[str, int]]:
+        """Usage consumed so far; None if the run is not billed."""
+        if self.failed or not self.dispatched:
+            return None
+        return dict(DISPATCHED_RUN_USAGE)
+
+
+def unavailable_error(e: UpstreamUnavailable) -> HTTPException:
+    """503 for a call rejected by an upstream's circuit breaker or limiter."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Service temporarily overloaded",
+        headers={"Retry-After": e.retry_after_header},
+    )
+
+
+async def admit_run(instance_id: str) -> RunPermit:
+    """Apply the instance's plan rate limits, raising 429 if exceeded."""
+    try:
+        return await run_limiter.admit(instance_id)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Plan rate limit exceeded",
+            headers={"Retry-After": e.retry_after_header},
+        )
+
+
+async def authorize_billing(instance_id: str, budget: int = RUN_BUDGET) -> AuthorizeResult:
+    """Reserve credits for a run, raising 502/402 if that is not possible."""
+    try:
+        with timed_stage("billing_authorize", instance_id):
+            if settings.credit_lease_enabled:
+                auth_result = await credit_leases.authorize(instance_id, budget=budget)
+            else:
+                auth_result = await billing_client.authorize(
+                    instance_id=instance_id,
+                    requested_budget=budget,
+                )
+    except UpstreamUnavailable as e:
+        raise unavailable_error(e)
+    except Exception as e:
+        logger.error(f"Billing authorization failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Billing service unavailable",
+        )
+
+    balance_hints.record(instance_id, auth_result.balance)
+    if not auth_result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="Insufficient credits",
+        )
+
+    return auth_result
+
+
+async def settle_billing(
+    auth_result: AuthorizeResult,
+    instance_id: str,
+    usage: Optional[dict[str, int]],
+) -> BillingInfo:
+    """
+    Settle a reservation; failures are logged and reported as no debit.
+
+    ``usage`` None marks a run that is not billed (it failed, or never
+    reached the Runner): the reservation is released without a debit.
+    """
+    try:
+        with timed_stage("billing_settle", instance_id):
+            if auth_result.leased:
+                settle_result = await credit_leases.settle(auth_result, usage)
+            elif settings.settlement_batch_enabled:
+                settle_result = await settlement_queue.settle(
+                    reservation_id=auth_result.reservation_id,
+                    instance_id=instance_id,
+                    usage=usage,
+                    budget=auth_result.budget,
+                    balance=auth_result.balance,
+                    billable=usage is not None,
+                )
+            else:
+                settle_result = await billing_client.settle(
+                    reservation_id=auth_result.reservation_id,
+                    instance_id=instance_id,
+                    usage=usage,
+                    billable=usage is not None,
+                )
+    except Exception as e:
+        logger.error(f"Billing settlement failed: {e}")
+        record_settlement_failure(instance_id)
+        # Run succeeded but billing failed - log and continue
+        return BillingInfo(debited=0, balance=auth_result.balance)
+
+    balance_hints.record(instance_id, settle_result.balance)
+    return BillingInfo(
+        debited=settle_result.debited,
+        balance=settle_result.balance,
+        status=settle_result.status,
+    )
+
+
+def usage_info(usage: dict[str, int]) -> UsageInfo:
+    """Build UsageInfo from Runner usage metrics."""
+    return UsageInfo(
+        llm_tokens_in=usage.get("llm_tokens_in", 0),
+        llm_tokens_out=usage.get("llm_tokens_out", 0),
+        tool_calls=usage.get("tool_calls", 0),
+        requests=usage.get("requests", 0),
+    )
+
+
+async def stream_from_runner(
+    run_id: str,
+    instance_id: str,
+    input_data: dict[str, Any],
+    metadata: Optional[dict[str, Any]],
+    timeout: float,
+    tracker: RunTracker,
+    progress: RunProgress,
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Execute a run in streaming mode, yielding the events to relay.
+
+    Yields ("token", {"chunk"}) for each generated chunk, then either
+    ("end", {"output", "usage"}) or ("error", {"code", "message"}). On
+    "end" the caller settles billing and finishes ``tracker``; errors
+    finish it here and mark ``progress`` failed when the run is not
+    billed. Close the iterator (``contextlib.aclosing``) when stopping
+    early.
+    """
+    try:
+        with run_deadline(timeout):
+            async with run_scheduler.slot(instance_id):
+                progress.dispatched = True
+                async for event in runner_client.stream(
+                    instance_id=instance_id,
+                    input_data=input_data,
+                    metadata=metadata,
+                    run_id=run_id,
+                ):
+                    if event.event == "token":
+                        yield "token", event.data
+                    elif event.event == "error":
+                        logger.error(f"Run {run_id} failed: {event.data.get('message')}")
+                        progress.failed = True
+                        tracker.finish(status.HTTP_502_BAD_GATEWAY)
+                        yield "error", {"code": "execution_failed", "message": "Agent execution failed"}
+                        return
+                    elif event.event == "end":
+                        yield "end", {
+                            "output": event.data.get("output", {}),
+                            "usage": event.data.get("usage", {}),
+                        }
+                        return
+
+    except (DeadlineExceeded, httpx.TimeoutException):
+        logger.warning(f"Streaming run {run_id} timed out")
+        tracker.finish(status.HTTP_504_GATEWAY_TIMEOUT)
+        yield "error", {"code": "deadline_exceeded", "message": "Run deadline exceeded"}
+    except UpstreamUnavailable as e:
+        progress.failed = True
+        tracker.finish(status.HTTP_503_SERVICE_UNAVAILABLE)
+        yield "error", {
+            "code": "upstream_unavailable",
+            "message": "Service temporarily overloaded",
+            "retry_after": int(e.retry_after_header),
+        }
+    except Exception as e:
+        logger.error(f"Streaming run {run_id} failed: {e}")
+        progress.failed = True
+        tracker.finish(status.HTTP_502_BAD_GATEWAY)
+        yield "error", {"code": "execution_failed", "message": "Agent execution failed"}
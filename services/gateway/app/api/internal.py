@@ -0,0 +1,93 @@
+"""Internal endpoints for other platform services."""
+
+import logging
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, status
+from pydantic import BaseModel
+
+from app.auth import api_key_cache
+from app.config import settings
+from app.widget import widget_configs
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False)
+
+
+def _check_internal_token(token: Optional[str]) -> None:
+    """Reject callers without the shared internal token."""
+    if not settings.internal_api_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if token is None or not secrets.compare_digest(token, settings.internal_api_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal token",
+        )
+
+
+class APIKeyInvalidateRequest(BaseModel):
+    """Request to drop API keys from the introspection cache."""
+
+    key_hashes: list[str]  # SHA-256 hex digests, as stored by the Control Plane
+
+
+class APIKeyInvalidateResponse(BaseModel):
+    """Response for API key cache invalidation."""
+
+    invalidated: int
+
+
+@router.post("/api_keys:invalidate", response_model=APIKeyInvalidateResponse)
+async def invalidate_api_keys(
+    request: APIKeyInvalidateRequest,
+    x_internal_token: Optional[str] = Header(default=None),
+):
+    """
+    Invalidate cached API key introspections.
+
+    Called by the Control Plane when keys are revoked or deleted, or their
+    instance stops being active, so the change takes effect before the
+    cache TTL runs out.
+    """
+    _check_internal_token(x_internal_token)
+
+    invalidated = sum(1 for key_hash in request.key_hashes if api_key_cache.invalidate(key_hash))
+    logger.info(f"Invalidated {invalidated}/{len(request.key_hashes)} cached API keys")
+
+    return APIKeyInvalidateResponse(invalidated=invalidated)
+
+
+class WidgetConfigInvalidateRequest(BaseModel):
+    """Request to drop instances from the widget config cache."""
+
+    instance_ids: list[str]
+
+
+class WidgetConfigInvalidateResponse(BaseModel):
+    """Response for widget config cache invalidation."""
+
+    invalidated: int
+
+
+@router.post("/widget_config:invalidate", response_model=WidgetConfigInvalidateResponse)
+async def invalidate_widget_configs(
+    request: WidgetConfigInvalidateRequest,
+    x_internal_token: Optional[str] = Header(default=None),
+):
+    """
+    Invalidate cached widget configs.
+
+    Called by the Control Plane whenever an instance is saved, so edits to
+    its branding or allowed origins take effect before the cache TTL runs
+    out.
+    """
+    _check_internal_token(x_internal_token)
+
+    invalidated = sum(
+        1 for instance_id in request.instance_ids if widget_configs.invalidate(instance_id)
+    )
+    logger.info(f"Invalidated {invalidated}/{len(request.instance_ids)} cached widget configs")
+
+    return WidgetConfigInvalidateResponse(invalidated=invalidated)
@@ -1,20 +1,59 @@
 """Runs API endpoint."""
 
+import asyncio
+import hashlib
+import json
 import logging
 import uuid
-from typing import Any, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-
-from app.auth import User, jwt_auth
-from app.billing.client import billing_client
-from app.routing.runner import runner_client
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, Awaitable, Literal, Optional, TypeVar
+
+import anyio
+import httpx
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
+
+from app.api.execution import (
+    RUN_BUDGET,
+    BillingInfo,
+    RunProgress,
+    UsageInfo,
+    admit_run,
+    authorize_billing,
+    settle_billing,
+    stream_from_runner,
+    unavailable_error,
+    usage_info,
+)
+from app.auth import AuthContext, run_auth
+from app.billing.client import AuthorizeResult
+from app.billing.speculation import balance_hints, record_speculation
+from app.config import settings
+from app.idempotency import IdempotencyConflict, IdempotencyRecord, idempotent_runs
+from app.jobs import CallbackURLRejected, RunJob, resolve_callback, run_jobs
+from app.ratelimit import RunPermit, run_limiter
+from app.routing.deadline import DeadlineExceeded, run_deadline
+from app.routing.hedging import hedge_offering
+from app.routing.runner import RunResult, runner_client
+from app.routing.scheduler import run_scheduler
+from app.telemetry import (
+    RunTracker,
+    continue_trace,
+    current_trace_context,
+    set_run_attributes,
+    timed_stage,
+)
+from app.upstream import UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/v1", tags=["runs"])
 
+T = TypeVar("T")
+
 
 class MessageInput(BaseModel):
     """Message in conversation."""
@@ -36,22 +75,16 @@ class RunRequest(BaseModel):
     instance_id: str
     input: RunInput
     metadata: Optional[dict[str, Any]] = None
+    callback_url: Optional[HttpUrl] = None  # Notified on completion (async mode)
 
 
-class UsageInfo(BaseModel):
-    """Usage information from run."""
-
-    llm_tokens_in: int = 0
-    llm_tokens_out: int = 0
-    tool_calls: int = 0
-    requests: int = 0
-
+class RunBatchRequest(BaseModel):
+    """Request for POST /v1/runs:batch."""
 
-class BillingInfo(BaseModel):
-    """Billing information from run."""
-
-    debited: int
-    balance: int
+    instance_id: str
+    inputs: list[RunInput] = Field(min_length=1, max_length=settings.run_batch_max_items)
+    metadata: Optional[dict[str, Any]] = None
+    concurrency: Optional[int] = Field(default=None, ge=1)  # Capped by run_batch_max_concurrency
 
 
 class RunOutput(BaseModel):
@@ -70,10 +103,275 @@ class RunResponse(BaseModel):
     billing: BillingInfo
 
 
-@router.post("/runs", response_model=RunResponse)
+class RunBatchItemResult(BaseModel):
+    """NDJSON line for one finished item of a batch."""
+
+    type: Literal["result"] = "result"
+    index: int  # Position in RunBatchRequest.inputs
+    status: str  # succeeded, failed
+    output: Optional[RunOutput] = None
+    usage: Optional[UsageInfo] = None
+    error: Optional[str] = None
+
+
+class RunBatchSummary(BaseModel):
+    """Final NDJSON line of a batch, sent after billing is settled."""
+
+    type: Literal["summary"] = "summary"
+    batch_id: str
+    succeeded: int
+    failed: int
+    usage: UsageInfo
+    billing: BillingInfo
+
+
+class RunJobResponse(BaseModel):
+    """Status of an asynchronous run (POST /v1/runs?mode=async)."""
+
+    run_id: str
+    status: str  # queued, running, succeeded, failed
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    result: Optional[RunResponse] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: RunJob) -> "RunJobResponse":
+        """Create RunJobResponse from a stored job."""
+        return cls(
+            run_id=job.run_id,
+            status=job.status,
+            created_at=job.created_at,
+            completed_at=job.completed_at,
+            result=job.result,
+            error=job.error,
+        )
+
+
+def _check_instance_access(auth: AuthContext, instance_id: str) -> None:
+    """Reject callers whose credentials are bound to another instance."""
+    if not auth.can_access_instance(instance_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Credentials are not valid for this instance",
+        )
+
+
+async def _check_callback_url(url: str) -> None:
+    """Reject callback URLs the gateway will not send to with 422."""
+    try:
+        await resolve_callback(url)
+    except CallbackURLRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid callback_url: {e}",
+        )
+
+
+def _run_response(run_id: str, run_result: RunResult, billing: BillingInfo) -> Response:
+    """
+    Build the RunResponse body of a completed run.
+
+    Only the envelope is encoded here; the Runner's output bytes are
+    spliced in as sent, without being parsed or validated again.
+    """
+    body = b"".join((
+        b'{"run_id":', orjson.dumps(run_id),
+        b',"output":', run_result.output_json,
+        b',"usage":', orjson.dumps(usage_info(run_result.usage).model_dump()),
+        b',"billing":', orjson.dumps(billing.model_dump()),
+        b"}",
+    ))
+    return Response(content=body, media_type="application/json")
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _run_timeout(timeout_ms: Optional[int]) -> float:
+    """Seconds a run may take: run_timeout, or less if the client asked."""
+    if timeout_ms is None:
+        return settings.run_timeout
+    return min(settings.run_timeout, timeout_ms / 1000)
+
+
+async def _until_disconnected(http_request: Request, work: Awaitable[T]) -> T:
+    """
+    Await ``work``, cancelling it if the client disconnects first.
+
+    A cancelled run settles the usage it consumed so far.
+    """
+    task = asyncio.ensure_future(work)
+
+    async def disconnected() -> None:
+        # The body was read already, so the next message is the disconnect
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.create_task(disconnected())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    if task.cancelled():
+        logger.info("Client disconnected, run cancelled")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return task.result()
+
+
+async def _execute(run_id: str, request: RunRequest, progress: RunProgress) -> RunResult:
+    """Send a run to the Runner once the scheduler admits it."""
+    hedge = await hedge_offering(request.instance_id)
+    async with run_scheduler.slot(request.instance_id):
+        progress.dispatched = True
+        with timed_stage("runner_execute", request.instance_id):
+            return await runner_client.execute(
+                instance_id=request.instance_id,
+                input_data=request.input.model_dump(),
+                metadata=request.metadata,
+                run_id=run_id,
+                hedge=hedge,
+            )
+
+
+async def _complete_run(
+    run_id: str,
+    request: RunRequest,
+    auth_result: AuthorizeResult,
+    execution: Optional[asyncio.Task] = None,
+    progress: Optional[RunProgress] = None,
+) -> Response:
+    """
+    Execute an authorized run via the Runner and settle its billing.
+
+    Returns the RunResponse, encoded by ``_run_response``.
+
+    ``execution`` is the Runner call (tracked by ``progress``) if it was
+    already dispatched speculatively.
+    """
+    if progress is None:
+        progress = RunProgress()
+    try:
+        run_result = await (execution or _execute(run_id, request, progress))
+    except asyncio.CancelledError:
+        # Client disconnected - settle what the run consumed so far
+        with anyio.CancelScope(shield=True):
+            await settle_billing(auth_result, request.instance_id, progress.usage)
+        raise
+    except (DeadlineExceeded, httpx.TimeoutException) as e:
+        logger.warning(f"Run {run_id} timed out: {e!r}")
+        await settle_billing(auth_result, request.instance_id, progress.usage)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Run deadline exceeded",
+        )
+    except UpstreamUnavailable as e:
+        await settle_billing(auth_result, request.instance_id, None)
+        raise unavailable_error(e)
+    except Exception as e:
+        logger.error(f"Run execution failed: {e}")
+        # Failed runs are not billed; release the reservation
+        await settle_billing(auth_result, request.instance_id, None)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Agent execution failed",
+        )
+
+    billing = await settle_billing(auth_result, request.instance_id, run_result.usage)
+
+    logger.info(
+        f"Completed run {run_id}: "
+        f"usage={run_result.usage}, debited={billing.debited}"
+    )
+
+    with timed_stage("response_build", request.instance_id):
+        return _run_response(run_id, run_result, billing)
+
+
+async def _speculative_run(run_id: str, request: RunRequest) -> Response:
+    """
+    Dispatch a run to the Runner while its billing is being authorized.
+
+    If authorization is denied or fails, the run is cancelled and never
+    settled.
+    """
+    progress = RunProgress()
+    execution = asyncio.create_task(_execute(run_id, request, progress))
+    try:
+        auth_result = await authorize_billing(request.instance_id)
+    except BaseException:
+        execution.cancel()
+        await asyncio.gather(execution, return_exceptions=True)
+        record_speculation("wasted")
+        raise
+
+    record_speculation("confirmed")
+    return await _complete_run(run_id, request, auth_result, execution, progress)
+
+
+async def _submit_run_job(
+    run_id: str,
+    request: RunRequest,
+    auth_result: AuthorizeResult,
+    owner_id: str,
+    permit: RunPermit,
+) -> JSONResponse:
+    """Queue an authorized run on the job pool and return 202."""
+    job = RunJob(
+        run_id=run_id,
+        instance_id=request.instance_id,
+        owner_id=owner_id,
+        callback_url=str(request.callback_url) if request.callback_url else None,
+    )
+
+    trace_context = current_trace_context()
+
+    async def work() -> dict[str, Any]:
+        try:
+            with continue_trace("run job", trace_context):
+                set_run_attributes(run_id, request.instance_id)
+                response = await _complete_run(run_id, request, auth_result)
+        finally:
+            await permit.release()
+        return orjson.loads(response.body)
+
+    async def release() -> None:
+        await permit.release()
+        await settle_billing(auth_result, request.instance_id, None)
+
+    if not await run_jobs.submit(job, work=work, release=release):
+        await release()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many queued runs",
+            headers={"Retry-After": "1"},
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=RunJobResponse.from_job(job).model_dump(mode="json"),
+        headers={"Location": f"/v1/runs/{run_id}"},
+    )
+
+
+@router.post(
+    "/runs",
+    response_model=RunResponse,
+    responses={202: {"model": RunJobResponse}},
+)
 async def execute_run(
     request: RunRequest,
-    user: User = Depends(jwt_auth),
+    http_request: Request,
+    mode: Literal["sync", "async"] = "sync",
+    auth: AuthContext = Depends(run_auth),
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    x_cmp_timeout_ms: Optional[int] = Header(default=None, gt=0),
 ):
     """
     Execute an agent run.
@@ -83,88 +381,358 @@ async def execute_run(
     2. Route to Runner service
     3. Settle billing (debit actual usage)
     4. Return response with usage/billing info
+
+    With mode=async, steps 2-3 are queued after authorization and 202 is
+    returned with the run_id; poll GET /v1/runs/{run_id} or pass a
+    callback_url to be notified on completion. Callback URLs must be https
+    and resolve to public addresses (422 otherwise).
+
+    With speculative dispatch enabled, sync runs of instances with a
+    comfortable balance overlap steps 1 and 2.
+
+    Accepts a JWT, an API key or a widget session token (X-Widget-Token);
+    the latter two only for the instance they were issued for.
+
+    With an Idempotency-Key header, retries of the same request attach to
+    the original execution or replay its response (Idempotent-Replayed:
+    true) instead of running and billing again.
+
+    Sync runs end after run_timeout, or the client's X-CMP-Timeout-Ms if
+    shorter (504); the time left is passed on to the Runner and Langflow.
+    A sync run without an Idempotency-Key is cancelled when the client
+    disconnects, settling what it consumed so far.
     """
+    _check_instance_access(auth, request.instance_id)
+    if mode == "async" and request.callback_url is not None:
+        await _check_callback_url(str(request.callback_url))
+
+    with run_deadline(_run_timeout(x_cmp_timeout_ms)):
+        if idempotency_key is not None:
+            return await _idempotent_run(idempotency_key, request, mode, auth)
+        if mode == "sync":
+            return await _until_disconnected(http_request, _start_run(request, mode, auth))
+        return await _start_run(request, mode, auth)
+
+
+async def _start_run(
+    request: RunRequest,
+    mode: str,
+    auth: AuthContext,
+) -> Response:
+    """Authorize and execute (or queue) a run."""
     run_id = str(uuid.uuid4())
-    logger.info(f"Starting run {run_id} for instance {request.instance_id}")
+    set_run_attributes(run_id, request.instance_id)
+    logger.info(f"Starting {mode} run {run_id} for instance {request.instance_id}")
+
+    tracker = RunTracker(mode, request.instance_id)
+    with tracker.track(status=202 if mode == "async" else 200):
+        permit = await admit_run(request.instance_id)
+
+        if mode == "async":
+            # 1. Authorize billing, then queue 2-3; the job releases the permit
+            try:
+                auth_result = await authorize_billing(request.instance_id)
+            except BaseException:
+                await permit.release()
+                raise
+            return await _submit_run_job(run_id, request, auth_result, auth.principal_id, permit)
 
-    # 1. Authorize billing
-    try:
-        auth_result = await billing_client.authorize(
-            instance_id=request.instance_id,
-            requested_budget=10,  # Default budget
-        )
-    except Exception as e:
-        logger.error(f"Billing authorization failed: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Billing service unavailable",
-        )
+        try:
+            if balance_hints.can_speculate(request.instance_id, RUN_BUDGET):
+                # 1-4 with the Runner call overlapping authorization
+                return await _speculative_run(run_id, request)
 
-    if not auth_result.allowed:
-        raise HTTPException(
-            status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail="Insufficient credits",
+            # 1. Authorize billing
+            auth_result = await authorize_billing(request.instance_id)
+
+            # 2-4. Execute, settle and return
+            return await _complete_run(run_id, request, auth_result)
+        finally:
+            await permit.release()
+
+
+async def _idempotent_run(
+    idempotency_key: str,
+    request: RunRequest,
+    mode: str,
+    auth: AuthContext,
+) -> JSONResponse:
+    """Start a run at most once per caller and Idempotency-Key."""
+    key = hashlib.sha256(f"{auth.principal_id}:{idempotency_key}".encode()).hexdigest()
+    fingerprint = hashlib.sha256(f"{mode}:{request.model_dump_json()}".encode()).hexdigest()
+
+    async def work() -> IdempotencyRecord:
+        try:
+            response = await _start_run(request, mode, auth)
+        except HTTPException as e:
+            return IdempotencyRecord(
+                fingerprint=fingerprint,
+                status_code=e.status_code,
+                body={"detail": e.detail},
+                headers=dict(e.headers or {}),
+            )
+        location = response.headers.get("location")
+        return IdempotencyRecord(
+            fingerprint=fingerprint,
+            status_code=response.status_code,
+            body=orjson.loads(response.body),
+            headers={"Location": location} if location else {},
         )
 
-    # 2. Execute run via Runner
     try:
-        run_result = await runner_client.execute(
-            instance_id=request.instance_id,
-            input_data=request.input.model_dump(),
-            metadata=request.metadata,
-        )
-    except Exception as e:
-        logger.error(f"Run execution failed: {e}")
-        # Still settle with 0 usage on failure
-        try:
-            await billing_client.settle(
-                reservation_id=auth_result.reservation_id,
-                instance_id=request.instance_id,
-                usage={},
+        record, replayed = await idempotent_runs.execute(key, fingerprint, work)
+    except IdempotencyConflict as e:
+        if e.reason == IdempotencyConflict.MISMATCH:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request",
             )
-        except Exception:
-            pass
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Agent execution failed",
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"},
         )
 
-    # 3. Settle billing
-    try:
-        settle_result = await billing_client.settle(
-            reservation_id=auth_result.reservation_id,
-            instance_id=request.instance_id,
-            usage=run_result.usage,
+    headers = dict(record.headers)
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return JSONResponse(status_code=record.status_code, content=record.body, headers=headers)
+
+
+@router.get("/runs/{run_id}", response_model=RunJobResponse)
+async def get_run(
+    run_id: str,
+    auth: AuthContext = Depends(run_auth),
+):
+    """Get the status and result of an asynchronous run."""
+    job = await run_jobs.store.get(run_id)
+    if job is None or job.owner_id != auth.principal_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Run not found",
         )
-    except Exception as e:
-        logger.error(f"Billing settlement failed: {e}")
-        # Run succeeded but billing failed - log and continue
-        settle_result = type(
-            "SettleResult",
-            (),
-            {"debited": 0, "balance": auth_result.balance},
-        )()
 
+    return RunJobResponse.from_job(job)
+
+
+@router.post("/runs:stream")
+async def stream_run(
+    request: RunRequest,
+    auth: AuthContext = Depends(run_auth),
+    x_cmp_timeout_ms: Optional[int] = Header(default=None, gt=0),
+):
+    """
+    Execute an agent run and stream its output as Server-Sent Events.
+
+    Events:
+    - run: {"run_id"} as soon as the run is authorized
+    - token: {"chunk"} for each generated chunk, relayed from the Runner
+    - end: the full RunResponse, sent after billing is settled
+    - error: {"code", "message"} if the run fails mid-stream
+
+    Billing is settled when the stream closes, including when the client
+    disconnects early (with the usage consumed so far). The run ends with
+    an error after run_timeout, or the client's X-CMP-Timeout-Ms if shorter.
+    """
+    _check_instance_access(auth, request.instance_id)
+
+    run_id = str(uuid.uuid4())
+    set_run_attributes(run_id, request.instance_id)
+    logger.info(f"Starting streaming run {run_id} for instance {request.instance_id}")
+
+    tracker = RunTracker("stream", request.instance_id)
+    with tracker.track(status=None):
+        permit = await admit_run(request.instance_id)
+        try:
+            auth_result = await authorize_billing(request.instance_id)
+        except BaseException:
+            await permit.release()
+            raise
+
+    timeout = _run_timeout(x_cmp_timeout_ms)
+
+    async def events():
+        settled = False
+        progress = RunProgress()
+        try:
+            yield _sse("run", {"run_id": run_id})
+
+            async with aclosing(stream_from_runner(
+                run_id,
+                request.instance_id,
+                input_data=request.input.model_dump(),
+                metadata=request.metadata,
+                timeout=timeout,
+                tracker=tracker,
+                progress=progress,
+            )) as runner_events:
+                async for event, data in runner_events:
+                    if event != "end":
+                        yield _sse(event, data)
+                        continue
+
+                    output, usage = data["output"], data["usage"]
+                    billing = await settle_billing(auth_result, request.instance_id, usage)
+                    settled = True
+                    tracker.finish(status.HTTP_200_OK)
+
+                    logger.info(
+                        f"Completed streaming run {run_id}: "
+                        f"usage={usage}, debited={billing.debited}"
+                    )
+
+                    response = RunResponse(
+                        run_id=run_id,
+                        output=RunOutput(text=output.get("text"), data=output.get("data")),
+                        usage=usage_info(usage),
+                        billing=billing,
+                    )
+                    yield _sse("end", response.model_dump())
+        finally:
+            tracker.finish(499)  # Client disconnected (no-op if already finished)
+            # Shielded so a client disconnect cannot cancel the cleanup
+            with anyio.CancelScope(shield=True):
+                await permit.release()
+                if not settled:
+                    # Failed, cancelled or disconnected - settle what the run
+                    # consumed so far and release the rest of the reservation
+                    await settle_billing(auth_result, request.instance_id, progress.usage)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/runs:batch")
+async def batch_run(
+    request: RunBatchRequest,
+    auth: AuthContext = Depends(run_auth),
+):
+    """
+    Execute many inputs against one instance, streaming results as NDJSON.
+
+    Credits for the whole batch are authorized once up front. Inputs are
+    fanned out to the Runner at most ``concurrency`` at a time and each
+    result line is sent as soon as its run finishes, so lines arrive in
+    completion order (use ``index`` to match them to inputs). The final
+    summary line carries the aggregate usage and the single settlement.
+
+    Accepts a JWT, an API key or a widget session token (X-Widget-Token);
+    the latter two only for the instance they were issued for. If the
+    client disconnects, items still running are cancelled and the runs
+    that finished are settled.
+    """
+    _check_instance_access(auth, request.instance_id)
+
+    batch_id = str(uuid.uuid4())
+    set_run_attributes(batch_id, request.instance_id)
+    size = len(request.inputs)
+    plan_limits = await run_limiter.limits(request.instance_id)
+    concurrency = min(
+        request.concurrency or settings.run_batch_max_concurrency,
+        settings.run_batch_max_concurrency,
+        plan_limits.concurrent_runs or settings.run_batch_max_concurrency,
+    )
     logger.info(
-        f"Completed run {run_id}: "
-        f"usage={run_result.usage}, debited={settle_result.debited}"
+        f"Starting batch {batch_id} of {size} runs for instance {request.instance_id} "
+        f"(concurrency={concurrency})"
     )
 
-    # 4. Return response
-    return RunResponse(
-        run_id=run_id,
-        output=RunOutput(
-            text=run_result.output.get("text"),
-            data=run_result.output.get("data"),
-        ),
-        usage=UsageInfo(
-            llm_tokens_in=run_result.usage.get("llm_tokens_in", 0),
-            llm_tokens_out=run_result.usage.get("llm_tokens_out", 0),
-            tool_calls=run_result.usage.get("tool_calls", 0),
-            requests=run_result.usage.get("requests", 0),
-        ),
-        billing=BillingInfo(
-            debited=settle_result.debited,
-            balance=settle_result.balance,
-        ),
+    tracker = RunTracker("batch", request.instance_id)
+    with tracker.track(status=None):
+        # The batch counts as one run against the plan's limits
+        permit = await admit_run(request.instance_id)
+        try:
+            auth_result = await authorize_billing(request.instance_id, budget=RUN_BUDGET * size)
+        except BaseException:
+            await permit.release()
+            raise
+
+    semaphore = asyncio.Semaphore(concurrency)
+    hedge = await hedge_offering(request.instance_id)
+
+    async def run_item(index: int, run_input: RunInput) -> tuple[RunBatchItemResult, Optional[dict[str, int]]]:
+        async with semaphore:
+            try:
+                async with run_scheduler.slot(request.instance_id):
+                    with timed_stage("runner_execute", request.instance_id):
+                        run_result = await runner_client.execute(
+                            instance_id=request.instance_id,
+                            input_data=run_input.model_dump(),
+                            metadata=request.metadata,
+                            run_id=f"{batch_id}-{index}",
+                            hedge=hedge,
+                        )
+            except Exception as e:
+                logger.error(f"Batch {batch_id} item {index} failed: {e}")
+                return RunBatchItemResult(
+                    index=index,
+                    status="failed",
+                    error="Agent execution failed",
+                ), None
+
+        return RunBatchItemResult(
+            index=index,
+            status="succeeded",
+            output=RunOutput(
+                text=run_result.output.get("text"),
+                data=run_result.output.get("data"),
+            ),
+            usage=usage_info(run_result.usage),
+        ), run_result.usage
+
+    async def lines():
+        tasks = [
+            asyncio.create_task(run_item(index, run_input))
+            for index, run_input in enumerate(request.inputs)
+        ]
+        usage: Optional[dict[str, int]] = None  # None until a run is billed
+        succeeded = 0
+        settled = False
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, item_usage = await next_done
+                if item_usage is not None:
+                    usage = usage or {}
+                    for name, value in item_usage.items():
+                        usage[name] = usage.get(name, 0) + value
+                if item.status == "succeeded":
+                    succeeded += 1
+                yield item.model_dump_json() + "\n"
+
+            billing = await settle_billing(auth_result, request.instance_id, usage)
+            settled = True
+            tracker.finish(status.HTTP_200_OK)
+
+            logger.info(
+                f"Completed batch {batch_id}: succeeded={succeeded}/{size}, "
+                f"usage={usage}, debited={billing.debited}"
+            )
+
+            summary = RunBatchSummary(
+                batch_id=batch_id,
+                succeeded=succeeded,
+                failed=size - succeeded,
+                usage=usage_info(usage or {}),
+                billing=billing,
+            )
+            yield summary.model_dump_json() + "\n"
+        finally:
+            tracker.finish(499)  # Client disconnected (no-op if already finished)
+            for task in tasks:
+                task.cancel()
+            # Shielded so a client disconnect cannot cancel the cleanup
+            with anyio.CancelScope(shield=True):
+                await permit.release()
+                if not settled:
+                    # Client disconnected - settle the runs that did finish
+                    # (releasing the reservation if none did)
+                    await settle_billing(auth_result, request.instance_id, usage)
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
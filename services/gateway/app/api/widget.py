@@ -1,18 +1,58 @@
 """Widget API endpoint."""
 
+import asyncio
 import logging
-import secrets
-from typing import Optional
+import time
+import uuid
+from collections import deque
+from contextlib import aclosing
+from typing import Any, Awaitable, Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+import anyio
+import httpx
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from pydantic import BaseModel, Field, ValidationError
 
-from app.auth import User, jwt_auth
+from app.api.execution import (
+    RUN_BUDGET,
+    RunProgress,
+    admit_run,
+    authorize_billing,
+    settle_billing,
+    stream_from_runner,
+)
+from app.api.runs import MessageInput, RunInput, RunOutput
+from app.auth import User, WidgetTokenClaims, jwt_auth, widget_token_signer
+from app.billing.client import AuthorizeResult
+from app.config import settings
+from app.telemetry import RunTracker, set_run_attributes, timed_auth
+from app.widget import WidgetConfig, WidgetInstanceConfig, widget_configs
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/v1/widget", tags=["widget"])
 
+# WebSocket close codes: 4000 + the HTTP status of the equivalent error
+WS_CLOSE_UNAUTHORIZED = 4401
+WS_CLOSE_FORBIDDEN = 4403
+WS_CLOSE_TIMEOUT = 4408
+
+# Error frame codes for run admission errors, by HTTP status
+ADMISSION_ERROR_CODES = {
+    status.HTTP_402_PAYMENT_REQUIRED: "insufficient_credits",
+    status.HTTP_429_TOO_MANY_REQUESTS: "rate_limited",
+    status.HTTP_503_SERVICE_UNAVAILABLE: "upstream_unavailable",
+}
+
 
 class WidgetSessionInitRequest(BaseModel):
     """Request for widget session initialization."""
@@ -21,19 +61,6 @@ class WidgetSessionInitRequest(BaseModel):
     origin: str
 
 
-class WidgetConfig(BaseModel):
-    """Widget configuration."""
-
-    brand_name: Optional[str] = None
-    logo_url: Optional[str] = None
-    avatar_url: Optional[str] = None
-    primary_color: Optional[str] = "#6366f1"
-    accent_color: Optional[str] = "#8b5cf6"
-    font_family: Optional[str] = "Inter"
-    launcher_text: Optional[str] = "Chat with us"
-    position: Optional[str] = "bottom-right"
-
-
 class WidgetSessionInitResponse(BaseModel):
     """Response for widget session initialization."""
 
@@ -42,6 +69,46 @@ class WidgetSessionInitResponse(BaseModel):
     config: WidgetConfig
 
 
+class WidgetFrame(BaseModel):
+    """Frame sent by the widget over /v1/widget/ws."""
+
+    type: Literal["init", "message"]
+    token: Optional[str] = None  # init: the widget session token
+    content: Optional[str] = Field(
+        default=None,
+        min_length=1,
+        max_length=settings.widget_ws_max_message_chars,
+    )  # message: the user's message
+
+
+async def _load_config(instance_id: str) -> WidgetInstanceConfig:
+    """Get an instance's cached widget config, 404 if there is none."""
+    try:
+        config = await widget_configs.get(instance_id)
+    except httpx.HTTPError as e:
+        logger.error(f"Loading widget config for instance {instance_id} failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Widget configuration unavailable",
+        )
+
+    if config is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Instance not found",
+        )
+    return config
+
+
+def _check_origin(config: WidgetInstanceConfig, origin: str) -> None:
+    """Reject origins that are not on the instance's allowlist."""
+    if not config.origins.matches(origin):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Origin not allowed for this widget",
+        )
+
+
 @router.post("/session:init", response_model=WidgetSessionInitResponse)
 async def init_widget_session(
     request: WidgetSessionInitRequest,
@@ -53,20 +120,340 @@ async def init_widget_session(
     Creates a short-lived token for widget embedding.
     Validates origin against allowlist.
     Returns branding configuration.
+
+    The token is signed, bound to the instance and origin, and verified
+    locally by any gateway replica when passed as X-Widget-Token to
+    /v1/runs.
     """
-    # TODO: Validate origin against instance allowlist
-    # TODO: Fetch branding config from instance
+    config = await _load_config(request.instance_id)
+    _check_origin(config, request.origin)
 
-    # Generate widget token (short-lived)
-    widget_token = secrets.token_urlsafe(32)
+    # Sign a short-lived widget token
+    widget_token, claims = widget_token_signer.issue(
+        instance_id=request.instance_id,
+        origin=request.origin,
+        ttl_sec=settings.widget_token_ttl_sec,
+    )
 
     logger.info(
-        f"Initialized widget session for instance {request.instance_id} "
-        f"from origin {request.origin}"
+        f"Initialized widget session {claims.session_id} for instance "
+        f"{request.instance_id} from origin {request.origin}"
     )
 
     return WidgetSessionInitResponse(
         widget_token=widget_token,
-        expires_in_sec=3600,  # 1 hour
-        config=WidgetConfig(),
+        expires_in_sec=settings.widget_token_ttl_sec,
+        config=config.branding,
+    )
+
+
+@router.get("/{instance_id}/config", response_model=WidgetConfig)
+async def get_widget_config(
+    instance_id: str,
+    response: Response,
+    origin: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    Get an instance's widget branding.
+
+    Public, but browsers may only load it from allowed origins. Responses
+    carry an ETag; widgets revalidate with If-None-Match and get 304 while
+    the branding is unchanged.
+    """
+    config = await _load_config(instance_id)
+    if origin is not None:
+        _check_origin(config, origin)
+
+    headers = {"ETag": config.etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and config.etag in (
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return config.branding
+
+
+async def _open_conversation(websocket: WebSocket) -> Optional[WidgetTokenClaims]:
+    """
+    Verify the widget session token sent in the init frame.
+
+    Closes the connection and returns None if the token is missing,
+    invalid or expired, or was issued for another origin.
+    """
+    try:
+        message = await asyncio.wait_for(
+            websocket.receive(), timeout=settings.widget_ws_init_timeout_sec
+        )
+    except asyncio.TimeoutError:
+        await websocket.close(code=WS_CLOSE_TIMEOUT, reason="Init frame expected")
+        return None
+    if message["type"] == "websocket.disconnect":
+        return None
+
+    try:
+        frame = WidgetFrame.model_validate_json(message.get("text") or message.get("bytes") or "")
+    except ValidationError:
+        frame = None
+    if frame is None or frame.type != "init" or not frame.token:
+        await websocket.close(code=WS_CLOSE_UNAUTHORIZED, reason="Widget token required")
+        return None
+
+    with timed_auth("widget_token"):
+        try:
+            claims = widget_token_signer.verify(frame.token)
+        except ValueError as e:
+            logger.debug(f"Rejected widget token: {e}")
+            claims = None
+    if claims is None:
+        await websocket.close(code=WS_CLOSE_UNAUTHORIZED, reason="Invalid or expired widget token")
+        return None
+
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin != claims.origin:
+        await websocket.close(code=WS_CLOSE_FORBIDDEN, reason="Widget token not valid for this origin")
+        return None
+
+    return claims
+
+
+class WidgetConversation:
+    """
+    A widget session's conversation over one WebSocket.
+
+    Messages are answered one at a time, in order; messages sent while an
+    answer streams are queued. Credits are authorized for a block of
+    widget_ws_block_messages messages at a time, and the block's usage is
+    settled in one call once it is used up or the connection closes.
+    """
+
+    def __init__(self, websocket: WebSocket, claims: WidgetTokenClaims):
+        self.websocket = websocket
+        self.claims = claims
+        self.instance_id = claims.instance_id
+        self.history: deque[MessageInput] = deque(maxlen=settings.widget_ws_history_messages)
+        self._inbox: asyncio.Queue[Optional[Union[str, bytes]]] = asyncio.Queue()
+        self._closed = asyncio.Event()
+        self._overflowed = False  # Closed for sending too many messages
+        self._auth_result: Optional[AuthorizeResult] = None
+        self._block_left = 0  # Messages left in the reserved block
+        # Usage of the reserved block; None until one of its runs is billed
+        self._usage: Optional[dict[str, int]] = None
+
+    async def serve(self) -> None:
+        """Answer the widget's messages until it disconnects or goes idle."""
+        reader = asyncio.create_task(self._read())
+        try:
+            await self._send({"type": "ready", "session_id": self.claims.session_id})
+            while True:
+                try:
+                    data = await asyncio.wait_for(
+                        self._inbox.get(), timeout=settings.widget_ws_idle_timeout_sec
+                    )
+                except asyncio.TimeoutError:
+                    await self.websocket.close(reason="Conversation idle")
+                    return
+                if data is None:
+                    return  # Disconnected
+
+                try:
+                    frame = WidgetFrame.model_validate_json(data)
+                except ValidationError:
+                    frame = None
+                if frame is None or frame.type != "message" or frame.content is None:
+                    await self._send_error("invalid_frame", "Expected a message frame")
+                    continue
+
+                if self.claims.expires_at <= time.time():
+                    await self.websocket.close(
+                        code=WS_CLOSE_UNAUTHORIZED, reason="Widget token expired"
+                    )
+                    return
+
+                if not await self._until_closed(self._answer(frame.content)):
+                    return
+        except WebSocketDisconnect:
+            pass
+        finally:
+            reader.cancel()
+            # Shielded so a closing connection cannot cancel the settlement
+            with anyio.CancelScope(shield=True):
+                await asyncio.gather(reader, return_exceptions=True)
+                await self._settle()
+            if self._overflowed:
+                await self.websocket.close(code=1008, reason="Too many pending messages")
+
+    async def _read(self) -> None:
+        """Queue the widget's frames; queues None once it disconnects."""
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if self._inbox.qsize() >= settings.widget_ws_max_pending_messages:
+                    self._overflowed = True
+                    return
+                self._inbox.put_nowait(message.get("text") or message.get("bytes") or "")
+        finally:
+            self._closed.set()
+            self._inbox.put_nowait(None)
+
+    async def _until_closed(self, work: Awaitable[None]) -> bool:
+        """Await ``work``; False if it was cancelled as the connection closed."""
+        task = asyncio.ensure_future(work)
+        closed = asyncio.create_task(self._closed.wait())
+        try:
+            await asyncio.wait({task, closed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        if task.cancelled():
+            logger.info(f"Widget session {self.claims.session_id} disconnected, run cancelled")
+            return False
+        task.result()
+        return True
+
+    async def _answer(self, content: str) -> None:
+        """Run the instance's flow on a user message and stream the answer."""
+        run_id = str(uuid.uuid4())
+        set_run_attributes(run_id, self.instance_id)
+
+        tracker = RunTracker("widget_ws", self.instance_id)
+        try:
+            with tracker.track(status=None):
+                permit = await admit_run(self.instance_id)
+                try:
+                    await self._reserve()
+                except BaseException:
+                    await permit.release()
+                    raise
+        except HTTPException as e:
+            await self._send_error(ADMISSION_ERROR_CODES.get(e.status_code, "unavailable"), e.detail)
+            return
+
+        message = MessageInput(role="user", content=content)
+        progress = RunProgress()
+        usage: Optional[dict[str, int]] = None
+        try:
+            await self._send({"type": "run", "run_id": run_id})
+
+            async with aclosing(stream_from_runner(
+                run_id,
+                self.instance_id,
+                input_data=RunInput(messages=[*self.history, message]).model_dump(),
+                # Langflow keeps the conversation's memory under its session
+                metadata={"session_id": self.claims.session_id},
+                timeout=settings.run_timeout,
+                tracker=tracker,
+                progress=progress,
+            )) as runner_events:
+                async for event, data in runner_events:
+                    if event != "end":
+                        await self._send({"type": event, **data})
+                        continue
+
+                    output, usage = data["output"], data["usage"]
+                    tracker.finish(status.HTTP_200_OK)
+
+                    self.history.append(message)
+                    if output.get("text"):
+                        self.history.append(MessageInput(role="assistant", content=output["text"]))
+                    logger.info(
+                        f"Completed widget run {run_id} in session "
+                        f"{self.claims.session_id}: usage={usage}"
+                    )
+
+                    await self._send({
+                        "type": "end",
+                        "run_id": run_id,
+                        "output": RunOutput(
+                            text=output.get("text"),
+                            data=output.get("data"),
+                        ).model_dump(),
+                    })
+        finally:
+            tracker.finish(499)  # Client disconnected (no-op if already finished)
+            # Runs that did not complete are billed for what they consumed
+            self._record(usage if usage is not None else progress.usage)
+            with anyio.CancelScope(shield=True):
+                await permit.release()
+
+    async def _reserve(self) -> None:
+        """Cover one more message, authorizing a new block of credits if needed."""
+        if self._auth_result is None or self._block_left == 0:
+            await self._settle()
+            self._auth_result = await authorize_billing(
+                self.instance_id,
+                budget=RUN_BUDGET * settings.widget_ws_block_messages,
+            )
+            self._block_left = settings.widget_ws_block_messages
+        self._block_left -= 1
+
+    def _record(self, usage: Optional[dict[str, int]]) -> None:
+        """Add a run's usage to the current block (None if the run is not billed)."""
+        if usage is None:
+            return
+        self._usage = self._usage or {}
+        for name, value in usage.items():
+            self._usage[name] = self._usage.get(name, 0) + value
+
+    async def _settle(self) -> None:
+        """Settle the current block's usage and release the rest of it."""
+        if self._auth_result is None:
+            return
+        auth_result, self._auth_result = self._auth_result, None
+        usage, self._usage = self._usage, None
+        billing = await settle_billing(auth_result, self.instance_id, usage)
+        logger.info(
+            f"Settled widget session {self.claims.session_id}: "
+            f"usage={usage}, debited={billing.debited}"
+        )
+
+    async def _send(self, frame: dict[str, Any]) -> None:
+        """Send a frame to the widget."""
+        await self.websocket.send_json(frame)
+
+    async def _send_error(self, code: str, message: str) -> None:
+        """Tell the widget a message failed."""
+        await self._send({"type": "error", "code": code, "message": message})
+
+
+@router.websocket("/ws")
+async def widget_conversation(websocket: WebSocket):
+    """
+    Hold a widget conversation over a WebSocket.
+
+    The widget sends {"type": "init", "token"} with its session token as
+    the first frame, then {"type": "message", "content"} for each user
+    message. The token is verified once for the connection, which is
+    closed with 4401 when the token is invalid or expires and 4403 when
+    the Origin does not match it.
+
+    Frames sent back:
+    - ready: {"session_id"} once the token is accepted
+    - run: {"run_id"} when the run for a message starts
+    - token: {"chunk"} for each generated chunk, relayed from the Runner
+    - end: {"run_id", "output"} when the run completes
+    - error: {"code", "message"} if a message fails; the conversation goes on
+
+    Each run gets the conversation's last widget_ws_history_messages
+    messages and the widget session ID. Credits are reserved for blocks of
+    messages rather than per message (see WidgetConversation).
+    """
+    await websocket.accept()
+    try:
+        claims = await _open_conversation(websocket)
+    except WebSocketDisconnect:
+        return
+    if claims is None:
+        return
+
+    logger.info(
+        f"Opened widget conversation {claims.session_id} for instance {claims.instance_id}"
     )
+    await WidgetConversation(websocket, claims).serve()
+    logger.info(f"Closed widget conversation {claims.session_id}")
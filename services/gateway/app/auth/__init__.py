@@ -1,22 +1,53 @@
 """Authentication module."""
 
-from .api_key import APIKeyAuth, APIKeyContext, api_key_auth, api_key_auth_optional
-from .combined import AuthContext, CombinedAuth, combined_auth, combined_auth_optional
-from .jwt import JWTAuth, User, jwt_auth
+from .api_key import (
+    APIKeyAuth,
+    APIKeyCache,
+    APIKeyContext,
+    APIKeyVerifier,
+    api_key_auth,
+    api_key_auth_optional,
+    api_key_cache,
+    api_key_verifier,
+)
+from .combined import AuthContext, CombinedAuth, combined_auth, combined_auth_optional, run_auth
+from .jwt import ClaimsCache, JWKSStore, JWTAuth, User, claims_cache, jwks_store, jwt_auth
+from .widget_token import (
+    WidgetTokenAuth,
+    WidgetTokenClaims,
+    WidgetTokenSigner,
+    widget_token_auth,
+    widget_token_signer,
+)
 
 __all__ = [
     # JWT auth
     "JWTAuth",
     "User",
     "jwt_auth",
+    "JWKSStore",
+    "jwks_store",
+    "ClaimsCache",
+    "claims_cache",
     # API key auth
     "APIKeyAuth",
     "APIKeyContext",
     "api_key_auth",
     "api_key_auth_optional",
-    # Combined auth (supports both)
+    "APIKeyCache",
+    "api_key_cache",
+    "APIKeyVerifier",
+    "api_key_verifier",
+    # Widget session tokens
+    "WidgetTokenAuth",
+    "WidgetTokenClaims",
+    "WidgetTokenSigner",
+    "widget_token_auth",
+    "widget_token_signer",
+    # Combined auth (supports all of the above)
     "AuthContext",
     "CombinedAuth",
     "combined_auth",
     "combined_auth_optional",
+    "run_auth",
 ]
@@ -1,17 +1,42 @@
 """API Key authentication for Gateway API."""
 
+import base64
+import hashlib
+import hmac
 import logging
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 import httpx
 from fastapi import HTTPException, Request, status
 from fastapi.security import APIKeyHeader
+from prometheus_client import Counter
 
+from app.cache import SingleflightCache
 from app.config import settings
+from app.telemetry import timed_auth
+
+from .keyring import parse_keyring
 
 logger = logging.getLogger(__name__)
 
+API_KEY_CACHE_LOOKUPS = Counter(
+    "gateway_api_key_cache_lookups_total",
+    "API key introspection cache lookups",
+    ["result"],  # hit, negative_hit, miss, coalesced
+)
+
+API_KEYS_REJECTED = Counter(
+    "gateway_api_keys_rejected_total",
+    "API keys rejected locally, without introspection",
+    ["reason"],  # malformed, unknown_key, bad_mac, legacy_disabled
+)
+
+KEY_PREFIX = "cmp_sk_"
+
+# Bytes of the HMAC-SHA256 kept in signed keys
+MAC_BYTES = 16
+
 
 @dataclass
 class APIKeyContext:
@@ -39,10 +64,129 @@ class APIKeyContext:
         )
 
 
+class APIKeyVerifier:
+    """Checks API key MACs against the keyring shared with the Control Plane.
+
+    Signed keys are ``cmp_sk_<kid>.<random>.<mac>``, where ``mac`` is the
+    HMAC-SHA256 of everything before it under key ``kid``, truncated to
+    128 bits. Checking it takes microseconds, so forged and mistyped keys
+    never reach the introspection cache or the Control Plane. Keys issued
+    before the keyring existed (``cmp_sk_<random>``, no ``.``) carry no MAC
+    and can only be introspected.
+    """
+
+    def __init__(self, keys: dict[str, bytes]):
+        # Keyed HMAC states, copied per key instead of re-keying each time
+        self._macs = {
+            kid: hmac.new(secret, digestmod=hashlib.sha256)
+            for kid, secret in keys.items()
+        }
+
+    def check(self, api_key: str) -> Optional[str]:
+        """
+        Check a key's format and MAC.
+
+        Returns None if the key may be introspected, else the reason it
+        is rejected.
+        """
+        if not api_key.startswith(KEY_PREFIX):
+            return "malformed"
+        if "." not in api_key:
+            return None if settings.api_key_legacy_enabled else "legacy_disabled"
+        if not self._macs:
+            return None
+
+        signed, _, mac = api_key.rpartition(".")
+        kid, sep, random_part = signed[len(KEY_PREFIX):].partition(".")
+        if not sep or not kid or not random_part or not mac:
+            return "malformed"
+        if kid not in self._macs:
+            return "unknown_key"
+
+        expected = self._macs[kid].copy()
+        expected.update(signed.encode())
+        digest = base64.urlsafe_b64encode(expected.digest()[:MAC_BYTES]).rstrip(b"=")
+        if not hmac.compare_digest(mac.encode(), digest):
+            return "bad_mac"
+        return None
+
+
+# Process-wide verifier
+api_key_verifier = APIKeyVerifier(parse_keyring(settings.api_key_mac_keys, "api_key_mac_keys"))
+
+
+class APIKeyCache:
+    """Process-wide cache of API key introspection results.
+
+    Entries are keyed by the SHA-256 of the key (the same hash the Control
+    Plane stores), so raw keys are never held in memory. Valid keys are
+    cached for ``api_key_cache_ttl_sec``; invalid or revoked keys are cached
+    briefly so that repeated bad keys do not hammer the Control Plane.
+    Concurrent lookups for the same key share a single introspection call.
+    """
+
+    def __init__(self):
+        self._cache: SingleflightCache[APIKeyContext] = SingleflightCache(
+            "API key context",
+            API_KEY_CACHE_LOOKUPS,
+            max_entries=lambda: settings.api_key_cache_max_entries,
+            negative_ttl=self._negative_ttl,
+        )
+
+    @staticmethod
+    def key_hash(api_key: str) -> str:
+        """SHA-256 hex digest of an API key."""
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    async def get(
+        self,
+        api_key: str,
+        introspect: Callable[[str], Awaitable[dict[str, Any]]],
+    ) -> APIKeyContext:
+        """Get the context for an API key, introspecting it on a miss.
+
+        Raises:
+            HTTPException: If the key is invalid, revoked, or cannot be checked
+        """
+        async def load() -> tuple[APIKeyContext, float]:
+            context = APIKeyContext.from_introspection(await introspect(api_key))
+            return context, settings.api_key_cache_ttl_sec
+
+        return await self._cache.get(self.key_hash(api_key), load)
+
+    def invalidate(self, key_hash: str) -> bool:
+        """Drop a key from the cache, e.g. after it has been revoked.
+
+        An in-flight lookup may return pre-revocation data, so it is detached
+        and the next request introspects again. Returns True if the key was
+        cached or being looked up.
+        """
+        return self._cache.invalidate(key_hash)
+
+    def clear(self) -> None:
+        """Drop every cached key."""
+        self._cache.clear()
+
+    @staticmethod
+    def _negative_ttl(error: Exception) -> Optional[float]:
+        """Only cache definitive rejections, not Control Plane failures."""
+        if isinstance(error, HTTPException) and error.status_code in (
+            status.HTTP_401_UNAUTHORIZED,
+            status.HTTP_403_FORBIDDEN,
+        ):
+            return settings.api_key_negative_cache_ttl_sec
+        return None
+
+
+# Shared by every APIKeyAuth instance (including the one in CombinedAuth)
+api_key_cache = APIKeyCache()
+
+
 class APIKeyAuth(APIKeyHeader):
     """API Key authentication dependency for FastAPI.
 
-    Validates API keys against the Control Plane introspection endpoint.
+    Validates API keys against the Control Plane introspection endpoint,
+    through the process-wide ``api_key_cache``.
     API keys should be passed in the X-API-Key header.
     """
 
@@ -109,6 +253,11 @@ class APIKeyAuth(APIKeyHeader):
 
     async def __call__(self, request: Request) -> Optional[APIKeyContext]:
         """Validate API key and return context."""
+        with timed_auth("api_key"):
+            return await self._authenticate(request)
+
+    async def _authenticate(self, request: Request) -> Optional[APIKeyContext]:
+        """Validate the X-API-Key header, using the introspection cache."""
         api_key: str = await super().__call__(request)
 
         if api_key is None:
@@ -119,17 +268,17 @@ class APIKeyAuth(APIKeyHeader):
                 )
             return None
 
-        # Validate key format (cmp_sk_ prefix)
-        if not api_key.startswith("cmp_sk_"):
+        # Validate key format and MAC locally
+        reason = api_key_verifier.check(api_key)
+        if reason is not None:
+            API_KEYS_REJECTED.labels(reason=reason).inc()
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid API key format",
+                detail="Invalid API key",
             )
 
-        # Introspect key against Control Plane
-        introspection = await self.introspect_key(api_key)
-
-        return APIKeyContext.from_introspection(introspection)
+        # Introspect key against Control Plane (cached)
+        return await api_key_cache.get(api_key, self.introspect_key)
 
 
 # Dependency for API key protected routes
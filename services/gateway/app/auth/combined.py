@@ -8,21 +8,24 @@ from fastapi import Depends, HTTPException, Request, status
 
 from .api_key import APIKeyAuth, APIKeyContext
 from .jwt import JWTAuth, User
+from .widget_token import WidgetTokenAuth, WidgetTokenClaims
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class AuthContext:
-    """Unified authentication context for both JWT and API key auth.
+    """Unified authentication context for JWT, API key and widget token auth.
 
-    This allows routes to accept either authentication method and get
+    This allows routes to accept any authentication method and get
     a consistent interface for accessing tenant/instance information.
     """
 
-    auth_type: str  # "jwt" or "api_key"
+    auth_type: str  # "jwt", "api_key" or "widget"
     user_id: Optional[str] = None  # Keycloak user ID (for JWT)
-    instance_id: Optional[str] = None  # Instance ID (for API key)
+    instance_id: Optional[str] = None  # Instance ID (for API key and widget)
+    key_id: Optional[str] = None  # API key ID (for API key)
+    session_id: Optional[str] = None  # Widget session ID (for widget)
     tenant_id: Optional[str] = None
     org_id: Optional[str] = None
     scopes: list[str] = None
@@ -34,6 +37,22 @@ class AuthContext:
         if self.entitlements is None:
             self.entitlements = {}
 
+    @property
+    def principal_id(self) -> str:
+        """Stable ID of the caller, e.g. for owning asynchronous runs."""
+        if self.auth_type == "jwt":
+            return self.user_id or ""
+        if self.auth_type == "api_key":
+            return f"api_key:{self.key_id}"
+        return f"widget:{self.session_id}"
+
+    def can_access_instance(self, instance_id: str) -> bool:
+        """Whether the caller may use the instance.
+
+        API keys and widget tokens are bound to a single instance.
+        """
+        return self.instance_id is None or self.instance_id == instance_id
+
     @classmethod
     def from_user(cls, user: User) -> "AuthContext":
         """Create AuthContext from JWT User."""
@@ -56,12 +75,23 @@ class AuthContext:
         return cls(
             auth_type="api_key",
             instance_id=api_key_ctx.instance_id,
+            key_id=api_key_ctx.key_id,
             tenant_id=api_key_ctx.tenant_id,
             org_id=api_key_ctx.org_id,
             scopes=api_key_ctx.scopes,
             entitlements=api_key_ctx.entitlements,
         )
 
+    @classmethod
+    def from_widget_token(cls, claims: WidgetTokenClaims) -> "AuthContext":
+        """Create AuthContext from verified widget token claims."""
+        return cls(
+            auth_type="widget",
+            instance_id=claims.instance_id,
+            session_id=claims.session_id,
+            scopes=["run"],
+        )
+
 
 class CombinedAuth:
     """Combined authentication that accepts either JWT or API key.
@@ -73,17 +103,25 @@ class CombinedAuth:
             pass
 
     Priority:
-        1. X-API-Key header (for widget/API usage)
-        2. Authorization: Bearer <JWT> (for console UI)
+        1. X-Widget-Token header (embedded widget), if allow_widget_token
+        2. X-API-Key header (for widget/API usage)
+        3. Authorization: Bearer <JWT> (for console UI)
     """
 
-    def __init__(self, auto_error: bool = True):
+    def __init__(self, auto_error: bool = True, allow_widget_token: bool = False):
         self.auto_error = auto_error
+        self.allow_widget_token = allow_widget_token
         self._jwt_auth = JWTAuth(auto_error=False)
         self._api_key_auth = APIKeyAuth(auto_error=False)
+        self._widget_token_auth = WidgetTokenAuth(auto_error=False)
 
     async def __call__(self, request: Request) -> Optional[AuthContext]:
-        """Authenticate request using either API key or JWT."""
+        """Authenticate request using a widget token, API key or JWT."""
+
+        # Widget tokens are verified locally, without a network call
+        if self.allow_widget_token and request.headers.get("X-Widget-Token"):
+            claims = await self._widget_token_auth(request)
+            return AuthContext.from_widget_token(claims)
 
         # Try API key first (for widget/API usage)
         api_key = request.headers.get("X-API-Key")
@@ -121,3 +159,5 @@ class CombinedAuth:
 # Dependencies for routes
 combined_auth = CombinedAuth()
 combined_auth_optional = CombinedAuth(auto_error=False)
+# Run routes also accept widget session tokens
+run_auth = CombinedAuth(allow_widget_token=True)
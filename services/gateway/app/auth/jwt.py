@@ -1,18 +1,31 @@
 """JWT authentication for Gateway API."""
 
+import asyncio
+import hashlib
 import logging
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 import httpx
 import jwt
 from fastapi import HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from prometheus_client import Counter
 
 from app.config import settings
+from app.telemetry import timed_auth
+from app.upstream import create_pooled_client
 
 logger = logging.getLogger(__name__)
 
+JWT_CLAIMS_CACHE_LOOKUPS = Counter(
+    "gateway_jwt_claims_cache_lookups_total",
+    "Verified-claims cache lookups for bearer tokens",
+    ["result"],  # hit, miss
+)
+
 
 @dataclass
 class User:
@@ -39,26 +52,211 @@ class User:
         )
 
 
-class JWKSClient:
-    """Client for fetching JWKS from OIDC issuer."""
+class JWKSStore:
+    """Async, in-memory store of the OIDC issuer's signing keys.
 
-    _jwks_client: Optional[jwt.PyJWKClient] = None
+    Keys are fetched at startup and refreshed in the background, so looking
+    up a key on the request path never does I/O. A token signed with an
+    unknown ``kid`` (e.g. right after the issuer rotates keys) triggers a
+    single refetch, rate-limited to one per ``jwks_min_refetch_interval_sec``.
+    """
 
-    @classmethod
-    async def get_signing_key(cls, token: str) -> jwt.PyJWK:
-        """Get the signing key for a JWT token."""
-        if cls._jwks_client is None:
-            jwks_uri = f"{settings.oidc_issuer}/protocol/openid-connect/certs"
-            cls._jwks_client = jwt.PyJWKClient(jwks_uri)
+    def __init__(self):
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._fetch_lock = asyncio.Lock()
+        self._last_fetch: Optional[float] = None  # time.monotonic()
+        self._fetches_done = 0  # Fetches finished, successful or not
+        self._rotation_listeners: list[Callable[[set[str]], None]] = []
+
+    @property
+    def jwks_uri(self) -> str:
+        """JWKS endpoint of the OIDC issuer (Keycloak)."""
+        return f"{settings.oidc_issuer}/protocol/openid-connect/certs"
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Get or create HTTP client for the OIDC issuer."""
+        if self._http_client is None:
+            self._http_client = create_pooled_client(
+                "oidc",
+                timeout=settings.control_plane_timeout,
+            )
+        return self._http_client
 
+    async def start(self) -> None:
+        """Prefetch keys and start background refresh (called from the app lifespan)."""
         try:
-            return cls._jwks_client.get_signing_key_from_jwt(token)
-        except jwt.exceptions.PyJWKClientError as e:
-            logger.error(f"Failed to get signing key: {e}")
+            await self.refresh()
+        except Exception as e:
+            # Not fatal: the first request with a token will retry the fetch
+            logger.error(f"Initial JWKS fetch failed: {e}")
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def aclose(self) -> None:
+        """Stop background refresh and close the HTTP client."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def add_rotation_listener(self, listener: Callable[[set[str]], None]) -> None:
+        """Call ``listener`` with the removed kids whenever keys are retired."""
+        self._rotation_listeners.append(listener)
+
+    async def get_signing_key(self, token: str) -> jwt.PyJWK:
+        """Get the signing key for a JWT token."""
+        kid = jwt.get_unverified_header(token).get("kid")
+
+        key = self._keys.get(kid)
+        if key is None:
+            await self._refetch_for_unknown_kid()
+            key = self._keys.get(kid)
+
+        if key is None:
+            logger.warning(f"No signing key found for kid {kid}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token",
             )
+        return key
+
+    async def refresh(self) -> None:
+        """Fetch the key set and swap it in."""
+        async with self._fetch_lock:
+            await self._fetch()
+
+    async def _fetch(self) -> None:
+        """Fetch the key set; callers must hold the fetch lock."""
+        self._last_fetch = time.monotonic()
+        try:
+            response = await self.http_client.get(self.jwks_uri)
+            response.raise_for_status()
+            jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        finally:
+            self._fetches_done += 1
+
+        keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+        added = keys.keys() - self._keys.keys()
+        removed = self._keys.keys() - keys.keys()
+        self._keys = keys
+
+        if added or removed:
+            logger.info(
+                f"JWKS updated: {len(keys)} keys, "
+                f"added={sorted(added)}, removed={sorted(removed)}"
+            )
+        if removed:
+            for listener in self._rotation_listeners:
+                listener(set(removed))
+
+    async def _refetch_for_unknown_kid(self) -> None:
+        """Refetch keys once for an unknown kid, unless fetched recently."""
+        fetches_done = self._fetches_done
+        async with self._fetch_lock:
+            if self._fetches_done != fetches_done:
+                return  # A fetch finished while we waited; share its result
+            if (
+                self._last_fetch is not None
+                and time.monotonic() - self._last_fetch < settings.jwks_min_refetch_interval_sec
+            ):
+                return
+            try:
+                await self._fetch()
+            except Exception as e:
+                logger.error(f"JWKS refetch failed: {e}")
+
+    async def _refresh_loop(self) -> None:
+        """Refresh keys periodically; retry sooner after a failure."""
+        interval = settings.jwks_refresh_interval_sec
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+                interval = settings.jwks_refresh_interval_sec
+            except Exception as e:
+                logger.warning(f"JWKS refresh failed: {e}")
+                interval = min(
+                    settings.jwks_min_refetch_interval_sec,
+                    settings.jwks_refresh_interval_sec,
+                )
+
+
+# Singleton JWKS store
+jwks_store = JWKSStore()
+
+
+@dataclass
+class _VerifiedToken:
+    """A verified token's user, valid until the token expires."""
+
+    user: User
+    kid: Optional[str]
+    expires_at: float  # Token exp (epoch seconds)
+
+
+class ClaimsCache:
+    """Bounded LRU of verified bearer tokens.
+
+    Clients reuse the same access token for many requests, so the result of
+    RS256 verification is cached under the token's SHA-256 until the token's
+    ``exp``. Entries signed with a key that the issuer retires are evicted.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[str, _VerifiedToken] = OrderedDict()
+
+    @staticmethod
+    def token_digest(token: str) -> str:
+        """SHA-256 hex digest of a token."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, digest: str) -> Optional[User]:
+        """Get the user for a previously verified, unexpired token."""
+        entry = self._entries.get(digest)
+        if entry is not None:
+            if entry.expires_at > time.time():
+                self._entries.move_to_end(digest)
+                JWT_CLAIMS_CACHE_LOOKUPS.labels(result="hit").inc()
+                return entry.user
+            del self._entries[digest]
+
+        JWT_CLAIMS_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    def put(self, digest: str, user: User, kid: Optional[str]) -> None:
+        """Cache a verified token until its exp."""
+        exp = user.claims.get("exp")
+        max_entries = settings.jwt_claims_cache_max_entries
+        if not isinstance(exp, (int, float)) or max_entries <= 0:
+            return
+
+        self._entries[digest] = _VerifiedToken(user=user, kid=kid, expires_at=exp)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+
+    def evict_kids(self, kids: set[str]) -> None:
+        """Drop tokens signed with any of the given (retired) keys."""
+        stale = [digest for digest, entry in self._entries.items() if entry.kid in kids]
+        for digest in stale:
+            del self._entries[digest]
+        if stale:
+            logger.info(f"Evicted {len(stale)} cached tokens after JWKS rotation")
+
+    def clear(self) -> None:
+        """Drop every cached token."""
+        self._entries.clear()
+
+
+# Singleton verified-claims cache
+claims_cache = ClaimsCache()
+jwks_store.add_rotation_listener(claims_cache.evict_kids)
 
 
 class JWTAuth(HTTPBearer):
@@ -69,6 +267,11 @@ class JWTAuth(HTTPBearer):
 
     async def __call__(self, request: Request) -> Optional[User]:
         """Validate JWT and return User."""
+        with timed_auth("jwt"):
+            return await self._authenticate(request)
+
+    async def _authenticate(self, request: Request) -> Optional[User]:
+        """Validate the bearer token, using the verified-claims cache."""
         credentials: HTTPAuthorizationCredentials = await super().__call__(request)
 
         if credentials is None:
@@ -81,9 +284,15 @@ class JWTAuth(HTTPBearer):
 
         token = credentials.credentials
 
+        # Skip verification for tokens already verified and not yet expired
+        digest = claims_cache.token_digest(token)
+        user = claims_cache.get(digest)
+        if user is not None:
+            return user
+
         try:
             # Get signing key from JWKS
-            signing_key = await JWKSClient.get_signing_key(token)
+            signing_key = await jwks_store.get_signing_key(token)
 
             # Decode and validate token
             claims = jwt.decode(
@@ -100,7 +309,9 @@ class JWTAuth(HTTPBearer):
                 },
             )
 
-            return User.from_claims(claims)
+            user = User.from_claims(claims)
+            claims_cache.put(digest, user, signing_key.key_id)
+            return user
 
         except jwt.ExpiredSignatureError:
             raise HTTPException(
@@ -0,0 +1,29 @@
+"""HMAC keyrings shared with the Control Plane.
+
+Keyrings are configured as ``kid:secret,kid:secret``. The first key signs,
+every key verifies. ``kid`` is 1-16 characters from ``[A-Za-z0-9_-]``
+because it is embedded in tokens and API keys. The format is the shared
+contract in docs/cmp/19-Integration-Contracts-Pack-v1.md (Appendix B).
+The Control Plane's ``instances.keys.parse_keyring`` applies the same
+rules.
+"""
+
+import re
+
+KID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,16}")
+
+
+def parse_keyring(value: str, setting: str) -> dict[str, bytes]:
+    """Parse ``kid:secret,kid:secret`` (the value of ``setting``) into an ordered keyring."""
+    keys: dict[str, bytes] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kid, sep, secret = item.partition(":")
+        if not sep or not secret or not KID_PATTERN.fullmatch(kid):
+            raise ValueError(
+                f"{setting} entries must be kid:secret, kid matching {KID_PATTERN.pattern}"
+            )
+        keys[kid] = secret.encode()
+    return keys
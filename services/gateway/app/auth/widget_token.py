@@ -0,0 +1,206 @@
+"""Stateless widget session tokens.
+
+``POST /v1/widget/session:init`` issues a short-lived token bound to an
+instance and the embedding page's origin. The token is a compact,
+HMAC-SHA256 signed payload, so any gateway replica can verify it locally
+(no store lookup, no Control Plane call) on every widget run. That needs
+the same keyring in every process, so the gateway refuses to start
+without ``widget_token_keys``.
+
+Format: ``wt1.<kid>.<payload>.<signature>``, where payload is base64url
+JSON and the signature covers everything before it. ``kid`` names the key
+in the keyring that signed the token, so keys can be rotated: add the new
+key first in ``widget_token_keys`` (it signs new tokens) and keep the old
+one until tokens it signed have expired.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.security import APIKeyHeader
+
+from app.config import settings
+from app.telemetry import timed_auth
+
+from .keyring import parse_keyring
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = "wt1"
+
+
+@dataclass
+class WidgetTokenClaims:
+    """Claims carried by a widget token."""
+
+    instance_id: str
+    origin: str
+    session_id: str
+    expires_at: int  # Unix timestamp
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class WidgetTokenSigner:
+    """Issues and verifies widget tokens against a keyring.
+
+    The first key in the keyring signs new tokens; every key verifies.
+    """
+
+    def __init__(self, keys: dict[str, bytes]):
+        if not keys:
+            raise ValueError("Widget token keyring is empty")
+        self.signing_kid = next(iter(keys))
+        # Keyed HMAC states, copied per token instead of re-keying each time
+        self._macs = {
+            kid: hmac.new(secret, digestmod=hashlib.sha256)
+            for kid, secret in keys.items()
+        }
+
+    def issue(self, instance_id: str, origin: str, ttl_sec: int) -> tuple[str, WidgetTokenClaims]:
+        """Sign a token for a new widget session."""
+        claims = WidgetTokenClaims(
+            instance_id=instance_id,
+            origin=origin,
+            session_id=secrets.token_urlsafe(12),
+            expires_at=int(time.time()) + ttl_sec,
+        )
+        payload = _b64encode(json.dumps(
+            {
+                "i": claims.instance_id,
+                "o": claims.origin,
+                "s": claims.session_id,
+                "e": claims.expires_at,
+            },
+            separators=(",", ":"),
+        ).encode())
+        signed = f"{TOKEN_VERSION}.{self.signing_kid}.{payload}"
+        return f"{signed}.{self._sign(self.signing_kid, signed)}", claims
+
+    def verify(self, token: str) -> WidgetTokenClaims:
+        """
+        Verify a token's signature and expiry.
+
+        Raises:
+            ValueError: If the token is malformed, forged, or expired
+        """
+        signed, _, signature = token.rpartition(".")
+        parts = signed.split(".")
+        if len(parts) != 3 or parts[0] != TOKEN_VERSION:
+            raise ValueError("malformed token")
+
+        kid = parts[1]
+        if kid not in self._macs:
+            raise ValueError("unknown signing key")
+        if not hmac.compare_digest(signature, self._sign(kid, signed)):
+            raise ValueError("bad signature")
+
+        try:
+            data = json.loads(_b64decode(parts[2]))
+            claims = WidgetTokenClaims(
+                instance_id=data["i"],
+                origin=data["o"],
+                session_id=data["s"],
+                expires_at=int(data["e"]),
+            )
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise ValueError("malformed payload")
+
+        if claims.expires_at <= time.time():
+            raise ValueError("token expired")
+        return claims
+
+    def _sign(self, kid: str, signed: str) -> str:
+        mac = self._macs[kid].copy()
+        mac.update(signed.encode())
+        return _b64encode(mac.digest())
+
+
+def _create_signer() -> WidgetTokenSigner:
+    """
+    Create the signer from settings.
+
+    Raises:
+        ValueError: If widget_token_keys is unset and the ephemeral key is
+            not explicitly enabled
+    """
+    keys = parse_keyring(settings.widget_token_keys, "widget_token_keys")
+    if not keys:
+        if not settings.widget_token_ephemeral_key:
+            raise ValueError(
+                "widget_token_keys must be set so every worker and replica "
+                "verifies widget tokens (set widget_token_ephemeral_key for "
+                "single-process development only)"
+            )
+        # Tokens only verify in this process and do not survive restarts
+        logger.warning("widget_token_keys is not set; using an ephemeral key (development only)")
+        keys = {"ephemeral": secrets.token_bytes(32)}
+    return WidgetTokenSigner(keys)
+
+
+# Process-wide signer
+widget_token_signer = _create_signer()
+
+
+class WidgetTokenAuth(APIKeyHeader):
+    """Widget token authentication dependency for FastAPI.
+
+    Tokens are passed in the X-Widget-Token header. Browser requests whose
+    Origin differs from the one the token was issued for are rejected.
+    """
+
+    def __init__(self, auto_error: bool = True):
+        super().__init__(name="X-Widget-Token", auto_error=auto_error)
+
+    async def __call__(self, request: Request) -> Optional[WidgetTokenClaims]:
+        """Verify the widget token and return its claims."""
+        with timed_auth("widget_token"):
+            return await self._authenticate(request)
+
+    async def _authenticate(self, request: Request) -> Optional[WidgetTokenClaims]:
+        token: str = await super().__call__(request)
+
+        if token is None:
+            if self.auto_error:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Widget token required",
+                )
+            return None
+
+        try:
+            claims = widget_token_signer.verify(token)
+        except ValueError as e:
+            logger.debug(f"Rejected widget token: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired widget token",
+            )
+
+        origin = request.headers.get("Origin")
+        if origin is not None and origin != claims.origin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Widget token not valid for this origin",
+            )
+
+        return claims
+
+
+# Dependency for widget-token protected routes
+widget_token_auth = WidgetTokenAuth()
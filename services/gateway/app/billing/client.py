@@ -7,6 +7,7 @@ from typing import Optional
 import httpx
 
 from app.config import settings
+from app.upstream import create_guard, create_pooled_client
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,17 @@ class AuthorizeResult:
     reservation_id: str
     budget: int
     balance: int
+    leased: bool = False  # Authorized locally against a credit lease
+
+
+@dataclass
+class LeaseResult:
+    """Result of credit lease acquisition."""
+
+    allowed: bool
+    lease_id: str
+    amount: int
+    balance: int
 
 
 @dataclass
@@ -37,6 +49,37 @@ class BillingClient:
     def __init__(self):
         self.base_url = settings.control_plane_url
         self.timeout = settings.control_plane_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self.guard = create_guard(
+            "control-plane",
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_timeout_sec=settings.breaker_reset_timeout_sec,
+            initial_limit=settings.billing_concurrency_initial,
+            min_limit=settings.billing_concurrency_min,
+            max_limit=settings.billing_concurrency_max,
+            latency_target_sec=settings.billing_latency_target_sec,
+        )
+
+    def open(self) -> None:
+        """Create the pooled HTTP client (called from the app lifespan)."""
+        if self._client is None:
+            self._client = create_pooled_client(
+                "control-plane",
+                base_url=self.base_url,
+                timeout=self.timeout,
+            )
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client and its connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client, creating it if needed."""
+        self.open()
+        return self._client
 
     async def authorize(
         self,
@@ -49,37 +92,36 @@ class BillingClient:
 
         Returns authorization result with reservation ID.
         """
-        async with httpx.AsyncClient() as client:
-            headers = {}
-            if token:
-                headers["Authorization"] = f"Bearer {token}"
-
-            try:
-                response = await client.post(
-                    f"{self.base_url}/billing/authorize",
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        try:
+            async with self.guard.call():
+                response = await self.client.post(
+                    "/billing/authorize",
                     json={
                         "instance_id": instance_id,
                         "requested_budget": requested_budget,
                     },
                     headers=headers,
-                    timeout=self.timeout,
                 )
                 response.raise_for_status()
-                data = response.json()
+            data = response.json()
 
-                return AuthorizeResult(
-                    allowed=data["allowed"],
-                    reservation_id=data["reservation_id"],
-                    budget=data["budget"],
-                    balance=data["balance"],
-                )
+            return AuthorizeResult(
+                allowed=data["allowed"],
+                reservation_id=data["reservation_id"],
+                budget=data["budget"],
+                balance=data["balance"],
+            )
 
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Billing authorize failed: {e}")
-                raise
-            except httpx.RequestError as e:
-                logger.error(f"Billing authorize request error: {e}")
-                raise
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Billing authorize failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Billing authorize request error: {e}")
+            raise
 
     async def settle(
         self,
@@ -87,44 +129,140 @@ class BillingClient:
         instance_id: str,
         usage: Optional[dict] = None,
         token: str = None,
+        billable: bool = True,
     ) -> SettleResult:
         """
         Settle a reservation and debit actual usage.
 
+        With ``billable`` False the reservation is released without a debit.
         Returns settlement result with final balance.
         """
-        async with httpx.AsyncClient() as client:
-            headers = {}
-            if token:
-                headers["Authorization"] = f"Bearer {token}"
-
-            try:
-                response = await client.post(
-                    f"{self.base_url}/billing/settle",
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        try:
+            async with self.guard.call():
+                response = await self.client.post(
+                    "/billing/settle",
                     json={
                         "reservation_id": reservation_id,
                         "instance_id": instance_id,
                         "usage": usage or {},
+                        "billable": billable,
                     },
                     headers=headers,
-                    timeout=self.timeout,
                 )
                 response.raise_for_status()
-                data = response.json()
+            data = response.json()
+
+            return SettleResult(
+                debited=data["debited"],
+                balance=data["balance"],
+                ledger_entry_id=data["ledger_entry_id"],
+                status=data["status"],
+            )
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Billing settle failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Billing settle request error: {e}")
+            raise
+
+    async def settle_batch(self, settlements: list[dict]) -> list[dict]:
+        """
+        Settle many reservations in one Control Plane transaction.
 
-                return SettleResult(
-                    debited=data["debited"],
-                    balance=data["balance"],
-                    ledger_entry_id=data["ledger_entry_id"],
-                    status=data["status"],
+        Each item is {"reservation_id", "instance_id", "usage", "billable"}. Returns one
+        result per item with debited, balance and status.
+        """
+        try:
+            async with self.guard.call():
+                response = await self.client.post(
+                    "/billing/settle:batch",
+                    json={"settlements": settlements},
                 )
+                response.raise_for_status()
+            return response.json()["results"]
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Billing batch settle failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Billing batch settle request error: {e}")
+            raise
+
+    async def acquire_lease(
+        self,
+        instance_id: str,
+        requested_amount: int,
+        ttl_seconds: int,
+    ) -> LeaseResult:
+        """
+        Lease a block of credits for local run authorization.
+
+        The Control Plane may grant less than requested.
+        """
+        try:
+            async with self.guard.call():
+                response = await self.client.post(
+                    "/billing/leases",
+                    json={
+                        "instance_id": instance_id,
+                        "requested_amount": requested_amount,
+                        "ttl_seconds": ttl_seconds,
+                    },
+                )
+                response.raise_for_status()
+            data = response.json()
+
+            return LeaseResult(
+                allowed=data["allowed"],
+                lease_id=data["lease_id"],
+                amount=data["amount"],
+                balance=data["balance"],
+            )
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Billing lease failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Billing lease request error: {e}")
+            raise
+
+    async def release_lease(
+        self,
+        lease_id: str,
+        usages: list[dict],
+    ) -> SettleResult:
+        """
+        Release a credit lease, debiting the usage of every run it covered.
+
+        Unused credit returns to the wallet.
+        """
+        try:
+            async with self.guard.call():
+                response = await self.client.post(
+                    f"/billing/leases/{lease_id}/release",
+                    json={"usages": usages},
+                )
+                response.raise_for_status()
+            data = response.json()
+
+            return SettleResult(
+                debited=data["debited"],
+                balance=data["balance"],
+                ledger_entry_id=data["ledger_entry_id"] or "",
+                status=data["status"],
+            )
 
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Billing settle failed: {e}")
-                raise
-            except httpx.RequestError as e:
-                logger.error(f"Billing settle request error: {e}")
-                raise
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Billing lease release failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Billing lease release request error: {e}")
+            raise
 
 
 # Singleton client
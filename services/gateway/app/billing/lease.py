@@ -0,0 +1,295 @@
+"""Gateway-local credit leases.
+
+Instead of reserving credits with the Control Plane for every run, the
+gateway leases a block of credits per instance (e.g. 500 credits for 60s)
+and authorizes runs locally against it. Leases are renewed in the
+background before they run low or expire, and released with the usage of
+every run they covered; the Control Plane prices each run and returns the
+unused remainder to the wallet.
+
+Overspend is bounded by the lease size: a lease can never authorize more
+than it holds. Runs are authorized against a lease for
+``credit_lease_ttl_sec``, but the Control Plane holds its credits for
+``run_timeout`` longer, so a lease never expires (and its credits never
+count as available again) while runs it authorized are still in flight.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.config import settings
+
+from .client import AuthorizeResult, BillingClient, LeaseResult, SettleResult, billing_client
+
+logger = logging.getLogger(__name__)
+
+# Stop authorizing against a lease this close to its expiry (seconds)
+EXPIRY_MARGIN_SEC = 1.0
+
+# How often expired leases are swept (seconds)
+REAP_INTERVAL_SEC = 1.0
+
+# Attempts to release a lease before giving up
+RELEASE_ATTEMPTS = 3
+
+
+@dataclass
+class CreditLease:
+    """A block of credits leased for one instance."""
+
+    lease_id: str
+    instance_id: str
+    amount: int
+    remaining: int
+    balance: int
+    ttl: float
+    expires_at: float  # time.monotonic() deadline
+    usages: list[dict] = field(default_factory=list)
+    in_flight: int = 0
+    retired: bool = False
+
+    def time_left(self) -> float:
+        """Seconds until the lease expires."""
+        return self.expires_at - time.monotonic()
+
+    def can_cover(self, budget: int) -> bool:
+        """Whether a run with this budget can be authorized locally."""
+        return (
+            not self.retired
+            and self.remaining >= budget
+            and self.time_left() > EXPIRY_MARGIN_SEC
+        )
+
+    def needs_renewal(self) -> bool:
+        """Whether the lease is running low on credit or time."""
+        ratio = settings.credit_lease_renew_ratio
+        return self.remaining < self.amount * ratio or self.time_left() < self.ttl * ratio
+
+
+def lease_hold_sec() -> int:
+    """
+    Seconds the Control Plane holds a lease.
+
+    The window runs are authorized in, plus the longest a run authorized
+    at its end can take.
+    """
+    return settings.credit_lease_ttl_sec + settings.run_timeout
+
+
+class CreditLeaseManager:
+    """Authorizes runs against per-instance credit leases."""
+
+    def __init__(self, client: BillingClient = billing_client):
+        self._client = client
+        self._active: dict[str, CreditLease] = {}  # instance_id -> current lease
+        self._leases: dict[str, CreditLease] = {}  # lease_id -> unreleased lease
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._renewing: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._reaper: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start sweeping expired leases (called from the app lifespan)."""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def aclose(self) -> None:
+        """Release all leases, returning unused credit to the wallet."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+        for lease in list(self._active.values()):
+            self._retire(lease)
+        for lease in list(self._leases.values()):
+            if lease.in_flight:
+                # Shutdown drains requests first; anything left is abandoned
+                lease.in_flight = 0
+                self._spawn(self._release(lease))
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def authorize(self, instance_id: str, budget: int) -> AuthorizeResult:
+        """
+        Authorize a run against the instance's lease.
+
+        Only goes to the Control Plane when there is no lease that can cover
+        the budget; concurrent callers share a single acquisition.
+        """
+        lease = self._usable(instance_id, budget)
+        if lease is None:
+            lock = self._locks.setdefault(instance_id, asyncio.Lock())
+            async with lock:
+                lease = self._usable(instance_id, budget)
+                if lease is None:
+                    result = await self._client.acquire_lease(
+                        instance_id=instance_id,
+                        requested_amount=max(settings.credit_lease_size, budget),
+                        ttl_seconds=lease_hold_sec(),
+                    )
+                    if result.allowed:
+                        lease = self._install(instance_id, result)
+                    if not result.allowed or not lease.can_cover(budget):
+                        return AuthorizeResult(
+                            allowed=False,
+                            reservation_id="",
+                            budget=0,
+                            balance=result.balance,
+                            leased=True,
+                        )
+
+        lease.remaining -= budget
+        lease.in_flight += 1
+
+        if lease.needs_renewal():
+            self._spawn(self._renew(instance_id))
+
+        return AuthorizeResult(
+            allowed=True,
+            reservation_id=lease.lease_id,
+            budget=budget,
+            balance=lease.balance,
+            leased=True,
+        )
+
+    async def settle(self, auth_result: AuthorizeResult, usage: Optional[dict]) -> SettleResult:
+        """
+        Record a run's usage against its lease.
+
+        The actual debit is computed by the Control Plane when the lease is
+        released, so the reserved budget is reported in the meantime. Runs
+        that are not billed (``usage`` None) are left out of the release.
+        """
+        lease = self._leases.get(auth_result.reservation_id)
+        if lease is None:
+            logger.error(f"Settled run against unknown lease {auth_result.reservation_id}")
+            return SettleResult(
+                debited=0,
+                balance=auth_result.balance,
+                ledger_entry_id="",
+                status="pending_reconciliation",
+            )
+
+        if usage is not None:
+            lease.usages.append(usage)
+        lease.in_flight -= 1
+        if lease.retired and lease.in_flight == 0:
+            self._spawn(self._release(lease))
+
+        return SettleResult(
+            debited=auth_result.budget if usage is not None else 0,
+            balance=lease.balance,
+            ledger_entry_id="",
+            status="pending_reconciliation",
+        )
+
+    def _usable(self, instance_id: str, budget: int) -> Optional[CreditLease]:
+        """Get the instance's current lease if it can cover the budget."""
+        lease = self._active.get(instance_id)
+        if lease is not None and lease.can_cover(budget):
+            return lease
+        return None
+
+    def _install(self, instance_id: str, result: LeaseResult) -> CreditLease:
+        """Make a newly granted lease current, retiring its predecessor."""
+        ttl = float(settings.credit_lease_ttl_sec)
+        lease = CreditLease(
+            lease_id=result.lease_id,
+            instance_id=instance_id,
+            amount=result.amount,
+            remaining=result.amount,
+            balance=result.balance,
+            ttl=ttl,
+            expires_at=time.monotonic() + ttl,
+        )
+        self._leases[lease.lease_id] = lease
+
+        previous = self._active.get(instance_id)
+        self._active[instance_id] = lease
+        if previous is not None:
+            self._retire(previous)
+
+        logger.info(
+            f"Leased {lease.amount} credits for instance {instance_id}: "
+            f"lease={lease.lease_id}"
+        )
+        return lease
+
+    def _retire(self, lease: CreditLease) -> None:
+        """Stop authorizing against a lease; release it once runs finish."""
+        lease.retired = True
+        if self._active.get(lease.instance_id) is lease:
+            del self._active[lease.instance_id]
+        if lease.in_flight == 0:
+            self._spawn(self._release(lease))
+
+    async def _renew(self, instance_id: str) -> None:
+        """Acquire a fresh lease ahead of the current one running out."""
+        if instance_id in self._renewing:
+            return
+        self._renewing.add(instance_id)
+        try:
+            lock = self._locks.setdefault(instance_id, asyncio.Lock())
+            async with lock:
+                current = self._active.get(instance_id)
+                if current is not None and not current.needs_renewal():
+                    return
+                result = await self._client.acquire_lease(
+                    instance_id=instance_id,
+                    requested_amount=settings.credit_lease_size,
+                    ttl_seconds=lease_hold_sec(),
+                )
+                if result.allowed:
+                    self._install(instance_id, result)
+        except Exception as e:
+            logger.warning(f"Credit lease renewal failed for instance {instance_id}: {e}")
+        finally:
+            self._renewing.discard(instance_id)
+
+    async def _release(self, lease: CreditLease) -> None:
+        """Release a lease with the usage of every run it covered."""
+        if self._leases.pop(lease.lease_id, None) is None:
+            return  # Already released
+
+        for attempt in range(1, RELEASE_ATTEMPTS + 1):
+            try:
+                result = await self._client.release_lease(lease.lease_id, lease.usages)
+                logger.info(
+                    f"Released lease {lease.lease_id}: runs={len(lease.usages)}, "
+                    f"debited={result.debited}"
+                )
+                return
+            except Exception as e:
+                logger.warning(
+                    f"Releasing lease {lease.lease_id} failed "
+                    f"(attempt {attempt}/{RELEASE_ATTEMPTS}): {e}"
+                )
+                if attempt < RELEASE_ATTEMPTS:
+                    await asyncio.sleep(2 ** attempt)
+
+        logger.error(
+            f"Giving up releasing lease {lease.lease_id} for instance "
+            f"{lease.instance_id}: {len(lease.usages)} runs unbilled"
+        )
+
+    async def _reap_loop(self) -> None:
+        """Retire leases that are about to expire."""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL_SEC)
+            for lease in list(self._active.values()):
+                if lease.time_left() <= EXPIRY_MARGIN_SEC:
+                    self._retire(lease)
+
+    def _spawn(self, coro) -> None:
+        """Run a coroutine in the background, keeping a reference to it."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# Singleton lease manager
+credit_leases = CreditLeaseManager()
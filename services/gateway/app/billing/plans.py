@@ -0,0 +1,111 @@
+"""Per-instance plan cache.
+
+The org owning an instance and the tier and limits of its plan are needed
+on every run (for scheduling and rate limiting) but change only when the
+instance is moved to another plan, so they are loaded from the Control
+Plane once per TTL and served from memory. Concurrent misses for an
+instance share a single fetch, and when a refresh fails the last known
+plan keeps being served.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from prometheus_client import Counter
+
+from app.cache import SingleflightCache
+from app.config import settings
+
+from .client import BillingClient, billing_client
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_LOOKUPS = Counter(
+    "gateway_plan_cache_lookups_total",
+    "Instance plan cache lookups",
+    ["result"],  # hit, miss, coalesced, stale
+)
+
+# How long unknown instances are remembered (seconds)
+NOT_FOUND_TTL_SEC = 5.0
+
+
+@dataclass
+class InstancePlan:
+    """The owning org and plan of an instance."""
+
+    instance_id: str
+    org_id: str
+    plan: str  # Plan slug
+    tier: str  # Plan.limits["tier"], defaulting to the plan slug
+    limits: dict[str, Any]
+    offering: str = ""  # Offering slug
+    hedge_runs: bool = False  # Runs may be hedged across Runner replicas
+
+    @classmethod
+    def from_control_plane(cls, data: dict[str, Any]) -> "InstancePlan":
+        """Build an InstancePlan from the Control Plane response."""
+        return cls(
+            instance_id=data.get("instance_id", ""),
+            org_id=data.get("org_id", ""),
+            plan=data.get("plan", ""),
+            tier=data.get("tier", ""),
+            limits=data.get("limits") or {},
+            offering=data.get("offering", ""),
+            hedge_runs=bool(data.get("hedge_runs")),
+        )
+
+
+class InstancePlanCache:
+    """In-process cache of instance plans, loaded from the Control Plane."""
+
+    def __init__(self, client: BillingClient = billing_client):
+        # Shares the Control Plane pool and circuit breaker of the billing client
+        self._client = client
+        self._cache: SingleflightCache[Optional[InstancePlan]] = SingleflightCache(
+            "plan",
+            PLAN_CACHE_LOOKUPS,
+            max_entries=lambda: settings.plan_cache_max_entries,
+            serve_stale=True,
+        )
+
+    async def get(self, instance_id: str) -> Optional[InstancePlan]:
+        """
+        Get an instance's plan, loading it on a miss.
+
+        Returns None if the instance does not exist.
+
+        Raises:
+            httpx.HTTPError, UpstreamUnavailable: If the Control Plane cannot
+                be reached and nothing is cached
+        """
+        return await self._cache.get(instance_id, lambda: self._load(instance_id))
+
+    def invalidate(self, instance_id: str) -> bool:
+        """Drop an instance's plan, e.g. after it moved to another plan.
+
+        Returns True if the plan was cached or being loaded.
+        """
+        return self._cache.invalidate(instance_id)
+
+    def clear(self) -> None:
+        """Drop every cached plan."""
+        self._cache.clear()
+
+    async def _load(self, instance_id: str) -> tuple[Optional[InstancePlan], float]:
+        """Fetch an instance's plan and how long to cache it."""
+        async with self._client.guard.call():
+            response = await self._client.client.get(
+                f"/instances/{instance_id}/plan_limits",
+            )
+            if response.status_code == 404:
+                return None, NOT_FOUND_TTL_SEC
+            response.raise_for_status()
+
+        plan = InstancePlan.from_control_plane(response.json())
+        return plan, settings.plan_cache_ttl_sec
+
+
+# Process-wide instance plan cache
+instance_plans = InstancePlanCache()
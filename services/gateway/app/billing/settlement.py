@@ -0,0 +1,229 @@
+"""Batched asynchronous settlement.
+
+Settlements are pushed onto a bounded in-process queue and a background
+task flushes them to the Control Plane's bulk settle endpoint, either when
+a batch fills up or when the flush interval elapses. Failed batches are
+retried with backoff and, if the Control Plane stays down, spooled to a
+local JSONL file that is replayed once it recovers.
+
+Settling is idempotent per reservation on the Control Plane, so replaying
+a batch that may already have been applied is safe.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from app.config import settings
+
+from .client import BillingClient, SettleResult, billing_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingSettlement:
+    """A settlement waiting to be flushed."""
+
+    reservation_id: str
+    instance_id: str
+    usage: dict = field(default_factory=dict)
+    billable: bool = True  # False releases the reservation without a debit
+
+
+class SettlementQueue:
+    """Bounded queue of settlements flushed in batches."""
+
+    def __init__(self, client: BillingClient = billing_client):
+        self._client = client
+        self._queue: asyncio.Queue[PendingSettlement] = asyncio.Queue(
+            maxsize=settings.settlement_queue_size
+        )
+        self._flusher: Optional[asyncio.Task] = None
+        self._unconfirmed: list[PendingSettlement] = []
+        self._spool_lock = asyncio.Lock()
+
+    def start(self) -> None:
+        """Start the background flusher (called from the app lifespan)."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        """Stop the flusher and flush (or spool) everything still queued."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+        remaining = self._unconfirmed
+        self._unconfirmed = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+
+        for start in range(0, len(remaining), settings.settlement_batch_size):
+            batch = remaining[start:start + settings.settlement_batch_size]
+            try:
+                await self._client.settle_batch([asdict(item) for item in batch])
+            except Exception as e:
+                logger.error(f"Final settlement flush failed, spooling: {e}")
+                await self._spool(batch)
+
+    def submit(
+        self,
+        reservation_id: str,
+        instance_id: str,
+        usage: Optional[dict] = None,
+        billable: bool = True,
+    ) -> bool:
+        """
+        Queue a settlement.
+
+        Returns False if the queue is full, in which case the caller should
+        settle inline.
+        """
+        try:
+            self._queue.put_nowait(
+                PendingSettlement(
+                    reservation_id=reservation_id,
+                    instance_id=instance_id,
+                    usage=usage or {},
+                    billable=billable,
+                )
+            )
+        except asyncio.QueueFull:
+            logger.warning("Settlement queue full, settling inline")
+            return False
+        return True
+
+    async def settle(
+        self,
+        reservation_id: str,
+        instance_id: str,
+        usage: Optional[dict],
+        budget: int,
+        balance: int,
+        billable: bool = True,
+    ) -> SettleResult:
+        """
+        Queue a settlement, falling back to an inline settle when full.
+
+        Queued settlements report the reserved budget as the debit (none if
+        not billable); the actual debit is applied when the batch is flushed.
+        """
+        if self.submit(reservation_id, instance_id, usage, billable):
+            return SettleResult(
+                debited=budget if billable else 0,
+                balance=balance,
+                ledger_entry_id="",
+                status="pending_reconciliation",
+            )
+
+        return await self._client.settle(
+            reservation_id=reservation_id,
+            instance_id=instance_id,
+            usage=usage,
+            billable=billable,
+        )
+
+    async def _run(self) -> None:
+        """Flush batches forever."""
+        await self._replay_spool()
+        while True:
+            batch = await self._next_batch()
+            self._unconfirmed = batch
+            await self._flush(batch)
+            self._unconfirmed = []
+
+    async def _next_batch(self) -> list[PendingSettlement]:
+        """Wait for a full batch or the flush interval, whichever is first."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + settings.settlement_flush_interval_sec
+
+        while len(batch) < settings.settlement_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _flush(self, batch: list[PendingSettlement]) -> None:
+        """Send a batch, retrying with backoff, spooling it if all attempts fail."""
+        attempts = settings.settlement_max_retries
+        for attempt in range(1, attempts + 1):
+            try:
+                results = await self._client.settle_batch([asdict(item) for item in batch])
+                not_found = sum(1 for result in results if result.get("status") == "not_found")
+                if not_found:
+                    logger.error(f"{not_found} settlements referenced unknown reservations")
+                logger.debug(f"Flushed {len(batch)} settlements")
+                await self._replay_spool()
+                return
+            except Exception as e:
+                logger.warning(
+                    f"Settlement flush of {len(batch)} failed "
+                    f"(attempt {attempt}/{attempts}): {e}"
+                )
+                if attempt < attempts:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+        await self._spool(batch)
+
+    async def _spool(self, batch: list[PendingSettlement]) -> None:
+        """Append settlements to the local spool file."""
+        lines = "".join(json.dumps(asdict(item)) + "\n" for item in batch)
+        path = settings.settlement_spool_path
+
+        def append() -> None:
+            with open(path, "a") as f:
+                f.write(lines)
+
+        async with self._spool_lock:
+            await asyncio.to_thread(append)
+        logger.error(f"Spooled {len(batch)} settlements to {path}")
+
+    async def _replay_spool(self) -> None:
+        """Resend spooled settlements; keep whatever still fails."""
+        path = settings.settlement_spool_path
+        if not os.path.exists(path):
+            return
+
+        def read() -> list[PendingSettlement]:
+            with open(path) as f:
+                return [PendingSettlement(**json.loads(line)) for line in f if line.strip()]
+
+        def rewrite(items: list[PendingSettlement]) -> None:
+            if not items:
+                os.remove(path)
+                return
+            with open(path, "w") as f:
+                f.writelines(json.dumps(asdict(item)) + "\n" for item in items)
+
+        async with self._spool_lock:
+            spooled = await asyncio.to_thread(read)
+            size = settings.settlement_batch_size
+            sent = 0
+            try:
+                for start in range(0, len(spooled), size):
+                    await self._client.settle_batch(
+                        [asdict(item) for item in spooled[start:start + size]]
+                    )
+                    sent = start + size
+            except Exception as e:
+                logger.warning(f"Replaying settlement spool failed: {e}")
+            finally:
+                await asyncio.to_thread(rewrite, spooled[sent:])
+
+        if sent:
+            logger.info(f"Replayed {min(sent, len(spooled))} spooled settlements")
+
+
+# Singleton settlement queue
+settlement_queue = SettlementQueue()
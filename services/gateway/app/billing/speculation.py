@@ -0,0 +1,63 @@
+"""Balance hints for speculative run dispatch.
+
+With speculative dispatch enabled, a run for an instance whose wallet is
+known to be far above the run budget is sent to the Runner at the same
+time as billing is authorized, instead of after it, saving a Control
+Plane round trip. If authorization is then denied (or fails), the run is
+cancelled and never settled; such runs are counted as wasted.
+
+The balance an instance last reported (on authorize or settle) is kept as
+a hint; speculation only happens while the hint is fresh and at least
+``speculative_min_balance_multiple`` times the run budget.
+"""
+
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter
+
+from app.config import settings
+
+SPECULATIVE_RUNS = Counter(
+    "gateway_speculative_runs_total",
+    "Runs dispatched before billing authorization completed",
+    ["outcome"],  # confirmed, wasted
+)
+
+# Instances to keep balance hints for
+MAX_HINTS = 10000
+
+
+class BalanceHints:
+    """Last known wallet balance per instance."""
+
+    def __init__(self):
+        self._hints: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    def record(self, instance_id: str, balance: int) -> None:
+        """Remember the balance an instance just reported."""
+        self._hints[instance_id] = (balance, time.monotonic())
+        self._hints.move_to_end(instance_id)
+        while len(self._hints) > MAX_HINTS:
+            self._hints.popitem(last=False)
+
+    def can_speculate(self, instance_id: str, budget: int) -> bool:
+        """Whether a run can be dispatched before it is authorized."""
+        if not settings.speculative_dispatch_enabled:
+            return False
+        hint = self._hints.get(instance_id)
+        if hint is None:
+            return False
+        balance, recorded_at = hint
+        if time.monotonic() - recorded_at > settings.speculative_balance_hint_ttl_sec:
+            return False
+        return balance >= budget * settings.speculative_min_balance_multiple
+
+
+def record_speculation(outcome: str) -> None:
+    """Count a speculatively dispatched run as confirmed or wasted."""
+    SPECULATIVE_RUNS.labels(outcome=outcome).inc()
+
+
+# Process-wide balance hints
+balance_hints = BalanceHints()
@@ -0,0 +1,151 @@
+"""In-process TTL cache with single-flight loading.
+
+Shared by the caches of data loaded from the Control Plane (API key
+introspection, widget configs, instance plans):
+
+- entries expire after a per-entry TTL and the least recently used ones are
+  evicted beyond ``max_entries``;
+- concurrent misses for a key share a single load;
+- rejections can be cached briefly (negative caching) and replayed;
+- when a refresh fails, the last known value can keep being served;
+- invalidating a key detaches its in-flight load, so a result fetched
+  before the invalidation is never stored.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+@dataclass
+class _CacheEntry(Generic[V]):
+    """Cached outcome of a load: a value, or the error to replay."""
+
+    value: Optional[V]
+    error: Optional[Exception]
+    expires_at: float  # time.monotonic() deadline
+
+
+class SingleflightCache(Generic[V]):
+    """LRU cache of loaded values, one load per key at a time.
+
+    Loaders return the value and how long to cache it (seconds). Lookups are
+    counted in ``lookups`` by result: hit, negative_hit, miss, coalesced and
+    stale.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lookups: Counter,
+        max_entries: Callable[[], int],
+        negative_ttl: Optional[Callable[[Exception], Optional[float]]] = None,
+        serve_stale: bool = False,
+    ):
+        """
+        Args:
+            name: What is cached, for logs (e.g. "widget config")
+            lookups: Counter of lookups, labelled by result
+            max_entries: Current entry limit (read on every store, so it
+                follows the settings)
+            negative_ttl: How long to cache a load error (None to not cache it)
+            serve_stale: Serve the expired value when its refresh fails
+        """
+        self._name = name
+        self._lookups = lookups
+        self._max_entries = max_entries
+        self._negative_ttl = negative_ttl
+        self._serve_stale = serve_stale
+        self._entries: OrderedDict[str, _CacheEntry[V]] = OrderedDict()
+        self._pending: dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str, load: Callable[[], Awaitable[tuple[V, float]]]) -> V:
+        """
+        Get the value for a key, loading it on a miss.
+
+        Raises:
+            Exception: Whatever ``load`` raised (or the cached error), unless
+                a stale value is served instead
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                if entry.error is not None:
+                    self._lookups.labels(result="negative_hit").inc()
+                    raise entry.error.with_traceback(None)
+                self._lookups.labels(result="hit").inc()
+                return entry.value
+            if not self._serve_stale:
+                del self._entries[key]
+
+        task = self._pending.get(key)
+        if task is None:
+            self._lookups.labels(result="miss").inc()
+            task = asyncio.create_task(self._load(key, load))
+            self._pending[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._lookups.labels(result="coalesced").inc()
+
+        try:
+            # Shield so one caller going away does not fail the shared load
+            return await asyncio.shield(task)
+        except Exception as e:
+            if not self._serve_stale or entry is None or entry.value is None:
+                raise
+            logger.warning(f"Serving stale {self._name} for {key}: {e}")
+            self._lookups.labels(result="stale").inc()
+            return entry.value
+
+    def invalidate(self, key: str) -> bool:
+        """Drop a key, detaching its in-flight load so the result is not stored.
+
+        Returns True if the key was cached or being loaded.
+        """
+        found = self._entries.pop(key, None) is not None
+        found = self._pending.pop(key, None) is not None or found
+        return found
+
+    def clear(self) -> None:
+        """Drop every entry and detach every in-flight load."""
+        self._entries.clear()
+        self._pending.clear()
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[tuple[V, float]]]) -> V:
+        """Run a load and cache its outcome."""
+        try:
+            value, ttl = await load()
+        except Exception as e:
+            ttl = self._negative_ttl(e) if self._negative_ttl is not None else None
+            if ttl is not None:
+                self._store(key, _CacheEntry(value=None, error=e, expires_at=time.monotonic() + ttl))
+            raise
+
+        self._store(key, _CacheEntry(value=value, error=None, expires_at=time.monotonic() + ttl))
+        return value
+
+    def _store(self, key: str, entry: _CacheEntry[V]) -> None:
+        """Cache an entry unless the load was invalidated meanwhile."""
+        if self._pending.get(key) is not asyncio.current_task():
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries():
+            self._entries.popitem(last=False)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Forget a completed load."""
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved if every caller went away
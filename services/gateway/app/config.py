@@ -15,15 +15,177 @@ class Settings(BaseSettings):
 
     # Runner
     runner_url: str = "http://cmp-runner.cmp:8000"
+    runner_urls: str = ""  # Comma-separated replica URLs; overrides runner_url
+    runner_dns_discovery: bool = False  # Resolve runner_url to all addresses (headless Service)
+    runner_dns_refresh_sec: float = 30.0
+    runner_lb_strategy: str = "least_outstanding"  # or "p2c"
+    runner_probe_interval_sec: float = 5.0
+    runner_probe_timeout_sec: float = 2.0
+    runner_eject_after_failures: int = 3
+    runner_slow_start_sec: float = 30.0
+
+    # Hedged runs: runs of offerings flagged "hedge" are sent to a second
+    # replica when the first has not answered by the offering's p95. Hedges
+    # are capped at runner_hedge_budget_ratio of the offering's runs.
+    runner_hedging_enabled: bool = False
+    runner_hedge_budget_ratio: float = 0.05
+    runner_hedge_budget_burst: float = 10.0  # Hedges that can be saved up
+    runner_hedge_window: int = 500  # Latencies kept per offering for the p95
+    runner_hedge_min_samples: int = 50  # Needed before hedging an offering
+    runner_hedge_min_delay_sec: float = 0.05
 
     # OIDC/SSO (Keycloak)
     oidc_issuer: str = "https://sso.dev.gsv.dev/realms/gsv"
     oidc_audience: str = "cmp-gateway"
+    jwks_refresh_interval_sec: float = 300.0
+    jwks_min_refetch_interval_sec: float = 10.0  # Rate limit for unknown-kid refetches
+    jwt_claims_cache_max_entries: int = 10000  # Verified-token LRU; 0 disables
+
+    # API key introspection cache (process-wide, keyed by key SHA-256). The
+    # Control Plane pushes revocations to /internal/api_keys:invalidate; a
+    # replica it cannot reach honours a revocation within the TTL
+    api_key_cache_ttl_sec: float = 60.0
+    api_key_negative_cache_ttl_sec: float = 5.0  # Invalid/revoked keys
+    api_key_cache_max_entries: int = 10000
+
+    # API key MAC keyring "kid:secret,..." shared with the Control Plane;
+    # signed keys are verified locally before introspection. Unsigned
+    # (pre-keyring) keys are introspected while legacy keys are enabled.
+    api_key_mac_keys: str = ""
+    api_key_legacy_enabled: bool = True
+
+    # Widget session tokens: keyring "kid:secret,kid:secret"; the first key
+    # signs new tokens, all keys verify (keep old keys until tokens expire).
+    # Required: every worker and replica must verify every token. Only for
+    # local development, an unset keyring may fall back to a per-process key
+    widget_token_keys: str = ""
+    widget_token_ttl_sec: int = 3600
+    widget_token_ephemeral_key: bool = False
+
+    # Widget branding / origin allowlist cache (invalidated by the Control
+    # Plane via /internal/widget_config:invalidate)
+    widget_config_cache_ttl_sec: float = 300.0
+    widget_config_cache_max_entries: int = 10000
+
+    # Widget conversations over /v1/widget/ws: the session token is verified
+    # once per connection and credits are reserved for blocks of messages
+    widget_ws_init_timeout_sec: float = 10.0  # Wait for the init frame
+    widget_ws_idle_timeout_sec: float = 300.0  # Close idle conversations
+    widget_ws_history_messages: int = 20  # Past messages sent with each run
+    widget_ws_block_messages: int = 10  # Messages per credit reservation
+    widget_ws_max_message_chars: int = 8000
+    widget_ws_max_pending_messages: int = 8  # Queued while a run streams
+
+    # Shared secret for internal endpoints (e.g. cache invalidation);
+    # internal endpoints are disabled when unset
+    internal_api_token: str = ""
+
+    # Credit leases: authorize runs locally against a block of credits
+    # leased from the Control Plane instead of reserving per run
+    credit_lease_enabled: bool = False
+    credit_lease_size: int = 500
+    credit_lease_ttl_sec: int = 60  # Authorization window; held run_timeout longer
+    credit_lease_renew_ratio: float = 0.2  # Renew below 20% credit or time left
+
+    # Batched settlement: queue settlements and flush them in bulk
+    settlement_batch_enabled: bool = False
+    settlement_queue_size: int = 10000
+    settlement_batch_size: int = 100
+    settlement_flush_interval_sec: float = 1.0
+    settlement_max_retries: int = 3
+    settlement_spool_path: str = "/tmp/cmp-gateway-settlements.jsonl"
+
+    # Speculative dispatch: send sync runs to the Runner while billing is
+    # still being authorized, for instances whose last known balance is
+    # well above the run budget; denied runs are cancelled unsettled
+    speculative_dispatch_enabled: bool = False
+    speculative_min_balance_multiple: float = 10.0
+    speculative_balance_hint_ttl_sec: float = 30.0
+
+    # Asynchronous run jobs (POST /v1/runs?mode=async)
+    run_jobs_workers: int = 16
+    run_jobs_queue_size: int = 1000
+    run_jobs_result_ttl_sec: float = 3600.0
+    run_jobs_store: str = "memory"
+    run_callback_timeout_sec: float = 10.0
+    run_callback_max_retries: int = 3
+    run_callback_secret: str = ""  # Signs callbacks (X-CMP-Signature) when set
+    # Callbacks go only to https URLs resolving to public addresses;
+    # optionally restricted to these hosts ("hooks.example.com,*.example.org")
+    # and never to the extra denied CIDRs (e.g. publicly routable cluster ranges)
+    run_callback_allowed_hosts: str = ""
+    run_callback_denied_networks: str = ""
+
+    # Idempotency-Key on POST /v1/runs: responses kept per key for the TTL
+    idempotency_ttl_sec: float = 3600.0
+    idempotency_max_entries: int = 10000
+    idempotency_store: str = "memory"
+
+    # Weighted fair scheduling of runs across orgs: runs wait in per-org
+    # queues for Runner capacity, weighted by plan tier ("tier:weight,...";
+    # tiers not listed get weight 1)
+    run_scheduler_enabled: bool = False
+    run_scheduler_tier_weights: str = "free:1,starter:2,pro:4,enterprise:8"
+    run_queue_max_per_org: int = 200
+    run_queue_timeout_sec: float = 30.0
+
+    # Plan rate limits (Plan.limits rate_limit_per_minute, rate_limit_burst,
+    # concurrent_runs) per instance; the "shared_memory" store shares them
+    # between the workers of a host through a file on tmpfs
+    rate_limit_enabled: bool = False
+    rate_limit_store: str = "memory"
+    rate_limit_shm_path: str = "/dev/shm/cmp-gateway-rate-limits"
+    rate_limit_shm_slots: int = 65536
+
+    # Instance plans (org, tier, limits) cached from the Control Plane
+    plan_cache_ttl_sec: float = 300.0
+    plan_cache_max_entries: int = 10000
+
+    # Batch runs (POST /v1/runs:batch)
+    run_batch_max_items: int = 1000
+    run_batch_max_concurrency: int = 8
+
+    # Metrics: distinct instance label values before collapsing into "other"
+    metrics_max_instance_labels: int = 100
+
+    # Event loop monitoring: lag is sampled every loop_monitor_interval_sec
+    # and the loop thread's stack is logged when it is blocked for longer
+    # than loop_slow_callback_sec (0 disables). While the lag exceeds
+    # loop_lag_shed_threshold_sec, new requests get 503 (0 disables).
+    loop_monitor_interval_sec: float = 0.1
+    loop_slow_callback_sec: float = 0.25
+    loop_lag_shed_threshold_sec: float = 0.0
+
+    # Tracing: span exporter ("none", "file" or "otlp")
+    tracing_exporter: str = "none"
+    tracing_file_path: str = "/tmp/cmp-gateway-spans.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
 
     # Timeouts (seconds)
     run_timeout: int = 120
     control_plane_timeout: int = 10
 
+    # Circuit breakers (per upstream): open after consecutive failures
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout_sec: float = 30.0
+
+    # Adaptive (AIMD) concurrency limits per upstream; a latency target of
+    # 0 shrinks the limit only on failures (runs vary too much in duration)
+    runner_concurrency_initial: int = 50
+    runner_concurrency_min: int = 5
+    runner_concurrency_max: int = 500
+    runner_latency_target_sec: float = 0.0
+    billing_concurrency_initial: int = 50
+    billing_concurrency_min: int = 5
+    billing_concurrency_max: int = 500
+    billing_latency_target_sec: float = 2.0
+
+    # Upstream HTTP connection pools (one per upstream)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2_enabled: bool = False
+
     class Config:
         env_prefix = ""
         case_sensitive = False
@@ -0,0 +1,19 @@
+"""Idempotency-Key support."""
+
+from .requests import IdempotencyConflict, IdempotentRequests, idempotent_runs
+from .store import (
+    IdempotencyRecord,
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+    create_idempotency_store,
+)
+
+__all__ = [
+    "IdempotencyConflict",
+    "IdempotencyRecord",
+    "IdempotencyStore",
+    "IdempotentRequests",
+    "MemoryIdempotencyStore",
+    "create_idempotency_store",
+    "idempotent_runs",
+]
@@ -0,0 +1,137 @@
+"""Idempotency-Key handling for non-idempotent endpoints.
+
+A request carrying an ``Idempotency-Key`` executes once per key (scoped to
+the caller). Duplicates arriving while it runs attach to the same
+execution, and later ones replay the stored response until the key
+expires, so client retries after timeouts neither re-run the agent nor
+debit credits again. The execution is detached from the first caller, so
+it completes (and its response is stored) even if that caller gave up.
+
+Reusing a key for a different request, or retrying on another replica
+while the original is still running, is rejected with
+``IdempotencyConflict``.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from prometheus_client import Counter
+
+from app.config import settings
+
+from .store import IdempotencyRecord, IdempotencyStore, create_idempotency_store
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_REQUESTS = Counter(
+    "gateway_idempotent_requests_total",
+    "Requests carrying an Idempotency-Key",
+    ["result"],  # executed, attached, replayed, in_progress, mismatch
+)
+
+
+class IdempotencyConflict(Exception):
+    """A key cannot be used for this request (right now)."""
+
+    IN_PROGRESS = "in_progress"
+    MISMATCH = "mismatch"
+
+    def __init__(self, reason: str):
+        super().__init__(f"Idempotency key conflict: {reason}")
+        self.reason = reason
+
+
+def is_storable(status_code: int) -> bool:
+    """Whether a response is final for its key; others may be retried."""
+    return status_code < 500 and status_code not in (409, 429)
+
+
+class IdempotentRequests:
+    """Executes requests at most once per idempotency key."""
+
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+        self._in_flight: dict[str, tuple[str, asyncio.Task]] = {}  # key -> (fingerprint, task)
+
+    async def execute(
+        self,
+        key: str,
+        fingerprint: str,
+        work: Callable[[], Awaitable[IdempotencyRecord]],
+    ) -> tuple[IdempotencyRecord, bool]:
+        """
+        Execute ``work`` once for ``key``.
+
+        Returns the response record and whether it was replayed (True for
+        duplicates, whether attached or served from the store).
+
+        Raises:
+            IdempotencyConflict: If the key was used for a different request,
+                or its request is in progress on another replica
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            in_flight_fingerprint, task = in_flight
+            self._check_fingerprint(in_flight_fingerprint, fingerprint)
+            IDEMPOTENT_REQUESTS.labels(result="attached").inc()
+            return await asyncio.shield(task), True
+
+        record = await self.store.get(key)
+        if record is not None:
+            self._check_fingerprint(record.fingerprint, fingerprint)
+            if not record.completed:
+                IDEMPOTENT_REQUESTS.labels(result="in_progress").inc()
+                raise IdempotencyConflict(IdempotencyConflict.IN_PROGRESS)
+            IDEMPOTENT_REQUESTS.labels(result="replayed").inc()
+            return record, True
+
+        # Mark the key as in progress for other replicas; outlives a crashed run
+        reserved = await self.store.reserve(
+            key,
+            IdempotencyRecord(fingerprint=fingerprint),
+            ttl=settings.run_timeout + settings.control_plane_timeout,
+        )
+        if not reserved:
+            IDEMPOTENT_REQUESTS.labels(result="in_progress").inc()
+            raise IdempotencyConflict(IdempotencyConflict.IN_PROGRESS)
+
+        IDEMPOTENT_REQUESTS.labels(result="executed").inc()
+        task = asyncio.create_task(self._run(key, work))
+        self._in_flight[key] = (fingerprint, task)
+        task.add_done_callback(lambda t: self._finish(key, t))
+
+        # Shield so the execution outlives a caller that gives up
+        return await asyncio.shield(task), False
+
+    async def _run(self, key: str, work: Callable[[], Awaitable[IdempotencyRecord]]) -> IdempotencyRecord:
+        """Execute the request and store its response if it is final."""
+        try:
+            record = await work()
+        except BaseException:
+            await self.store.delete(key)
+            raise
+
+        if is_storable(record.status_code):
+            await self.store.put(key, record, ttl=settings.idempotency_ttl_sec)
+        else:
+            await self.store.delete(key)
+        return record
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Forget a completed execution."""
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and in_flight[1] is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved if every caller went away
+
+    @staticmethod
+    def _check_fingerprint(expected: str, fingerprint: str) -> None:
+        if expected != fingerprint:
+            IDEMPOTENT_REQUESTS.labels(result="mismatch").inc()
+            raise IdempotencyConflict(IdempotencyConflict.MISMATCH)
+
+
+# Singleton used by POST /v1/runs
+idempotent_runs = IdempotentRequests(create_idempotency_store())
@@ -0,0 +1,92 @@
+"""Storage for idempotent request outcomes."""
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.config import settings
+
+
+@dataclass
+class IdempotencyRecord:
+    """A request seen under an idempotency key, and its response once done."""
+
+    fingerprint: str  # Hash of the request, to reject key reuse for other requests
+    status_code: Optional[int] = None  # None while the request is in progress
+    body: Any = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def completed(self) -> bool:
+        """Whether the response is stored."""
+        return self.status_code is not None
+
+
+class IdempotencyStore(ABC):
+    """Backend holding idempotency records until their TTL runs out.
+
+    Implementations must be safe to share between concurrent coroutines.
+    A shared backend makes keys hold across gateway replicas: a retry that
+    lands on another replica replays the stored response, or is told the
+    original is still in progress.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        """Get a record, or None if unknown or expired."""
+
+    @abstractmethod
+    async def reserve(self, key: str, record: IdempotencyRecord, ttl: float) -> bool:
+        """Store an in-progress record unless the key exists; True if stored."""
+
+    @abstractmethod
+    async def put(self, key: str, record: IdempotencyRecord, ttl: float) -> None:
+        """Create or replace a record, expiring it after ``ttl`` seconds."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Forget a key, e.g. when its request failed and may be retried."""
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Bounded in-process store; keys only hold on this replica."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (record, expires_at), oldest first
+        self._records: OrderedDict[str, tuple[IdempotencyRecord, float]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    async def reserve(self, key: str, record: IdempotencyRecord, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.put(key, record, ttl)
+        return True
+
+    async def put(self, key: str, record: IdempotencyRecord, ttl: float) -> None:
+        self._records[key] = (record, time.monotonic() + ttl)
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._records.pop(key, None)
+
+
+def create_idempotency_store(backend: Optional[str] = None) -> IdempotencyStore:
+    """Create the store configured by ``idempotency_store``."""
+    backend = backend or settings.idempotency_store
+    if backend == "memory":
+        return MemoryIdempotencyStore(max_entries=settings.idempotency_max_entries)
+    raise ValueError(f"Unknown idempotency store: {backend}")
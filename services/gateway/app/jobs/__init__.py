@@ -0,0 +1,17 @@
+"""Asynchronous run jobs."""
+
+from .callbacks import CallbackTarget, CallbackURLRejected, resolve_callback
+from .pool import RunJobPool, run_jobs
+from .store import MemoryRunJobStore, RunJob, RunJobStore, create_job_store
+
+__all__ = [
+    "CallbackTarget",
+    "CallbackURLRejected",
+    "MemoryRunJobStore",
+    "RunJob",
+    "RunJobPool",
+    "RunJobStore",
+    "create_job_store",
+    "resolve_callback",
+    "run_jobs",
+]
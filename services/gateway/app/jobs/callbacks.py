@@ -0,0 +1,115 @@
+"""Validation of run job callback URLs.
+
+Callbacks are sent from inside the cluster to URLs chosen by callers, so
+they are restricted to https URLs whose host resolves only to public
+addresses (and, if ``run_callback_allowed_hosts`` is set, to those hosts).
+The host is resolved again when the callback is sent and the request is
+pinned to the address that was checked, so DNS cannot be re-pointed at an
+internal address between the check and the connection.
+"""
+
+import asyncio
+import ipaddress
+import socket
+from dataclasses import dataclass
+from typing import Union
+
+import httpx
+
+from app.config import settings
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+class CallbackURLRejected(ValueError):
+    """A callback URL the gateway will not send to."""
+
+
+@dataclass
+class CallbackTarget:
+    """A checked callback URL and the address to connect to."""
+
+    url: httpx.URL
+    address: IPAddress
+
+    def request_url(self) -> httpx.URL:
+        """The URL with its host replaced by the pinned address."""
+        return self.url.copy_with(host=str(self.address))
+
+
+def _parse_list(value: str) -> list[str]:
+    """Split a comma-separated setting."""
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def _host_allowed(host: str) -> bool:
+    """Whether the host matches ``run_callback_allowed_hosts`` (all if unset)."""
+    allowed = _parse_list(settings.run_callback_allowed_hosts)
+    if not allowed:
+        return True
+    for pattern in allowed:
+        if pattern.startswith("*."):
+            if host.endswith(pattern[1:]):
+                return True
+        elif host == pattern:
+            return True
+    return False
+
+
+def _denied_networks() -> list[IPNetwork]:
+    """Extra networks to refuse, e.g. cluster ranges that are publicly routable."""
+    return [
+        ipaddress.ip_network(cidr, strict=False)
+        for cidr in _parse_list(settings.run_callback_denied_networks)
+    ]
+
+
+def _address_allowed(address: IPAddress) -> bool:
+    """Only globally routable addresses outside the denied networks."""
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    if not address.is_global or address.is_multicast:
+        return False
+    return not any(address in network for network in _denied_networks())
+
+
+async def resolve_callback(url: str) -> CallbackTarget:
+    """
+    Check a callback URL and resolve the address to send it to.
+
+    Raises:
+        CallbackURLRejected: If the URL is not https, its host is not
+            allowed, or any address it resolves to is not public
+    """
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL as e:
+        raise CallbackURLRejected(f"invalid URL: {e}")
+    if parsed.scheme != "https":
+        raise CallbackURLRejected("callback URL must use https")
+    host = parsed.host.lower().rstrip(".")
+    if not host:
+        raise CallbackURLRejected("callback URL has no host")
+    if parsed.userinfo:
+        raise CallbackURLRejected("callback URL must not contain credentials")
+    if not _host_allowed(host):
+        raise CallbackURLRejected(f"callback host {host} is not allowed")
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, parsed.port or 443, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror as e:
+        raise CallbackURLRejected(f"callback host {host} does not resolve: {e}")
+
+    addresses = [ipaddress.ip_address(info[4][0].split("%", 1)[0]) for info in infos]
+    if not addresses:
+        raise CallbackURLRejected(f"callback host {host} does not resolve")
+    # Reject the host if any of its addresses is internal, not just the one
+    # picked, so a mixed record cannot be used to reach the cluster
+    for address in addresses:
+        if not _address_allowed(address):
+            raise CallbackURLRejected(f"callback host {host} resolves to a non-public address")
+
+    return CallbackTarget(url=parsed, address=addresses[0])
@@ -0,0 +1,204 @@
+"""Bounded worker pool for asynchronous run jobs.
+
+``POST /v1/runs?mode=async`` authorizes the run, records a queued job and
+returns immediately; a fixed number of workers execute queued jobs, store
+the outcome for ``run_jobs_result_ttl_sec`` and notify the job's callback
+URL, if any. Callbacks are sent to the address checked by
+``resolve_callback``, without the gateway's internal trace context.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+from app.config import settings
+
+from .callbacks import CallbackURLRejected, resolve_callback
+from .store import RunJob, RunJobStore, create_job_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _QueuedJob:
+    """A job with the work to run and how to release it if never run."""
+
+    job: RunJob
+    work: Callable[[], Awaitable[dict[str, Any]]]
+    release: Callable[[], Awaitable[None]]
+
+
+class RunJobPool:
+    """Executes run jobs on a bounded pool of workers."""
+
+    def __init__(self, store: RunJobStore):
+        self.store = store
+        self._queue: asyncio.Queue[_QueuedJob] = asyncio.Queue(
+            maxsize=settings.run_jobs_queue_size
+        )
+        self._workers: list[asyncio.Task] = []
+        self._callbacks: set[asyncio.Task] = set()
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """
+        Get or create the HTTP client for completion callbacks.
+
+        Not an upstream client: callbacks leave the cluster, so they get no
+        trace context, ignore proxy settings and do not follow redirects.
+        """
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=settings.run_callback_timeout_sec,
+                follow_redirects=False,
+                trust_env=False,
+            )
+        return self._http_client
+
+    def start(self) -> None:
+        """Start the workers (called from the app lifespan)."""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker())
+                for _ in range(settings.run_jobs_workers)
+            ]
+
+    async def aclose(self) -> None:
+        """Stop the workers, failing jobs that did not finish."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        while not self._queue.empty():
+            queued = self._queue.get_nowait()
+            await queued.release()
+            await self._finish(queued.job, error="Gateway shutting down")
+
+        if self._callbacks:
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def submit(
+        self,
+        job: RunJob,
+        work: Callable[[], Awaitable[dict[str, Any]]],
+        release: Callable[[], Awaitable[None]],
+    ) -> bool:
+        """
+        Record a job and queue it.
+
+        ``work`` executes the run and returns the RunResponse payload;
+        ``release`` gives back what was reserved for the run if it is never
+        executed. Returns False if the queue is full.
+        """
+        if self._queue.full():
+            return False
+
+        job.created_at = time.time()
+        await self.store.put(job, settings.run_jobs_result_ttl_sec)
+        try:
+            self._queue.put_nowait(_QueuedJob(job=job, work=work, release=release))
+        except asyncio.QueueFull:
+            # Filled up while the job was being stored
+            await self._finish(job, error="Run queue is full")
+            return False
+        return True
+
+    async def _worker(self) -> None:
+        """Run queued jobs one at a time."""
+        while True:
+            queued = await self._queue.get()
+            await self._run(queued)
+
+    async def _run(self, queued: _QueuedJob) -> None:
+        """Execute one job and record its outcome."""
+        job = queued.job
+        job.status = RunJob.Status.RUNNING
+        await self.store.put(job, settings.run_jobs_result_ttl_sec)
+
+        try:
+            result = await queued.work()
+        except asyncio.CancelledError:
+            await self._finish(job, error="Gateway shutting down")
+            raise
+        except Exception as e:
+            logger.error(f"Run job {job.run_id} failed: {e}")
+            await self._finish(job, error=getattr(e, "detail", None) or "Agent execution failed")
+        else:
+            await self._finish(job, result=result)
+
+    async def _finish(
+        self,
+        job: RunJob,
+        result: Optional[dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Store a finished job and fire its callback."""
+        job.status = RunJob.Status.FAILED if error else RunJob.Status.SUCCEEDED
+        job.result = result
+        job.error = error
+        job.completed_at = time.time()
+        await self.store.put(job, settings.run_jobs_result_ttl_sec)
+
+        if job.callback_url:
+            task = asyncio.create_task(self._notify(job))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _notify(self, job: RunJob) -> None:
+        """POST the finished job to its callback URL, retrying with backoff."""
+        payload = asdict(job)
+        del payload["owner_id"], payload["callback_url"]
+        for name in ("created_at", "completed_at"):
+            payload[name] = datetime.fromtimestamp(payload[name], timezone.utc).isoformat()
+        body = json.dumps(payload).encode()
+
+        headers = {"Content-Type": "application/json"}
+        if settings.run_callback_secret:
+            signature = hmac.new(
+                settings.run_callback_secret.encode(), body, hashlib.sha256
+            ).hexdigest()
+            headers["X-CMP-Signature"] = f"sha256={signature}"
+
+        attempts = settings.run_callback_max_retries
+        for attempt in range(1, attempts + 1):
+            try:
+                # Resolved and checked on every attempt, then pinned to the
+                # checked address (the original host is kept for Host and SNI)
+                target = await resolve_callback(job.callback_url)
+                response = await self.http_client.post(
+                    target.request_url(),
+                    content=body,
+                    headers={**headers, "Host": target.url.netloc.decode("ascii")},
+                    extensions={"sni_hostname": target.url.host},
+                )
+                response.raise_for_status()
+                return
+            except CallbackURLRejected as e:
+                logger.error(f"Not sending callback for run {job.run_id}: {e}")
+                return
+            except Exception as e:
+                logger.warning(
+                    f"Callback for run {job.run_id} failed "
+                    f"(attempt {attempt}/{attempts}): {e}"
+                )
+                if attempt < attempts:
+                    await asyncio.sleep(2 ** attempt)
+
+        logger.error(f"Giving up on callback for run {job.run_id} to {job.callback_url}")
+
+
+# Singleton job pool
+run_jobs = RunJobPool(store=create_job_store())
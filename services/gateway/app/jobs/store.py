@@ -0,0 +1,89 @@
+"""Storage for asynchronous run jobs."""
+
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.config import settings
+
+# Seconds between sweeps of expired jobs in the memory store
+SWEEP_INTERVAL_SEC = 60.0
+
+
+@dataclass
+class RunJob:
+    """An asynchronous run and, once finished, its outcome."""
+
+    class Status:
+        QUEUED = "queued"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+
+    run_id: str
+    instance_id: str
+    owner_id: str
+    status: str = Status.QUEUED
+    created_at: float = 0.0  # Epoch seconds
+    completed_at: Optional[float] = None
+    callback_url: Optional[str] = None
+    result: Optional[dict[str, Any]] = None  # RunResponse payload
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has succeeded or failed."""
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
+
+
+class RunJobStore(ABC):
+    """Backend holding run jobs until their TTL runs out.
+
+    Implementations must be safe to share between concurrent coroutines.
+    A shared backend lets any gateway replica answer GET /v1/runs/{run_id}.
+    """
+
+    @abstractmethod
+    async def get(self, run_id: str) -> Optional[RunJob]:
+        """Get a job, or None if unknown or expired."""
+
+    @abstractmethod
+    async def put(self, job: RunJob, ttl: float) -> None:
+        """Create or replace a job, expiring it after ``ttl`` seconds."""
+
+
+class MemoryRunJobStore(RunJobStore):
+    """In-process job store; jobs are only visible on this replica."""
+
+    def __init__(self):
+        self._jobs: dict[str, tuple[RunJob, float]] = {}  # run_id -> (job, expires_at)
+        self._last_sweep = time.monotonic()
+
+    async def get(self, run_id: str) -> Optional[RunJob]:
+        entry = self._jobs.get(run_id)
+        if entry is None:
+            return None
+        job, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._jobs[run_id]
+            return None
+        return job
+
+    async def put(self, job: RunJob, ttl: float) -> None:
+        now = time.monotonic()
+        self._jobs[job.run_id] = (job, now + ttl)
+
+        if now - self._last_sweep >= SWEEP_INTERVAL_SEC:
+            self._last_sweep = now
+            expired = [run_id for run_id, (_, expires_at) in self._jobs.items() if expires_at <= now]
+            for run_id in expired:
+                del self._jobs[run_id]
+
+
+def create_job_store(backend: Optional[str] = None) -> RunJobStore:
+    """Create the job store configured by ``run_jobs_store``."""
+    backend = backend or settings.run_jobs_store
+    if backend == "memory":
+        return MemoryRunJobStore()
+    raise ValueError(f"Unknown run job store: {backend}")
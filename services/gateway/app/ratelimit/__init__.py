@@ -0,0 +1,21 @@
+"""Plan-driven rate limiting."""
+
+from .limiter import PlanLimits, RateLimited, RunLimiter, RunPermit, run_limiter
+from .store import (
+    MemoryRateLimitStore,
+    RateLimitStore,
+    SharedMemoryRateLimitStore,
+    create_rate_limit_store,
+)
+
+__all__ = [
+    "MemoryRateLimitStore",
+    "PlanLimits",
+    "RateLimitStore",
+    "RateLimited",
+    "RunLimiter",
+    "RunPermit",
+    "SharedMemoryRateLimitStore",
+    "create_rate_limit_store",
+    "run_limiter",
+]
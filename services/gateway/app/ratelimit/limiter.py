@@ -0,0 +1,131 @@
+"""Plan-driven rate limits for runs.
+
+Each instance's plan (``Plan.limits``) may set:
+
+- ``rate_limit_per_minute``: run requests per minute, enforced with a token
+  bucket holding up to ``rate_limit_burst`` tokens (default: one minute's
+  worth);
+- ``concurrent_runs``: runs of the instance executing at the same time.
+
+Runs over a limit are rejected with ``RateLimited`` before any credits are
+reserved, which the API turns into 429 with ``Retry-After``. Limits that
+are not set, and instances whose plan cannot be loaded, are not limited.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from prometheus_client import Counter
+
+from app.billing.plans import instance_plans
+from app.config import settings
+
+from .store import RateLimitStore, create_rate_limit_store
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_RUNS = Counter(
+    "gateway_rate_limited_runs_total",
+    "Runs rejected by plan rate limits",
+    ["limit"],  # rate, concurrency
+)
+
+
+class RateLimited(Exception):
+    """A run was rejected by its plan's limits."""
+
+    def __init__(self, limit: str, retry_after: float):
+        super().__init__(f"Plan limit reached: {limit}")
+        self.limit = limit
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After header value (whole seconds, at least 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+@dataclass
+class PlanLimits:
+    """Run limits of a plan (None if not limited)."""
+
+    rate_per_minute: Optional[int] = None
+    burst: Optional[int] = None
+    concurrent_runs: Optional[int] = None
+
+    @classmethod
+    def from_plan(cls, limits: dict[str, Any]) -> "PlanLimits":
+        """Read the run limits from ``Plan.limits``."""
+        return cls(
+            rate_per_minute=limits.get("rate_limit_per_minute"),
+            burst=limits.get("rate_limit_burst"),
+            concurrent_runs=limits.get("concurrent_runs"),
+        )
+
+
+class RunPermit:
+    """Counts a run against its instance's concurrent run limit until released."""
+
+    def __init__(self, store: Optional[RateLimitStore] = None, key: str = ""):
+        self._store = store
+        self._key = key
+
+    async def release(self) -> None:
+        """Stop counting the run (idempotent)."""
+        store, self._store = self._store, None
+        if store is not None:
+            await store.release(self._key)
+
+
+class RunLimiter:
+    """Enforces per-instance plan limits on runs."""
+
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+
+    async def admit(self, instance_id: str) -> RunPermit:
+        """
+        Admit a run of an instance.
+
+        Release the returned permit when the run has finished.
+
+        Raises:
+            RateLimited: If the run would exceed the instance's plan limits
+        """
+        limits = await self.limits(instance_id)
+        permit = RunPermit()
+        if limits.concurrent_runs is not None:
+            if not await self.store.acquire(f"runs:{instance_id}", limits.concurrent_runs):
+                RATE_LIMITED_RUNS.labels(limit="concurrency").inc()
+                raise RateLimited("concurrency", 1.0)
+            permit = RunPermit(self.store, f"runs:{instance_id}")
+
+        if limits.rate_per_minute is not None:
+            wait = await self.store.take(
+                f"rate:{instance_id}",
+                rate=limits.rate_per_minute / 60,
+                burst=max(1, limits.burst or limits.rate_per_minute),
+            )
+            if wait > 0:
+                await permit.release()
+                RATE_LIMITED_RUNS.labels(limit="rate").inc()
+                raise RateLimited("rate", wait)
+
+        return permit
+
+    async def limits(self, instance_id: str) -> PlanLimits:
+        """Get the run limits of an instance's plan (none while disabled)."""
+        if not settings.rate_limit_enabled:
+            return PlanLimits()
+        try:
+            plan = await instance_plans.get(instance_id)
+        except Exception as e:
+            logger.warning(f"Not rate limiting instance {instance_id}, plan unavailable: {e}")
+            return PlanLimits()
+        return PlanLimits.from_plan(plan.limits) if plan is not None else PlanLimits()
+
+
+# Singleton used by the run endpoints
+run_limiter = RunLimiter(create_rate_limit_store())
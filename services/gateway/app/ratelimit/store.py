@@ -0,0 +1,318 @@
+"""Storage for per-instance rate limit state."""
+
+import asyncio
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from prometheus_client import Counter
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Instances to keep token buckets for in the memory store
+MAX_BUCKETS = 10000
+
+# Table slots probed for a key before the shared memory table counts as full
+MAX_PROBES = 64
+
+# Workers per host whose running runs the shared memory table can count per key
+WORKERS_PER_KEY = 32
+
+# Retries of the shared memory table lock: first and longest sleep, and
+# how long to keep trying before not limiting (seconds)
+LOCK_RETRY_SEC = 0.0005
+LOCK_RETRY_MAX_SEC = 0.01
+LOCK_TIMEOUT_SEC = 0.5
+
+RATE_LIMIT_LOCK_TIMEOUTS = Counter(
+    "gateway_rate_limit_lock_timeouts_total",
+    "Rate limit checks skipped because the shared memory table stayed locked",
+)
+
+
+def take_token(
+    tokens: float,
+    updated_at: float,
+    now: float,
+    rate: float,
+    burst: float,
+) -> tuple[float, float]:
+    """
+    Refill a token bucket and take one token from it.
+
+    Returns the tokens left and the seconds until a token is available
+    (0 if one was taken).
+    """
+    tokens = min(burst, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class RateLimitStore(ABC):
+    """Backend holding a token bucket and a running-run count per key.
+
+    Implementations must be safe to share between concurrent coroutines.
+    A shared backend makes limits hold across gateway workers instead of
+    per worker.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take a token from a bucket refilling at ``rate`` per second up to
+        ``burst`` tokens (new buckets start full).
+
+        Returns 0 if a token was taken, else the seconds until one is available.
+        """
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: int) -> bool:
+        """Count one more running run unless ``limit`` are running; True if counted."""
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """Count one running run less."""
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """In-process store; limits apply per gateway worker."""
+
+    def __init__(self):
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # key -> (tokens, updated_at)
+        self._running: dict[str, int] = {}
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens, wait = take_token(tokens, updated_at, now, rate, burst)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def acquire(self, key: str, limit: int) -> bool:
+        running = self._running.get(key, 0)
+        if running >= limit:
+            return False
+        self._running[key] = running + 1
+        return True
+
+    async def release(self, key: str) -> None:
+        running = self._running.get(key, 0) - 1
+        if running > 0:
+            self._running[key] = running
+        else:
+            self._running.pop(key, None)
+
+
+class SharedMemoryRateLimitStore(RateLimitStore):
+    """Store in a memory-mapped file, shared by the gateway workers of a host.
+
+    The file (on tmpfs, e.g. /dev/shm) holds a fixed table of ``slots``
+    entries, each a key hash, a token bucket and the running runs of the
+    key per worker, with keys placed by linear probing. A new key that
+    finds no free entry takes over the entry of a key whose bucket has
+    refilled and that has no running runs; if there is none it is not
+    limited.
+
+    Running runs are counted per worker pid, with an expiry past the
+    longest a run can hold its permit (``run_ttl_sec``). Counts of workers
+    that have exited are dropped whenever the key's entry is read, and
+    counts of a worker that took no run of the key within the expiry are
+    dropped when it passes, so a worker dying mid-run (even if its pid is
+    reused) cannot hold an instance at its cap.
+
+    Operations hold an exclusive lock on the file for a few microseconds.
+    The lock is only ever tried without blocking: a contended lock is
+    retried with short sleeps on the event loop, and after
+    ``LOCK_TIMEOUT_SEC`` the operation gives up and does not limit.
+    """
+
+    # key hash, tokens, updated_at and full_at (time.monotonic(), host-wide;
+    # full_at is when the bucket will have refilled)
+    ENTRY = struct.Struct("<Qddd")
+    # pid, running runs, expires_at (whole seconds of time.monotonic())
+    WORKER = struct.Struct("<III")
+
+    def __init__(self, path: str, slots: int, run_ttl_sec: float):
+        self.path = path
+        self.slots = slots
+        self.run_ttl_sec = run_ttl_sec
+        self.slot_size = self.ENTRY.size + WORKERS_PER_KEY * self.WORKER.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * self.slot_size
+        # Blocking is fine here: this runs once, before serving
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._full_logged = False
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        async with self._locked() as locked:
+            now = time.monotonic()
+            offset = self._find(key, now) if locked else None
+            if offset is None:
+                return 0.0
+            key_hash, tokens, updated_at, _ = self.ENTRY.unpack_from(self._map, offset)
+            if updated_at == 0:
+                tokens, updated_at = burst, now  # New bucket
+            tokens, wait = take_token(tokens, updated_at, now, rate, burst)
+            self.ENTRY.pack_into(self._map, offset, key_hash, tokens, now, now + (burst - tokens) / rate)
+            return wait
+
+    async def acquire(self, key: str, limit: int) -> bool:
+        async with self._locked() as locked:
+            now = time.monotonic()
+            offset = self._find(key, now) if locked else None
+            if offset is None:
+                return True
+            if self._running_runs(offset, now) >= limit:
+                return False
+            worker = self._worker(offset, create=True)
+            if worker is None:
+                logger.warning(f"More than {WORKERS_PER_KEY} workers run {key}; not counting the run")
+                return True
+            pid, running, expires_at = self.WORKER.unpack_from(self._map, worker)
+            expires_at = max(expires_at, int(now + self.run_ttl_sec) + 1)
+            self.WORKER.pack_into(self._map, worker, os.getpid(), running + 1, expires_at)
+            return True
+
+    async def release(self, key: str) -> None:
+        async with self._locked() as locked:
+            offset = self._find(key, time.monotonic(), create=False) if locked else None
+            worker = self._worker(offset, create=False) if offset is not None else None
+            if worker is None:
+                return  # Count already dropped
+            pid, running, expires_at = self.WORKER.unpack_from(self._map, worker)
+            if running > 1:
+                self.WORKER.pack_into(self._map, worker, pid, running - 1, expires_at)
+            else:
+                self.WORKER.pack_into(self._map, worker, 0, 0, 0)
+
+    @asynccontextmanager
+    async def _locked(self) -> AsyncIterator[bool]:
+        """
+        Hold the cross-process lock on the table, without blocking the loop.
+
+        Yields whether the lock is held; False if it stayed contended for
+        ``LOCK_TIMEOUT_SEC``.
+        """
+        delay = LOCK_RETRY_SEC
+        deadline = time.monotonic() + LOCK_TIMEOUT_SEC
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    RATE_LIMIT_LOCK_TIMEOUTS.inc()
+                    logger.warning(f"Rate limit table {self.path} stayed locked; not limiting")
+                    yield False
+                    return
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LOCK_RETRY_MAX_SEC)
+        try:
+            yield True
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _find(self, key: str, now: float, create: bool = True) -> Optional[int]:
+        """Offset of the key's entry, claiming one if needed (lock held)."""
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        claimable = None
+        for probe in range(MAX_PROBES):
+            offset = ((key_hash + probe) % self.slots) * self.slot_size
+            stored_hash, _, _, full_at = self.ENTRY.unpack_from(self._map, offset)
+            if stored_hash == key_hash:
+                return offset
+            if stored_hash == 0:
+                # Entries are reused but never emptied, so the key is not further on
+                claimable = claimable if claimable is not None else offset
+                break
+            if claimable is None and full_at <= now and self._running_runs(offset, now) == 0:
+                claimable = offset  # Idle key; indistinguishable from a new one
+
+        if not create:
+            return None
+        if claimable is None:
+            if not self._full_logged:
+                logger.warning(f"Rate limit table {self.path} is full; some instances are not limited")
+                self._full_logged = True
+            return None
+        self._map[claimable:claimable + self.slot_size] = bytes(self.slot_size)
+        self.ENTRY.pack_into(self._map, claimable, key_hash, 0.0, 0.0, 0.0)
+        return claimable
+
+    def _running_runs(self, offset: int, now: float) -> int:
+        """Running runs of an entry, dropping exited and expired workers (lock held)."""
+        running_runs = 0
+        for worker in self._workers(offset):
+            pid, running, expires_at = self.WORKER.unpack_from(self._map, worker)
+            if not pid:
+                continue
+            if expires_at <= now or not _pid_alive(pid):
+                self.WORKER.pack_into(self._map, worker, 0, 0, 0)
+                continue
+            running_runs += running
+        return running_runs
+
+    def _worker(self, offset: int, create: bool) -> Optional[int]:
+        """Offset of this worker's counts in an entry, or a free one if ``create``."""
+        pid = os.getpid()
+        free = None
+        for worker in self._workers(offset):
+            stored_pid = self.WORKER.unpack_from(self._map, worker)[0]
+            if stored_pid == pid:
+                return worker
+            if stored_pid == 0 and free is None:
+                free = worker
+        return free if create else None
+
+    def _workers(self, offset: int) -> range:
+        """Offsets of the per-worker counts of an entry."""
+        start = offset + self.ENTRY.size
+        return range(start, start + WORKERS_PER_KEY * self.WORKER.size, self.WORKER.size)
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether a process exists on this host (or container)."""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return True
+
+
+def create_rate_limit_store(backend: Optional[str] = None) -> RateLimitStore:
+    """Create the store configured by ``rate_limit_store``."""
+    backend = backend or settings.rate_limit_store
+    if backend == "memory":
+        return MemoryRateLimitStore()
+    if backend == "shared_memory":
+        return SharedMemoryRateLimitStore(
+            path=settings.rate_limit_shm_path,
+            slots=settings.rate_limit_shm_slots,
+            # Runs hold permits while queued and running
+            run_ttl_sec=settings.run_queue_timeout_sec + settings.run_timeout + settings.control_plane_timeout,
+        )
+    raise ValueError(f"Unknown rate limit store: {backend}")
@@ -1,5 +1,5 @@
 """Routing module."""
 
-from .runner import RunnerClient
+from .runner import RunEvent, RunnerClient
 
-__all__ = ["RunnerClient"]
+__all__ = ["RunEvent", "RunnerClient"]
@@ -0,0 +1,58 @@
+"""Run deadlines, propagated to the Runner and on to Langflow.
+
+A run's deadline is set when the gateway starts it: ``run_timeout`` from
+now, or sooner if the client sent ``X-CMP-Timeout-Ms``. Every call made
+for the run sends the time left in ``X-CMP-Timeout-Ms`` (milliseconds, so
+hops need not agree on the clock) and uses it as its own timeout; the
+Runner does the same towards Langflow. Nobody keeps working on a run the
+client has stopped waiting for.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+DEADLINE_HEADER = "X-CMP-Timeout-Ms"
+
+# time.monotonic() deadline of the current run
+_deadline: ContextVar[Optional[float]] = ContextVar("run_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The run's deadline passed before a call could be made."""
+
+
+@contextmanager
+def run_deadline(timeout: float) -> Iterator[None]:
+    """Set the deadline of the current run (an earlier one is kept)."""
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left(default: float) -> float:
+    """
+    Seconds left until the current run's deadline, or ``default`` if it has none.
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Run deadline exceeded")
+    return left
+
+
+def deadline_headers(timeout: float) -> dict[str, str]:
+    """Headers passing the time left on to the next hop."""
+    return {DEADLINE_HEADER: str(max(1, int(timeout * 1000)))}
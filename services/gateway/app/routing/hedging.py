@@ -0,0 +1,160 @@
+"""Hedged Runner calls for short, idempotent flows.
+
+A few slow Langflow workers dominate the p99 of flows that normally answer
+in a fraction of a second. For offerings flagged ``hedge_runs`` (cheap,
+idempotent flows such as FAQ or classification agents), a run that has not
+answered by the offering's p95 latency is sent again to a different Runner
+replica. The first successful response wins and the other call is
+cancelled; only the winner's usage is settled, as the caller sees a single
+result.
+
+Each offering has a hedge budget: every run adds ``runner_hedge_budget_ratio``
+of a token (up to ``runner_hedge_budget_burst``) and every hedge spends one,
+so hedges add at most that share of load even when the Runner slows down
+as a whole. Offerings are not hedged until ``runner_hedge_min_samples``
+latencies have been observed.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from prometheus_client import Counter
+
+from app.billing.plans import instance_plans
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RUNNER_HEDGES = Counter(
+    "gateway_runner_hedges_total",
+    "Hedged Runner calls",
+    ["outcome"],  # sent, won, throttled
+)
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """The latest call latencies of an offering."""
+
+    def __init__(self, size: int):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        """95th percentile latency, or None with fewer than ``min_samples``."""
+        if len(self._samples) < max(1, min_samples):
+            return None
+        samples = sorted(self._samples)
+        return samples[int(0.95 * (len(samples) - 1))]
+
+
+class HedgeBudget:
+    """Token bucket refilled by runs and drained by hedges."""
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+
+    def deposit(self) -> None:
+        """Credit one run."""
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take a token for a hedge; False if the budget is spent."""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RunHedger:
+    """Runs calls with a hedge per offering, within the offering's budget."""
+
+    def __init__(self):
+        self._latencies: dict[str, LatencyWindow] = {}
+        self._budgets: dict[str, HedgeBudget] = {}
+
+    async def run(self, offering: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await ``attempt()``, calling it again if the first call is slow.
+
+        Returns the first successful result; the other call is cancelled.
+        If both fail, the first call's error is raised.
+        """
+        budget = self._budgets.get(offering)
+        if budget is None:
+            budget = self._budgets[offering] = HedgeBudget(
+                settings.runner_hedge_budget_ratio,
+                settings.runner_hedge_budget_burst,
+            )
+        budget.deposit()
+
+        latencies = self._latencies.get(offering)
+        if latencies is None:
+            latencies = self._latencies[offering] = LatencyWindow(settings.runner_hedge_window)
+        delay = latencies.p95(settings.runner_hedge_min_samples)
+
+        primary = asyncio.create_task(self._timed(latencies, attempt))
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=max(delay, settings.runner_hedge_min_delay_sec)
+                )
+                if not done:
+                    if budget.withdraw():
+                        RUNNER_HEDGES.labels(outcome="sent").inc()
+                        tasks.append(asyncio.create_task(self._timed(latencies, attempt)))
+                    else:
+                        RUNNER_HEDGES.labels(outcome="throttled").inc()
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            RUNNER_HEDGES.labels(outcome="won").inc()
+                        return task.result()
+                    if task is not primary:
+                        logger.warning(f"Hedged call for offering {offering} failed: {task.exception()!r}")
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let the losing call close its connection (the Runner then
+            # cancels its Langflow call) before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _timed(latencies: LatencyWindow, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Await a call, recording its latency if it succeeds."""
+        started = time.monotonic()
+        result = await attempt()
+        latencies.record(time.monotonic() - started)
+        return result
+
+
+async def hedge_offering(instance_id: str) -> Optional[str]:
+    """Offering to hedge the instance's runs under, or None if they are not hedged."""
+    if not settings.runner_hedging_enabled:
+        return None
+    try:
+        plan = await instance_plans.get(instance_id)
+    except Exception as e:
+        logger.warning(f"Not hedging runs of instance {instance_id}, plan unavailable: {e}")
+        return None
+    if plan is None or not plan.hedge_runs:
+        return None
+    return plan.offering or None
+
+
+# Process-wide hedger used by the Runner client
+run_hedger = RunHedger()
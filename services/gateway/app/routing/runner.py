@@ -1,37 +1,138 @@
 """Runner client for executing agent runs."""
 
+import json
 import logging
-from dataclasses import dataclass
-from typing import Any, Optional
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional
 
 import httpx
+import orjson
 
 from app.config import settings
+from app.upstream import Replica, ReplicaBalancer, create_guard, create_pooled_client
+
+from .deadline import deadline_headers, time_left
+from .hedging import run_hedger
 
 logger = logging.getLogger(__name__)
 
+# Media type asking the Runner for the bare run output as the body, with
+# the run ID and usage in headers, so the output passes through unparsed
+OUTPUT_MEDIA_TYPE = "application/vnd.cmp.run-output+json"
+RUN_ID_HEADER = "X-CMP-Run-Id"
+USAGE_HEADER = "X-CMP-Usage"
+
 
 @dataclass
 class RunResult:
     """Result of agent run execution."""
 
     run_id: str
-    output: dict[str, Any]
+    output_json: bytes  # JSON object {"text", "data"}, as sent by the Runner
     usage: dict[str, int]
 
+    @property
+    def output(self) -> dict[str, Any]:
+        """The run output, parsed."""
+        return orjson.loads(self.output_json)
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "RunResult":
+        """
+        Read a Runner ``/run`` response, validating only its envelope.
+
+        The output is kept as the bytes the Runner sent. Runners that do
+        not support ``OUTPUT_MEDIA_TYPE`` send the whole result as a JSON
+        body, whose output is re-encoded.
+
+        Raises:
+            ValueError: If the run ID, usage or output is malformed
+        """
+        if response.headers.get("content-type", "").startswith(OUTPUT_MEDIA_TYPE):
+            run_id = response.headers.get(RUN_ID_HEADER, "")
+            usage = orjson.loads(response.headers.get(USAGE_HEADER, "{}"))
+            output_json = response.content
+        else:
+            data = orjson.loads(response.content)
+            run_id = data.get("run_id", "")
+            usage = data.get("usage", {})
+            output_json = orjson.dumps(data.get("output", {}))
+
+        if not isinstance(usage, dict) or not all(
+            isinstance(key, str) and type(value) is int for key, value in usage.items()
+        ):
+            raise ValueError("Malformed run usage from Runner")
+        if output_json[:1] != b"{":
+            raise ValueError("Malformed run output from Runner")
+        return cls(run_id=run_id, output_json=output_json, usage=usage)
+
+
+@dataclass
+class RunEvent:
+    """A Server-Sent Event relayed from a streaming run."""
+
+    event: str
+    data: dict[str, Any] = field(default_factory=dict)
+
 
 class RunnerClient:
-    """Client for Runner service."""
+    """Client for Runner service, load balanced across its replicas."""
 
     def __init__(self):
         self.base_url = settings.runner_url
         self.timeout = settings.run_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.guard = create_guard(
+            "runner",
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_timeout_sec=settings.breaker_reset_timeout_sec,
+            initial_limit=settings.runner_concurrency_initial,
+            min_limit=settings.runner_concurrency_min,
+            max_limit=settings.runner_concurrency_max,
+            latency_target_sec=settings.runner_latency_target_sec,
+        )
+
+        urls = [url.strip() for url in settings.runner_urls.split(",") if url.strip()]
+        self.balancer = ReplicaBalancer(
+            "runner",
+            urls=urls or [self.base_url],
+            strategy=settings.runner_lb_strategy,
+            dns_discovery=settings.runner_dns_discovery and not urls,
+            dns_refresh_sec=settings.runner_dns_refresh_sec,
+            probe_interval_sec=settings.runner_probe_interval_sec,
+            probe_timeout_sec=settings.runner_probe_timeout_sec,
+            eject_after_failures=settings.runner_eject_after_failures,
+            slow_start_sec=settings.runner_slow_start_sec,
+        )
+
+    def open(self) -> None:
+        """Create the pooled HTTP client and start probing replicas (called from the app lifespan)."""
+        if self._client is None:
+            # Requests use absolute replica URLs chosen by the balancer
+            self._client = create_pooled_client("runner", timeout=self.timeout)
+            self.balancer.start(self._client)
+
+    async def aclose(self) -> None:
+        """Stop probing and close the pooled HTTP client and its connections."""
+        await self.balancer.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client, creating it if needed."""
+        self.open()
+        return self._client
 
     async def execute(
         self,
         instance_id: str,
         input_data: dict[str, Any],
         metadata: Optional[dict] = None,
+        run_id: Optional[str] = None,
+        hedge: Optional[str] = None,
     ) -> RunResult:
         """
         Execute an agent run.
@@ -40,33 +141,108 @@ class RunnerClient:
         1. Fetches artifact from MinIO
         2. Calls Studio (Langflow) runtime
         3. Returns response with usage metrics
+
+        Passing the gateway's ``run_id`` makes the Runner use the same ID,
+        so logs and traces of both services correlate.
+
+        Waits at most until the run's deadline, which is passed on to the
+        Runner.
+
+        The Runner's output is not parsed, only the run ID and usage
+        (see ``RunResult.from_response``).
+
+        With ``hedge`` (an offering, see ``hedging.hedge_offering``), a
+        slow call is repeated on another replica and the first result wins.
+
+        Raises:
+            DeadlineExceeded: If the run's deadline has already passed
+            ValueError: If the Runner's response is malformed
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/run",
-                    json={
-                        "instance_id": instance_id,
-                        "input": input_data,
-                        "metadata": metadata or {},
-                    },
-                    timeout=self.timeout,
+        payload = {
+            "instance_id": instance_id,
+            "input": input_data,
+            "metadata": metadata or {},
+            "run_id": run_id,
+        }
+        replicas: list[Replica] = []  # Replicas called, avoided by a hedge
+        if hedge is None or len(self.balancer.replicas) < 2:
+            return await self._execute_on(payload, replicas)
+        return await run_hedger.run(hedge, lambda: self._execute_on(payload, replicas))
+
+    async def _execute_on(self, payload: dict[str, Any], replicas: list[Replica]) -> RunResult:
+        """Call ``/run`` on a replica not in ``replicas`` (if possible), adding it."""
+        timeout = time_left(self.timeout)
+        try:
+            async with self.guard.call(), self.balancer.acquire(exclude=replicas) as replica:
+                replicas.append(replica)
+                response = await self.client.post(
+                    f"{replica.url}/run",
+                    json=payload,
+                    headers={"Accept": OUTPUT_MEDIA_TYPE, **deadline_headers(timeout)},
+                    timeout=timeout,
                 )
                 response.raise_for_status()
-                data = response.json()
+            return RunResult.from_response(response)
 
-                return RunResult(
-                    run_id=data.get("run_id", ""),
-                    output=data.get("output", {}),
-                    usage=data.get("usage", {}),
-                )
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Runner execute failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Runner execute request error: {e}")
+            raise
+
+    async def stream(
+        self,
+        instance_id: str,
+        input_data: dict[str, Any],
+        metadata: Optional[dict] = None,
+        run_id: Optional[str] = None,
+    ) -> AsyncIterator[RunEvent]:
+        """
+        Execute an agent run and yield its events as they arrive.
+
+        The Runner emits ``token`` events while the flow generates output,
+        then a single ``end`` event (run_id, output, usage) or an ``error``
+        event. The run's deadline is passed on to the Runner, which ends
+        the stream with an ``error`` event when it expires.
+
+        Raises:
+            DeadlineExceeded: If the run's deadline has already passed
+        """
+        timeout = time_left(self.timeout)
+        try:
+            async with self.guard.call(), self.balancer.acquire() as replica, self.client.stream(
+                "POST",
+                f"{replica.url}/run:stream",
+                json={
+                    "instance_id": instance_id,
+                    "input": input_data,
+                    "metadata": metadata or {},
+                    "run_id": run_id,
+                },
+                headers={"Accept": "text/event-stream", **deadline_headers(timeout)},
+                timeout=timeout,
+            ) as response:
+                response.raise_for_status()
 
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Runner execute failed: {e}")
-                raise
-            except httpx.RequestError as e:
-                logger.error(f"Runner execute request error: {e}")
-                raise
+                event = "message"
+                data_lines: list[str] = []
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data_lines.append(line[len("data:"):].strip())
+                    elif not line and data_lines:
+                        yield RunEvent(event=event, data=json.loads("\n".join(data_lines)))
+                        event = "message"
+                        data_lines = []
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Runner stream failed: {e}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Runner stream request error: {e}")
+            raise
 
 
 # Singleton client
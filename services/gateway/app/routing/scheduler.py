@@ -0,0 +1,183 @@
+"""Weighted fair admission of runs to the Runner.
+
+Runner capacity is shared by every tenant. Left alone, the org sending the
+most requests takes most of it, so one org firing a large batch makes
+everyone else queue behind it or get 503s. With the scheduler enabled,
+every Runner call (sync, async, streamed and batch item) first takes a
+slot; when none is free it waits in its org's queue.
+
+Free slots are handed out by self-clocked weighted fair queuing: a queued
+run gets the virtual finish tag ``max(virtual time, org's last tag) +
+1 / weight`` and the lowest tag goes next. While two orgs are backlogged,
+one with weight 4 gets four slots for every slot of one with weight 1,
+and an org that was idle is not penalised for earlier bursts. Weights
+come from the tier of the instance's plan (``Plan.limits["tier"]``).
+
+The number of slots follows the Runner's adaptive concurrency limit, so
+runs queue fairly here instead of being rejected by the upstream guard.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.billing.plans import instance_plans
+from app.config import settings
+from app.telemetry.run_metrics import LATENCY_BUCKETS
+from app.upstream import AIMDLimiter, UpstreamUnavailable
+
+from .deadline import time_left
+from .runner import runner_client
+
+logger = logging.getLogger(__name__)
+
+RUN_QUEUE_DEPTH = Gauge(
+    "gateway_run_queue_depth",
+    "Runs waiting for Runner capacity",
+    ["tier"],
+)
+RUN_QUEUE_WAIT = Histogram(
+    "gateway_run_queue_wait_seconds",
+    "Time runs waited for Runner capacity",
+    ["tier"],
+    buckets=LATENCY_BUCKETS,
+)
+RUN_QUEUE_REJECTED = Counter(
+    "gateway_run_queue_rejected_total",
+    "Runs rejected while waiting for Runner capacity",
+    ["tier", "reason"],  # queue_full, queue_timeout
+)
+
+# Tier label for plans whose tier has no configured weight
+OTHER_TIER = "other"
+
+
+def parse_tier_weights(value: str) -> dict[str, float]:
+    """Parse ``tier:weight,tier:weight`` into a weight per tier."""
+    weights: dict[str, float] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        tier, sep, weight = item.partition(":")
+        if not sep or not tier:
+            raise ValueError("run_scheduler_tier_weights entries must be tier:weight")
+        weights[tier.strip()] = float(weight)
+    if any(weight <= 0 for weight in weights.values()):
+        raise ValueError("run_scheduler_tier_weights must be positive")
+    return weights
+
+
+class RunScheduler:
+    """Admits runs to the Runner, sharing capacity fairly between orgs."""
+
+    def __init__(self, limiter: AIMDLimiter, tier_weights: dict[str, float]):
+        self._limiter = limiter  # Slots follow the Runner's concurrency limit
+        self.tier_weights = tier_weights
+        self.in_flight = 0
+        self._virtual_time = 0.0
+        # Heap of (finish tag, sequence, future resolved when the slot is granted)
+        self._queue: list[tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()  # Tie-breaker, FIFO within a tag
+        self._finish_tags: dict[str, float] = {}  # org -> tag of its last queued run
+        self._queued: dict[str, int] = {}  # org -> runs waiting
+
+    @asynccontextmanager
+    async def slot(self, instance_id: str) -> AsyncIterator[None]:
+        """
+        Hold a Runner slot for a run of an instance.
+
+        Raises:
+            UpstreamUnavailable: If the instance's org has too many queued
+                runs, or no slot was granted within run_queue_timeout_sec
+            DeadlineExceeded: If the run's deadline passed while waiting
+        """
+        if not settings.run_scheduler_enabled:
+            yield
+            return
+
+        await self._acquire(instance_id)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._dispatch()
+
+    async def _acquire(self, instance_id: str) -> None:
+        """Wait in the org's queue until a slot is granted."""
+        org_id, tier = await self._classify(instance_id)
+        label = tier if tier in self.tier_weights else OTHER_TIER
+
+        if self._queued.get(org_id, 0) >= settings.run_queue_max_per_org:
+            RUN_QUEUE_REJECTED.labels(tier=label, reason="queue_full").inc()
+            raise UpstreamUnavailable("runner", "queue_full", 1.0)
+
+        weight = self.tier_weights.get(tier, 1.0)
+        tag = max(self._virtual_time, self._finish_tags.get(org_id, 0.0)) + 1.0 / weight
+        self._finish_tags[org_id] = tag
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (tag, next(self._sequence), granted))
+        self._queued[org_id] = self._queued.get(org_id, 0) + 1
+        self._dispatch()
+
+        started = time.monotonic()
+        RUN_QUEUE_DEPTH.labels(tier=label).inc()
+        try:
+            queue_timeout = min(settings.run_queue_timeout_sec, time_left(settings.run_queue_timeout_sec))
+            async with asyncio.timeout(queue_timeout):
+                await granted
+        except BaseException as e:
+            if granted.done() and not granted.cancelled():
+                # Granted just as the wait ended; hand the slot on
+                self.in_flight -= 1
+                self._dispatch()
+            granted.cancel()  # Left in the heap, skipped when reached
+            if isinstance(e, TimeoutError):
+                RUN_QUEUE_REJECTED.labels(tier=label, reason="queue_timeout").inc()
+                raise UpstreamUnavailable("runner", "queue_timeout", 1.0)
+            raise
+        finally:
+            RUN_QUEUE_DEPTH.labels(tier=label).dec()
+            RUN_QUEUE_WAIT.labels(tier=label).observe(time.monotonic() - started)
+            self._queued[org_id] -= 1
+            if not self._queued[org_id]:
+                del self._queued[org_id]
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the queued runs with the lowest finish tags."""
+        while self._queue and self.in_flight < int(self._limiter.limit):
+            tag, _, granted = heapq.heappop(self._queue)
+            if granted.done():
+                continue  # Gave up waiting
+            self._virtual_time = tag
+            self.in_flight += 1
+            granted.set_result(None)
+
+        if not self._queue:
+            # Nobody is backlogged, so no org has used more than its share
+            self._finish_tags.clear()
+
+    async def _classify(self, instance_id: str) -> tuple[str, str]:
+        """Get the org and plan tier of an instance."""
+        try:
+            plan = await instance_plans.get(instance_id)
+        except Exception as e:
+            logger.warning(f"Scheduling run of instance {instance_id} without its plan: {e}")
+            plan = None
+        if plan is None:
+            # Queued on its own, with the default weight
+            return f"instance:{instance_id}", OTHER_TIER
+        return plan.org_id, plan.tier
+
+
+# Process-wide run scheduler
+run_scheduler = RunScheduler(
+    limiter=runner_client.guard.limiter,
+    tier_weights=parse_tier_weights(settings.run_scheduler_tier_weights),
+)
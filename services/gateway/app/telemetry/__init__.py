@@ -0,0 +1,14 @@
+"""Operational telemetry (metrics and traces)."""
+
+from .run_metrics import RunTracker, record_settlement_failure, timed_auth, timed_stage
+from .tracing import continue_trace, current_trace_context, set_run_attributes
+
+__all__ = [
+    "RunTracker",
+    "continue_trace",
+    "current_trace_context",
+    "record_settlement_failure",
+    "set_run_attributes",
+    "timed_auth",
+    "timed_stage",
+]
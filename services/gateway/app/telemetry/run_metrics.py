@@ -0,0 +1,130 @@
+"""Prometheus metrics for the /v1/runs pipeline.
+
+Stage latencies show whether a regression comes from authentication, the
+Control Plane (billing authorize/settle) or the Runner/Langflow. Metrics
+are labelled by instance, with the number of distinct instance labels
+capped so that a large fleet cannot blow up series cardinality; instances
+beyond the cap share the "other" label.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings
+
+# Runs take up to run_timeout (120s); billing calls should be milliseconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_DURATION = Histogram(
+    "gateway_run_stage_duration_seconds",
+    "Duration of each stage of a run",
+    ["stage", "instance"],  # billing_authorize, runner_execute, billing_settle, response_build
+    buckets=LATENCY_BUCKETS,
+)
+AUTH_DURATION = Histogram(
+    "gateway_auth_duration_seconds",
+    "Duration of request authentication",
+    ["method"],  # jwt, api_key
+    buckets=LATENCY_BUCKETS,
+)
+RUNS = Counter(
+    "gateway_runs_total",
+    "Finished runs by HTTP status",
+    ["mode", "instance", "status"],  # mode: sync, async, stream, batch, widget_ws
+)
+SETTLEMENT_FAILURES = Counter(
+    "gateway_settlement_failures_total",
+    "Runs whose billing settlement failed",
+    ["instance"],
+)
+RUNS_IN_FLIGHT = Gauge(
+    "gateway_runs_in_flight",
+    "Runs currently being processed",
+    ["mode", "instance"],
+)
+
+OTHER_INSTANCES = "other"
+
+_instance_labels: set[str] = set()
+
+
+def instance_label(instance_id: str) -> str:
+    """Label for an instance, collapsing instances beyond the cap into "other"."""
+    if instance_id in _instance_labels:
+        return instance_id
+    if len(_instance_labels) < settings.metrics_max_instance_labels:
+        _instance_labels.add(instance_id)
+        return instance_id
+    return OTHER_INSTANCES
+
+
+@contextmanager
+def timed_stage(stage: str, instance_id: str) -> Iterator[None]:
+    """Time a pipeline stage, whether or not it succeeds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage, instance=instance_label(instance_id)).observe(
+            time.perf_counter() - started
+        )
+
+
+@contextmanager
+def timed_auth(method: str) -> Iterator[None]:
+    """Time request authentication."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        AUTH_DURATION.labels(method=method).observe(time.perf_counter() - started)
+
+
+class RunTracker:
+    """Counts a run as in flight until it finishes, then records its status."""
+
+    def __init__(self, mode: str, instance_id: str):
+        self.mode = mode
+        self.instance = instance_label(instance_id)
+        self._finished = False
+        RUNS_IN_FLIGHT.labels(mode=mode, instance=self.instance).inc()
+
+    def finish(self, status: int) -> None:
+        """Record the run's outcome; later calls are ignored."""
+        if self._finished:
+            return
+        self._finished = True
+        RUNS_IN_FLIGHT.labels(mode=self.mode, instance=self.instance).dec()
+        RUNS.labels(mode=self.mode, instance=self.instance, status=str(status)).inc()
+
+    @contextmanager
+    def track(self, status: Optional[int] = 200) -> Iterator[None]:
+        """
+        Finish with ``status``, or with the status of the error raised.
+
+        With status=None the run stays in flight on success, for responses
+        that keep streaming after the handler returns.
+        """
+        try:
+            yield
+        except HTTPException as e:
+            self.finish(e.status_code)
+            raise
+        except asyncio.CancelledError:
+            self.finish(499)  # Client closed request
+            raise
+        except BaseException:
+            self.finish(500)
+            raise
+        if status is not None:
+            self.finish(status)
+
+
+def record_settlement_failure(instance_id: str) -> None:
+    """Count a failed billing settlement."""
+    SETTLEMENT_FAILURES.labels(instance=instance_label(instance_id)).inc()
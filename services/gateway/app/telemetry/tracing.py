@@ -0,0 +1,182 @@
+"""Distributed tracing with W3C trace context (OpenTelemetry).
+
+Incoming ``traceparent``/``tracestate`` headers are continued by a server
+span per request, and every upstream call made through the pooled clients
+gets a client span and carries the trace context onwards (Runner, Control
+Plane). The runner and connector services do the same, so a slow run can
+be followed end to end.
+
+Spans are exported by the exporter named in ``tracing_exporter``:
+
+- ``none``: no spans are recorded, but incoming trace context is still
+  propagated to upstreams
+- ``file``: one JSON span per line in ``tracing_file_path``, for local testing
+- ``otlp``: OTLP/HTTP to ``tracing_otlp_endpoint`` (e.g. a local collector)
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "cmp-gateway"
+
+tracer = trace.get_tracer(SERVICE_NAME)
+
+_provider: Optional[TracerProvider] = None
+
+
+def create_exporter(name: str) -> Optional[SpanExporter]:
+    """Create the span exporter called ``name``."""
+    if name == "none":
+        return None
+    if name == "file":
+        out = open(settings.tracing_file_path, "a")
+        return ConsoleSpanExporter(
+            out=out,
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    raise ValueError(f"Unknown tracing exporter: {name}")
+
+
+def setup_tracing() -> None:
+    """Install the tracer provider for the configured exporter."""
+    global _provider
+
+    exporter = create_exporter(settings.tracing_exporter)
+    if exporter is None or _provider is not None:
+        return
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Tracing enabled: exporter={settings.tracing_exporter}")
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop span export."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+class TracingMiddleware:
+    """ASGI middleware continuing the caller's trace with a server span.
+
+    A plain ASGI middleware (rather than an HTTP middleware) so that the
+    span covers streamed responses until their last byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        method = scope["method"]
+
+        with tracer.start_as_current_span(
+            f"{method} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as span:
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    span.set_attribute("http.response.status_code", status_code)
+                    if status_code >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Name by route template to keep span names low-cardinality
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"{method} {route.path}")
+
+
+def start_client_span(upstream: str, method: str, url: str) -> Optional[trace.Span]:
+    """
+    Start a client span for an upstream call made within a traced request.
+
+    Returns None outside of a request (e.g. health probes, background
+    flushes), so that those do not produce a trace each.
+    """
+    if not trace.get_current_span().get_span_context().is_valid:
+        return None
+    return tracer.start_span(
+        f"{method} {upstream}",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "http.request.method": method,
+            "url.full": url,
+            "peer.service": upstream,
+        },
+    )
+
+
+def inject_trace_context(headers, span: Optional[trace.Span] = None) -> None:
+    """Add W3C trace context headers for ``span`` (or the current span)."""
+    carrier: dict[str, str] = {}
+    if span is not None:
+        propagate.inject(carrier, context=trace.set_span_in_context(span))
+    else:
+        propagate.inject(carrier)
+    for key, value in carrier.items():
+        headers[key] = value
+
+
+def end_client_span(span: Optional[trace.Span], status_code: Optional[int] = None, error: Optional[BaseException] = None) -> None:
+    """Record the outcome of an upstream call and end its span."""
+    if span is None:
+        return
+    if status_code is not None:
+        span.set_attribute("http.response.status_code", status_code)
+        if status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+    if error is not None:
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, type(error).__name__))
+    span.end()
+
+
+def set_run_attributes(run_id: str, instance_id: str) -> None:
+    """Tag the current span with the run it belongs to."""
+    span = trace.get_current_span()
+    span.set_attribute("cmp.run_id", run_id)
+    span.set_attribute("cmp.instance_id", instance_id)
+
+
+def current_trace_context() -> context.Context:
+    """Capture the current trace context, to continue it in background work."""
+    return context.get_current()
+
+
+@contextmanager
+def continue_trace(name: str, parent: context.Context) -> Iterator[trace.Span]:
+    """Run background work (e.g. a queued run job) as a child span of ``parent``."""
+    with tracer.start_as_current_span(name, context=parent) as span:
+        yield span
@@ -0,0 +1,23 @@
+"""Upstream connection management."""
+
+from .balancer import Replica, ReplicaBalancer
+from .guard import (
+    AIMDLimiter,
+    CircuitBreaker,
+    UpstreamGuard,
+    UpstreamUnavailable,
+    create_guard,
+)
+from .pool import InstrumentedTransport, create_pooled_client
+
+__all__ = [
+    "AIMDLimiter",
+    "CircuitBreaker",
+    "InstrumentedTransport",
+    "Replica",
+    "ReplicaBalancer",
+    "UpstreamGuard",
+    "UpstreamUnavailable",
+    "create_guard",
+    "create_pooled_client",
+]
@@ -0,0 +1,243 @@
+"""Health-aware load balancing across upstream replicas.
+
+Runs vary hugely in duration, so spreading requests round-robin (as a
+Kubernetes Service does) leaves some runner pods hot while others idle.
+The balancer instead tracks outstanding requests per replica and picks the
+least loaded one (or the better of two random picks), skipping replicas
+that fail consecutive health probes. Re-admitted replicas ramp up over a
+slow-start window instead of taking a full share immediately.
+
+Replicas come from a static list of URLs or from resolving a DNS name
+(e.g. a headless Service) to all of its addresses.
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Collection, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+logger = logging.getLogger(__name__)
+
+# Minimum share of traffic a replica gets at the start of slow-start
+SLOW_START_MIN_WEIGHT = 0.1
+
+
+@dataclass
+class Replica:
+    """One upstream replica and its load/health state."""
+
+    url: str
+    outstanding: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    admitted_at: float = 0.0  # time.monotonic() when (re-)admitted
+
+    def weight(self, slow_start_sec: float) -> float:
+        """Share of traffic the replica can take, ramping up after admission."""
+        if slow_start_sec <= 0:
+            return 1.0
+        elapsed = time.monotonic() - self.admitted_at
+        return max(SLOW_START_MIN_WEIGHT, min(1.0, elapsed / slow_start_sec))
+
+    def load(self, slow_start_sec: float) -> float:
+        """Outstanding requests (including the next one) scaled by weight."""
+        return (self.outstanding + 1) / self.weight(slow_start_sec)
+
+
+class ReplicaBalancer:
+    """Picks a replica per request and probes replicas in the background."""
+
+    def __init__(
+        self,
+        upstream: str,
+        urls: list[str],
+        strategy: str = "least_outstanding",
+        dns_discovery: bool = False,
+        dns_refresh_sec: float = 30.0,
+        health_path: str = "/health",
+        probe_interval_sec: float = 5.0,
+        probe_timeout_sec: float = 2.0,
+        eject_after_failures: int = 3,
+        slow_start_sec: float = 30.0,
+    ):
+        """
+        Args:
+            upstream: Name used in logs and metrics (e.g. "runner")
+            urls: Replica base URLs; with dns_discovery, a single URL whose
+                host is resolved to all of its addresses
+            strategy: "least_outstanding" or "p2c" (power of two choices)
+        """
+        if strategy not in ("least_outstanding", "p2c"):
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        if dns_discovery and len(urls) != 1:
+            raise ValueError("DNS discovery needs exactly one URL")
+
+        self.upstream = upstream
+        self.strategy = strategy
+        self.dns_discovery = dns_discovery
+        self.dns_refresh_sec = dns_refresh_sec
+        self.health_path = health_path
+        self.probe_interval_sec = probe_interval_sec
+        self.probe_timeout_sec = probe_timeout_sec
+        self.eject_after_failures = eject_after_failures
+        self.slow_start_sec = slow_start_sec
+
+        self._seed_urls = [url.rstrip("/") for url in urls]
+        # Until DNS is resolved, send traffic to the name itself
+        self.replicas: list[Replica] = [Replica(url=url) for url in self._seed_urls]
+        self._tasks: list[asyncio.Task] = []
+        _balancers[upstream] = self
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        """Start probing (and DNS refresh), using ``client`` for probes."""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._probe_loop(client)))
+        if self.dns_discovery:
+            self._tasks.append(asyncio.create_task(self._resolve_loop()))
+
+    async def aclose(self) -> None:
+        """Stop background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def pick(self, exclude: Collection[Replica] = ()) -> Replica:
+        """Choose the replica for the next request, avoiding ``exclude`` if possible."""
+        candidates = [replica for replica in self.replicas if replica.healthy]
+        if not candidates:
+            # Every replica is failing probes; probes may be wrong, so fail open
+            candidates = self.replicas
+        if exclude:
+            candidates = [replica for replica in candidates if replica not in exclude] or candidates
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if self.strategy == "p2c":
+            first, second = random.sample(candidates, 2)
+            return min(first, second, key=lambda replica: replica.load(self.slow_start_sec))
+
+        lowest = min(replica.load(self.slow_start_sec) for replica in candidates)
+        return random.choice([
+            replica for replica in candidates
+            if replica.load(self.slow_start_sec) == lowest
+        ])
+
+    @asynccontextmanager
+    async def acquire(self, exclude: Collection[Replica] = ()) -> AsyncIterator[Replica]:
+        """Pick a replica and count the request as outstanding until done."""
+        replica = self.pick(exclude)
+        replica.outstanding += 1
+        try:
+            yield replica
+        finally:
+            replica.outstanding -= 1
+
+    async def _probe_loop(self, client: httpx.AsyncClient) -> None:
+        """Probe every replica's health endpoint periodically."""
+        while True:
+            await asyncio.gather(*(self._probe(client, replica) for replica in self.replicas))
+            await asyncio.sleep(self.probe_interval_sec)
+
+    async def _probe(self, client: httpx.AsyncClient, replica: Replica) -> None:
+        """Probe one replica, ejecting or re-admitting it as needed."""
+        try:
+            response = await client.get(
+                f"{replica.url}{self.health_path}",
+                timeout=self.probe_timeout_sec,
+            )
+            response.raise_for_status()
+        except Exception as e:
+            replica.consecutive_failures += 1
+            if replica.healthy and replica.consecutive_failures >= self.eject_after_failures:
+                replica.healthy = False
+                logger.warning(
+                    f"Ejected {self.upstream} replica {replica.url} after "
+                    f"{replica.consecutive_failures} failed probes: {e}"
+                )
+            return
+
+        replica.consecutive_failures = 0
+        if not replica.healthy:
+            replica.healthy = True
+            replica.admitted_at = time.monotonic()
+            logger.info(f"Re-admitted {self.upstream} replica {replica.url} (slow start)")
+
+    async def _resolve_loop(self) -> None:
+        """Re-resolve the DNS name periodically."""
+        while True:
+            try:
+                await self._resolve()
+            except Exception as e:
+                logger.warning(f"Resolving {self.upstream} replicas failed: {e}")
+            await asyncio.sleep(self.dns_refresh_sec)
+
+    async def _resolve(self) -> None:
+        """Replace the replica set with the name's current addresses."""
+        parts = urlsplit(self._seed_urls[0])
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, port, type=socket.SOCK_STREAM
+        )
+        addresses = sorted({info[4][0] for info in infos})
+        if not addresses:
+            return
+
+        urls = []
+        for address in addresses:
+            host = f"[{address}]" if ":" in address else address
+            urls.append(urlunsplit((parts.scheme, f"{host}:{port}", parts.path, "", "")))
+
+        existing = {replica.url: replica for replica in self.replicas}
+        if set(urls) == existing.keys():
+            return
+
+        now = time.monotonic()
+        # Keep state of known replicas; new ones slow-start, unless this is
+        # the first resolution and there is nothing to ramp up from
+        first = not any(url in existing for url in urls)
+        self.replicas = [
+            existing.get(url) or Replica(url=url, admitted_at=0.0 if first else now)
+            for url in urls
+        ]
+        logger.info(f"Resolved {len(urls)} {self.upstream} replicas: {urls}")
+
+
+_balancers: dict[str, ReplicaBalancer] = {}
+
+
+class BalancerCollector(Collector):
+    """Prometheus collector reporting per-replica state at scrape time."""
+
+    def collect(self):
+        outstanding = GaugeMetricFamily(
+            "gateway_upstream_replica_outstanding_requests",
+            "Requests in flight to each upstream replica",
+            labels=["upstream", "replica"],
+        )
+        healthy = GaugeMetricFamily(
+            "gateway_upstream_replica_healthy",
+            "Whether the replica is receiving traffic (1) or ejected (0)",
+            labels=["upstream", "replica"],
+        )
+        for upstream, balancer in _balancers.items():
+            for replica in balancer.replicas:
+                outstanding.add_metric([upstream, replica.url], replica.outstanding)
+                healthy.add_metric([upstream, replica.url], 1 if replica.healthy else 0)
+        yield outstanding
+        yield healthy
+
+
+REGISTRY.register(BalancerCollector())
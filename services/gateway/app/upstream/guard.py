@@ -0,0 +1,242 @@
+"""Circuit breaking and adaptive concurrency limits for upstream calls.
+
+When an upstream browns out, callers would otherwise pile up waiting for
+timeouts until the gateway runs out of memory and latency explodes. Each
+upstream gets:
+
+- a circuit breaker that opens after consecutive failures, rejects calls
+  while open, and lets a single trial call through once the reset timeout
+  has passed (half-open);
+- an AIMD concurrency limit that grows by one per window of successful
+  calls and shrinks multiplicatively on failures (and, optionally, on calls
+  slower than a latency target).
+
+Rejected calls raise ``UpstreamUnavailable`` immediately, which the API
+turns into 503 with ``Retry-After``.
+"""
+
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE = Gauge(
+    "gateway_upstream_circuit_state",
+    "Circuit breaker state per upstream (0=closed, 1=half-open, 2=open)",
+    ["upstream"],
+)
+CONCURRENCY_LIMIT = Gauge(
+    "gateway_upstream_concurrency_limit",
+    "Current adaptive concurrency limit per upstream",
+    ["upstream"],
+)
+REJECTED_CALLS = Counter(
+    "gateway_upstream_rejected_total",
+    "Upstream calls rejected without being sent",
+    ["upstream", "reason"],  # circuit_open, concurrency_limit
+)
+
+# Shrink the concurrency limit at most this often (seconds), so one burst
+# of failures from a single brownout does not collapse it to the minimum
+DECREASE_COOLDOWN_SEC = 1.0
+
+
+class UpstreamUnavailable(Exception):
+    """A call was rejected because the upstream is failing or saturated."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        super().__init__(f"{upstream} unavailable: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After header value (whole seconds, at least 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, upstream: str, failure_threshold: int, reset_timeout_sec: float):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        CIRCUIT_STATE.labels(upstream=upstream).set(0)
+
+    def before_call(self) -> None:
+        """Let a call through or raise UpstreamUnavailable."""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout_sec - time.monotonic()
+            if remaining > 0:
+                raise UpstreamUnavailable(self.upstream, "circuit_open", remaining)
+            self._set_state(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise UpstreamUnavailable(self.upstream, "circuit_open", 1.0)
+            self._trial_in_flight = True
+
+    def record(self, success: Optional[bool]) -> None:
+        """Record a call's outcome; None means it says nothing about health."""
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+        if success is None:
+            return
+
+        if self.state == self.OPEN:
+            return  # Late outcome of a call sent before the circuit opened
+
+        if success:
+            self.consecutive_failures = 0
+            self._set_state(self.CLOSED)
+            return
+
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        """Transition to a state, logging changes."""
+        if state != self.state:
+            logger.warning(f"Circuit for {self.upstream} is now {state}")
+        self.state = state
+        CIRCUIT_STATE.labels(upstream=self.upstream).set(self._STATE_VALUES[state])
+
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit."""
+
+    def __init__(
+        self,
+        upstream: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        backoff_ratio: float = 0.9,
+        latency_target_sec: float = 0.0,
+    ):
+        self.upstream = upstream
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_target_sec = latency_target_sec  # 0 disables
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        CONCURRENCY_LIMIT.labels(upstream=upstream).set(self.limit)
+
+    def try_acquire(self) -> bool:
+        """Take a slot if the limit allows it."""
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, success: Optional[bool], latency: float) -> None:
+        """Give back a slot and adapt the limit to the call's outcome."""
+        # Only grow when the limit is actually being used
+        saturated = self.in_flight >= self.limit / 2
+        self.in_flight -= 1
+
+        if success is None:
+            return
+
+        slow = self.latency_target_sec > 0 and latency > self.latency_target_sec
+        if success and not slow:
+            if saturated:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            now = time.monotonic()
+            if now - self._last_decrease < DECREASE_COOLDOWN_SEC:
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+        CONCURRENCY_LIMIT.labels(upstream=self.upstream).set(self.limit)
+
+
+class UpstreamGuard:
+    """Circuit breaker plus concurrency limiter for one upstream."""
+
+    def __init__(self, upstream: str, breaker: CircuitBreaker, limiter: AIMDLimiter):
+        self.upstream = upstream
+        self.breaker = breaker
+        self.limiter = limiter
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[None]:
+        """
+        Guard one upstream call.
+
+        Raises UpstreamUnavailable without calling when the circuit is open
+        or the concurrency limit is reached. Transport errors and 5xx
+        responses (raised via raise_for_status) count as failures.
+        """
+        try:
+            self.breaker.before_call()
+        except UpstreamUnavailable:
+            REJECTED_CALLS.labels(upstream=self.upstream, reason="circuit_open").inc()
+            raise
+
+        if not self.limiter.try_acquire():
+            self.breaker.record(None)
+            REJECTED_CALLS.labels(upstream=self.upstream, reason="concurrency_limit").inc()
+            raise UpstreamUnavailable(self.upstream, "concurrency_limit", 1.0)
+
+        started = time.monotonic()
+        success: Optional[bool] = None
+        try:
+            yield
+            success = True
+        except httpx.HTTPStatusError as e:
+            success = e.response.status_code < 500
+            raise
+        except httpx.RequestError:
+            success = False
+            raise
+        finally:
+            self.limiter.release(success, time.monotonic() - started)
+            self.breaker.record(success)
+
+
+def create_guard(
+    upstream: str,
+    failure_threshold: int,
+    reset_timeout_sec: float,
+    initial_limit: int,
+    min_limit: int,
+    max_limit: int,
+    latency_target_sec: float = 0.0,
+) -> UpstreamGuard:
+    """Create the breaker and limiter for an upstream."""
+    return UpstreamGuard(
+        upstream,
+        breaker=CircuitBreaker(upstream, failure_threshold, reset_timeout_sec),
+        limiter=AIMDLimiter(
+            upstream,
+            initial=initial_limit,
+            min_limit=min_limit,
+            max_limit=max_limit,
+            latency_target_sec=latency_target_sec,
+        ),
+    )
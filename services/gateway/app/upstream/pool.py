@@ -0,0 +1,180 @@
+"""Pooled HTTP clients for upstream services.
+
+Each upstream (Control Plane, Runner) gets one long-lived httpx client so
+that connections are kept alive and reused across runs instead of paying a
+TCP/TLS handshake per call.
+"""
+
+import logging
+from typing import Any, Callable, Optional
+
+import httpx
+from prometheus_client import REGISTRY, Counter
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.config import settings
+from app.telemetry.tracing import end_client_span, inject_trace_context, start_client_span
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_REQUESTS = Counter(
+    "gateway_upstream_requests_total",
+    "Requests sent to upstream services, by whether the connection was reused",
+    ["upstream", "connection"],
+)
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response stream wrapper that reports when the response is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close: Optional[Callable[[], None]] = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Connection-pooling transport that records reuse and saturation.
+
+    Requests sent while handling a traced request get a client span, and
+    carry W3C trace context to the upstream.
+    """
+
+    def __init__(self, upstream: str, limits: httpx.Limits, http2: bool = False):
+        super().__init__(limits=limits, http2=http2)
+        self.upstream = upstream
+        self.max_connections = limits.max_connections
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request, noting whether it opened a new connection."""
+        span = start_client_span(self.upstream, request.method, str(request.url))
+        inject_trace_context(request.headers, span)
+
+        opened = False
+        parent_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict[str, Any]) -> None:
+            nonlocal opened
+            if event_name == "connection.connect_tcp.complete":
+                opened = True
+            if parent_trace is not None:
+                await parent_trace(event_name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+
+        self.in_flight += 1
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException as e:
+            self.in_flight -= 1
+            end_client_span(span, error=e)
+            raise
+
+        UPSTREAM_REQUESTS.labels(
+            upstream=self.upstream,
+            connection="new" if opened else "reused",
+        ).inc()
+
+        def release() -> None:
+            self.in_flight -= 1
+            end_client_span(span, status_code=response.status_code)
+
+        response.stream = _TrackedStream(response.stream, release)
+        return response
+
+    def connection_counts(self) -> tuple[int, int]:
+        """Return (active, idle) connection counts for the pool."""
+        # httpx does not expose its pool publicly; read it defensively.
+        pool = getattr(self, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return len(connections) - idle, idle
+
+
+_transports: dict[str, InstrumentedTransport] = {}
+
+
+class PoolCollector(Collector):
+    """Prometheus collector reporting live pool state at scrape time."""
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "gateway_upstream_pool_connections",
+            "Open connections in the upstream pool",
+            labels=["upstream", "state"],
+        )
+        max_connections = GaugeMetricFamily(
+            "gateway_upstream_pool_max_connections",
+            "Configured connection limit of the upstream pool",
+            labels=["upstream"],
+        )
+        in_flight = GaugeMetricFamily(
+            "gateway_upstream_in_flight_requests",
+            "Requests in flight to the upstream; above the limit means queueing",
+            labels=["upstream"],
+        )
+        for upstream, transport in _transports.items():
+            active, idle = transport.connection_counts()
+            connections.add_metric([upstream, "active"], active)
+            connections.add_metric([upstream, "idle"], idle)
+            if transport.max_connections is not None:
+                max_connections.add_metric([upstream], transport.max_connections)
+            in_flight.add_metric([upstream], transport.in_flight)
+        yield connections
+        yield max_connections
+        yield in_flight
+
+
+REGISTRY.register(PoolCollector())
+
+
+def create_pooled_client(
+    upstream: str,
+    base_url: str = "",
+    timeout: float = 10.0,
+) -> httpx.AsyncClient:
+    """Create a pooled, instrumented HTTP client for an upstream service.
+
+    Args:
+        upstream: Metric label identifying the upstream (e.g. "runner")
+        base_url: Base URL for relative request paths
+        timeout: Default request timeout in seconds
+
+    Returns:
+        An httpx.AsyncClient that should live for the lifetime of the app
+    """
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    transport = InstrumentedTransport(
+        upstream=upstream,
+        limits=limits,
+        http2=settings.http2_enabled,
+    )
+    _transports[upstream] = transport
+
+    logger.info(
+        f"Opened connection pool for {upstream}: "
+        f"max_connections={limits.max_connections}, http2={settings.http2_enabled}"
+    )
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        transport=transport,
+    )
@@ -0,0 +1,17 @@
+"""Embeddable widget support."""
+
+from .config_cache import (
+    OriginMatcher,
+    WidgetConfig,
+    WidgetConfigCache,
+    WidgetInstanceConfig,
+    widget_configs,
+)
+
+__all__ = [
+    "OriginMatcher",
+    "WidgetConfig",
+    "WidgetConfigCache",
+    "WidgetInstanceConfig",
+    "widget_configs",
+]
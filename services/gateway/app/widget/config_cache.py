@@ -0,0 +1,185 @@
+"""Per-instance widget configuration cache.
+
+Widget traffic is bursty (every page view of an embedding site) and the
+branding and allowed origins of an instance rarely change, so they are
+loaded from the Control Plane once per TTL and served from memory:
+
+- concurrent misses for an instance share a single fetch;
+- allowed origin patterns are compiled once per load into an
+  ``OriginMatcher`` (a set lookup plus one combined regex);
+- branding is validated once per load (invalid fields fall back to their
+  defaults) and every config carries an ETag of the branding as served, so
+  widgets revalidate with 304s;
+- the Control Plane pushes invalidations (``/internal/widget_config:invalidate``)
+  when an instance is saved, so changes apply before the TTL runs out;
+- when a refresh fails, the last known config keeps being served.
+"""
+
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from prometheus_client import Counter
+from pydantic import BaseModel, ValidationError
+
+from app.billing.client import BillingClient, billing_client
+from app.cache import SingleflightCache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WIDGET_CONFIG_CACHE_LOOKUPS = Counter(
+    "gateway_widget_config_cache_lookups_total",
+    "Widget config cache lookups",
+    ["result"],  # hit, miss, coalesced, stale
+)
+
+# How long unknown instances are remembered (seconds)
+NOT_FOUND_TTL_SEC = 5.0
+
+
+class OriginMatcher:
+    """Matches request origins against precompiled allowlist patterns.
+
+    Patterns are exact origins (``https://shop.example.com``), origins with
+    a wildcard subdomain (``https://*.example.com``), or ``*`` for any.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.allow_any = False
+        self._exact: set[str] = set()
+        wildcards: list[str] = []
+
+        for pattern in patterns:
+            pattern = pattern.strip().rstrip("/").lower()
+            if not pattern:
+                continue
+            if pattern == "*":
+                self.allow_any = True
+            elif "*" in pattern:
+                wildcards.append(re.escape(pattern).replace(r"\*", r"[a-z0-9-]+(?:\.[a-z0-9-]+)*"))
+            else:
+                self._exact.add(pattern)
+
+        self._wildcard = re.compile("|".join(wildcards)) if wildcards else None
+
+    def matches(self, origin: str) -> bool:
+        """Whether an origin is allowed."""
+        if self.allow_any:
+            return True
+        origin = origin.rstrip("/").lower()
+        if origin in self._exact:
+            return True
+        return self._wildcard is not None and self._wildcard.fullmatch(origin) is not None
+
+
+class WidgetConfig(BaseModel):
+    """Widget configuration."""
+
+    brand_name: Optional[str] = None
+    logo_url: Optional[str] = None
+    avatar_url: Optional[str] = None
+    primary_color: Optional[str] = "#6366f1"
+    accent_color: Optional[str] = "#8b5cf6"
+    font_family: Optional[str] = "Inter"
+    launcher_text: Optional[str] = "Chat with us"
+    position: Optional[str] = "bottom-right"
+
+
+def _parse_branding(instance_id: str, branding: Any) -> WidgetConfig:
+    """Validate branding, dropping invalid fields so they get their defaults."""
+    try:
+        return WidgetConfig.model_validate(branding)
+    except ValidationError as e:
+        logger.warning(f"Invalid widget branding for instance {instance_id}: {e}")
+        if not isinstance(branding, dict):
+            return WidgetConfig()
+        invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+        try:
+            return WidgetConfig.model_validate(
+                {name: value for name, value in branding.items() if name not in invalid}
+            )
+        except ValidationError:
+            return WidgetConfig()
+
+
+@dataclass
+class WidgetInstanceConfig:
+    """An instance's widget branding and origin allowlist."""
+
+    instance_id: str
+    branding: WidgetConfig
+    allowed_origins: list[str]
+    origins: OriginMatcher
+    etag: str  # Of the branding as served
+
+    @classmethod
+    def from_control_plane(cls, data: dict[str, Any]) -> "WidgetInstanceConfig":
+        """Build (and precompile) a config from the Control Plane response."""
+        instance_id = data.get("instance_id", "")
+        branding = _parse_branding(instance_id, data.get("branding") or {})
+        allowed_origins = data.get("allowed_origins") or []
+        digest = hashlib.sha256(branding.model_dump_json().encode()).hexdigest()
+        return cls(
+            instance_id=instance_id,
+            branding=branding,
+            allowed_origins=allowed_origins,
+            origins=OriginMatcher(allowed_origins),
+            etag=f'"{digest[:32]}"',
+        )
+
+
+class WidgetConfigCache:
+    """In-process cache of widget configs, loaded from the Control Plane."""
+
+    def __init__(self, client: BillingClient = billing_client):
+        # Shares the Control Plane pool and circuit breaker of the billing client
+        self._client = client
+        self._cache: SingleflightCache[Optional[WidgetInstanceConfig]] = SingleflightCache(
+            "widget config",
+            WIDGET_CONFIG_CACHE_LOOKUPS,
+            max_entries=lambda: settings.widget_config_cache_max_entries,
+            serve_stale=True,
+        )
+
+    async def get(self, instance_id: str) -> Optional[WidgetInstanceConfig]:
+        """
+        Get an instance's widget config, loading it on a miss.
+
+        Returns None if the instance does not exist.
+
+        Raises:
+            httpx.HTTPError, UpstreamUnavailable: If the Control Plane cannot
+                be reached and nothing is cached
+        """
+        return await self._cache.get(instance_id, lambda: self._load(instance_id))
+
+    def invalidate(self, instance_id: str) -> bool:
+        """Drop an instance's config, e.g. after it was edited.
+
+        Returns True if the config was cached or being loaded.
+        """
+        return self._cache.invalidate(instance_id)
+
+    def clear(self) -> None:
+        """Drop every cached config."""
+        self._cache.clear()
+
+    async def _load(self, instance_id: str) -> tuple[Optional[WidgetInstanceConfig], float]:
+        """Fetch an instance's config and how long to cache it."""
+        async with self._client.guard.call():
+            response = await self._client.client.get(
+                f"/instances/{instance_id}/widget_config",
+            )
+            if response.status_code == 404:
+                return None, NOT_FOUND_TTL_SEC
+            response.raise_for_status()
+
+        config = WidgetInstanceConfig.from_control_plane(response.json())
+        return config, settings.widget_config_cache_ttl_sec
+
+
+# Process-wide widget config cache
+widget_configs = WidgetConfigCache()
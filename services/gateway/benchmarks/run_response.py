@@ -0,0 +1,96 @@
+"""Benchmark building the POST /v1/runs response from a Runner result.
+
+Compares the previous path (parse the Runner's JSON envelope, rebuild
+RunOutput/UsageInfo/RunResponse, let FastAPI validate and encode them)
+with the passthrough path (read the envelope from headers, splice the
+output bytes into the response).
+
+Run from services/gateway:
+
+    python -m benchmarks.run_response [--items 5000] [--rounds 50]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import httpx
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.runs import BillingInfo, RunOutput, RunResponse, _run_response, _usage_info
+from app.routing.runner import OUTPUT_MEDIA_TYPE, RUN_ID_HEADER, USAGE_HEADER, RunResult
+
+USAGE = {"llm_tokens_in": 812, "llm_tokens_out": 2048, "tool_calls": 3, "requests": 1}
+BILLING = BillingInfo(debited=12, balance=9988)
+
+
+def make_output(items: int) -> dict:
+    """A Langflow-style output with ``items`` result records."""
+    records = [
+        {"id": i, "text": f"chunk {i} " * 8, "score": i / items, "tags": ["a", "b", "c"]}
+        for i in range(items)
+    ]
+    return {"text": "answer " * 200, "data": {"message": {"text": "answer"}, "records": records}}
+
+
+def previous_path(body: bytes) -> bytes:
+    data = httpx.Response(200, content=body).json()
+    output, usage = data.get("output", {}), data.get("usage", {})
+    response = RunResponse(
+        run_id=data["run_id"],
+        output=RunOutput(text=output.get("text"), data=output.get("data")),
+        usage=_usage_info(usage),
+        billing=BILLING,
+    )
+    # What FastAPI does with a returned model and response_model=RunResponse
+    validated = RunResponse.model_validate(response.model_dump())
+    return JSONResponse(content=jsonable_encoder(validated)).body
+
+
+def passthrough_path(response: httpx.Response) -> bytes:
+    return _run_response("run-1", RunResult.from_response(response), BILLING).body
+
+
+def measure(name: str, fn, arg, rounds: int) -> None:
+    fn(arg)  # Warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(arg)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:12} {elapsed * 1000:9.2f} ms/run {peak / 1024:11.0f} KiB peak")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000, help="records in the output")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    output = make_output(args.items)
+    envelope = json.dumps({"run_id": "run-1", "output": output, "usage": USAGE}).encode()
+    passthrough = httpx.Response(
+        200,
+        content=orjson.dumps(output),
+        headers={
+            "content-type": OUTPUT_MEDIA_TYPE,
+            RUN_ID_HEADER: "run-1",
+            USAGE_HEADER: orjson.dumps(USAGE).decode(),
+        },
+    )
+    assert json.loads(previous_path(envelope)) == json.loads(passthrough_path(passthrough))
+
+    print(f"output: {len(envelope) / 1024:.0f} KiB, {args.rounds} rounds")
+    measure("previous", previous_path, envelope, args.rounds)
+    measure("passthrough", passthrough_path, passthrough, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,24 @@
 """CMP Gateway - API execution entry point."""
 
 import logging
+from contextlib import asynccontextmanager
 
 import structlog
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.api import runs_router, widget_router
+from app.api import internal_router, metrics_router, runs_router, widget_router
+from app.auth import jwks_store
+from app.billing.client import billing_client
+from app.billing.lease import credit_leases
+from app.billing.settlement import settlement_queue
 from app.config import settings
+from app.jobs import run_jobs
+from app.routing.runner import runner_client
+from app.telemetry.loop_monitor import LoadSheddingMiddleware, loop_monitor
+from app.telemetry.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
+from app.upstream import UpstreamUnavailable
 
 # Configure structured logging
 structlog.configure(
@@ -36,6 +46,33 @@ logging.basicConfig(
 
 logger = structlog.get_logger()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open pooled upstream clients on startup and drain them on shutdown."""
+    setup_tracing()
+    loop_monitor.start()
+    billing_client.open()
+    runner_client.open()
+    await jwks_store.start()
+    if settings.credit_lease_enabled:
+        credit_leases.start()
+    if settings.settlement_batch_enabled:
+        settlement_queue.start()
+    run_jobs.start()
+    logger.info("Gateway starting", runner_url=settings.runner_url)
+    yield
+    logger.info("Gateway shutting down")
+    await run_jobs.aclose()
+    await credit_leases.aclose()
+    await settlement_queue.aclose()
+    await runner_client.aclose()
+    await jwks_store.aclose()
+    await billing_client.aclose()
+    await loop_monitor.aclose()
+    shutdown_tracing()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="CMP Gateway",
@@ -43,6 +80,7 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -57,8 +95,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject new requests with 503 while the event loop lags
+app.add_middleware(LoadSheddingMiddleware)
+
+# Tracing middleware (outermost, so spans cover the whole request)
+app.add_middleware(TracingMiddleware)
+
+
+# Exception handlers
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    """Fail fast with 503 when an upstream's breaker or limiter rejects a call."""
+    logger.warning("Upstream unavailable", upstream=exc.upstream, reason=exc.reason)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "error": {
+                "code": "upstream_unavailable",
+                "message": "Service temporarily overloaded",
+            }
+        },
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
 
-# Exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unhandled errors."""
@@ -92,6 +152,8 @@ async def readiness_check():
 # Include routers
 app.include_router(runs_router)
 app.include_router(widget_router)
+app.include_router(metrics_router)
+app.include_router(internal_router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""Shared test setup."""
+
+import os
+
+# Keyrings the gateway refuses to start without; set before app.config loads
+os.environ.setdefault("WIDGET_TOKEN_KEYS", "test:widget-token-secret")
+os.environ.setdefault("API_KEY_MAC_KEYS", "test:api-key-mac-secret")
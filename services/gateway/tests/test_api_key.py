@@ -0,0 +1,55 @@
+"""Tests for the API key MAC check."""
+
+import base64
+import hashlib
+import hmac
+
+import pytest
+
+from app.auth.api_key import MAC_BYTES, APIKeyVerifier
+from app.config import settings
+
+KEYRING = {"k2": b"new-secret", "k1": b"old-secret"}
+
+
+def signed_key(kid: str, secret: bytes, random_part: str = "r4nd0m-part") -> str:
+    """A key as the Control Plane issues it (instances.keys.generate_api_key)."""
+    signed = f"cmp_sk_{kid}.{random_part}"
+    digest = hmac.new(secret, signed.encode(), hashlib.sha256).digest()[:MAC_BYTES]
+    return f"{signed}.{base64.urlsafe_b64encode(digest).rstrip(b'=').decode()}"
+
+
+@pytest.fixture
+def verifier() -> APIKeyVerifier:
+    return APIKeyVerifier(KEYRING)
+
+
+def test_keys_signed_by_any_keyring_key_pass(verifier):
+    assert verifier.check(signed_key("k2", KEYRING["k2"])) is None
+    assert verifier.check(signed_key("k1", KEYRING["k1"])) is None
+
+
+@pytest.mark.parametrize("key, reason", [
+    (signed_key("k2", b"guessed-secret"), "bad_mac"),
+    (signed_key("k1", KEYRING["k2"]), "bad_mac"),
+    (signed_key("k2", KEYRING["k2"]).replace("r4nd0m", "r4nd0n"), "bad_mac"),
+    (signed_key("k9", b"other-secret"), "unknown_key"),
+    ("sk_live_abc", "malformed"),
+    ("cmp_sk_k2.r4nd0m-part.", "malformed"),
+    ("cmp_sk_.r4nd0m-part.mac", "malformed"),
+    ("cmp_sk_k2.mac", "malformed"),
+])
+def test_forged_and_mistyped_keys_are_rejected(verifier, key, reason):
+    assert verifier.check(key) == reason
+
+
+def test_legacy_keys_depend_on_the_setting(verifier, monkeypatch):
+    monkeypatch.setattr(settings, "api_key_legacy_enabled", True)
+    assert verifier.check("cmp_sk_0123456789abcdef") is None
+
+    monkeypatch.setattr(settings, "api_key_legacy_enabled", False)
+    assert verifier.check("cmp_sk_0123456789abcdef") == "legacy_disabled"
+
+
+def test_signed_keys_are_introspected_without_a_keyring():
+    assert APIKeyVerifier({}).check(signed_key("k9", b"secret")) is None
@@ -0,0 +1,190 @@
+"""Tests for the single-flight TTL cache and the API key cache built on it."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import CollectorRegistry, Counter
+
+from app.auth.api_key import APIKeyCache
+from app.cache import SingleflightCache
+from app.config import settings
+
+
+class Loader:
+    """Counts loads; each one waits for ``release`` and returns the next value."""
+
+    def __init__(self, *outcomes, ttl: float = 60.0):
+        self.outcomes = list(outcomes)
+        self.ttl = ttl
+        self.loads = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.loads += 1
+        outcome = self.outcomes.pop(0)
+        await self.release.wait()
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, self.ttl
+
+
+def make_cache(**kwargs) -> SingleflightCache:
+    lookups = Counter("lookups", "Lookups", ["result"], registry=CollectorRegistry())
+    return SingleflightCache("thing", lookups, max_entries=lambda: 100, **kwargs)
+
+
+def lookups(cache: SingleflightCache) -> dict[str, float]:
+    return {
+        sample.labels["result"]: sample.value
+        for metric in cache._lookups.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = make_cache()
+    load = Loader("value")
+    load.release.clear()
+
+    callers = [asyncio.create_task(cache.get("key", load)) for _ in range(10)]
+    await asyncio.sleep(0)
+    load.release.set()
+
+    assert await asyncio.gather(*callers) == ["value"] * 10
+    assert await cache.get("key", load) == "value"
+    assert load.loads == 1
+    assert lookups(cache) == {"miss": 1, "coalesced": 9, "hit": 1}
+
+
+@pytest.mark.asyncio
+async def test_caller_going_away_does_not_fail_the_shared_load():
+    cache = make_cache()
+    load = Loader("value")
+    load.release.clear()
+
+    first = asyncio.create_task(cache.get("key", load))
+    second = asyncio.create_task(cache.get("key", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    load.release.set()
+
+    assert await second == "value"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_reloaded():
+    cache = make_cache()
+    load = Loader("old", "new", ttl=-1.0)
+
+    assert await cache.get("key", load) == "old"
+    assert await cache.get("key", load) == "new"
+    assert load.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_rejections_are_cached_only_when_negative_ttl_allows():
+    cache = make_cache(negative_ttl=lambda e: 60.0 if isinstance(e, KeyError) else None)
+    load = Loader(KeyError("unknown"), RuntimeError("down"), "value")
+
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            await cache.get("unknown", load)
+    assert load.loads == 1
+    assert lookups(cache)["negative_hit"] == 2
+
+    with pytest.raises(RuntimeError):
+        await cache.get("other", load)
+    assert await cache.get("other", load) == "value"
+    assert load.loads == 3
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_load_keeps_its_result_out():
+    cache = make_cache()
+    load = Loader("before", "after")
+    load.release.clear()
+
+    caller = asyncio.create_task(cache.get("key", load))
+    await asyncio.sleep(0)
+    assert cache.invalidate("key")
+    load.release.set()
+
+    # The waiting caller still gets the result, but it is not cached
+    assert await caller == "before"
+    assert await cache.get("key", load) == "after"
+    assert load.loads == 2
+    assert not cache.invalidate("missing")
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_when_refresh_fails():
+    cache = make_cache(serve_stale=True)
+    load = Loader("value", RuntimeError("down"), RuntimeError("down"), ttl=-1.0)
+
+    assert await cache.get("key", load) == "value"
+    assert await cache.get("key", load) == "value"
+    assert lookups(cache)["stale"] == 1
+
+    # Nothing to fall back on without a previous value
+    with pytest.raises(RuntimeError):
+        await cache.get("other", load)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised_without_serve_stale():
+    cache = make_cache()
+    load = Loader("value", RuntimeError("down"), ttl=-1.0)
+
+    assert await cache.get("key", load) == "value"
+    with pytest.raises(RuntimeError):
+        await cache.get("key", load)
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted():
+    cache = SingleflightCache("thing", make_cache()._lookups, max_entries=lambda: 2)
+    load = Loader("a", "b", "c", "a2")
+
+    await cache.get("a", load)
+    await cache.get("b", load)
+    await cache.get("a", load)  # Now most recently used
+    await cache.get("c", load)  # Evicts b
+
+    assert set(cache._entries) == {"a", "c"}
+
+
+@pytest.mark.asyncio
+async def test_api_key_cache_replays_rejections_but_not_outages(monkeypatch):
+    monkeypatch.setattr(settings, "api_key_negative_cache_ttl_sec", 60.0)
+    cache = APIKeyCache()
+    calls = []
+
+    async def introspect(api_key: str) -> dict:
+        calls.append(api_key)
+        if api_key == "cmp_sk_revoked":
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        if len(calls) == 2:
+            raise HTTPException(status_code=503, detail="Control Plane unavailable")
+        return {"id": "key-1", "instance_id": "instance-1"}
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await cache.get("cmp_sk_revoked", introspect)
+        assert exc_info.value.status_code == 401
+    assert calls == ["cmp_sk_revoked"]
+
+    with pytest.raises(HTTPException) as exc_info:
+        await cache.get("cmp_sk_valid", introspect)
+    assert exc_info.value.status_code == 503
+    assert (await cache.get("cmp_sk_valid", introspect)).instance_id == "instance-1"
+    assert (await cache.get("cmp_sk_valid", introspect)).key_id == "key-1"
+    assert len(calls) == 3
+
+    assert cache.invalidate(cache.key_hash("cmp_sk_valid"))
+    await cache.get("cmp_sk_valid", introspect)
+    assert len(calls) == 4
@@ -0,0 +1,82 @@
+"""Tests for Idempotency-Key handling."""
+
+import asyncio
+
+import pytest
+
+from app.idempotency import (
+    IdempotencyConflict,
+    IdempotencyRecord,
+    IdempotentRequests,
+    MemoryIdempotencyStore,
+)
+
+
+@pytest.fixture
+def requests():
+    return IdempotentRequests(MemoryIdempotencyStore(max_entries=100))
+
+
+def make_work(calls: list, release: asyncio.Event, status_code: int = 200):
+    """Work that counts its executions and waits for ``release``."""
+
+    async def work() -> IdempotencyRecord:
+        calls.append(1)
+        await release.wait()
+        return IdempotencyRecord(fingerprint="fp", status_code=status_code, body={"run": len(calls)})
+
+    return work
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_with_same_key_execute_once(requests):
+    """Duplicates arriving while the request runs attach to it."""
+    calls = []
+    release = asyncio.Event()
+    work = make_work(calls, release)
+
+    pending = [asyncio.create_task(requests.execute("key", "fp", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*pending)
+
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert all(record.body == {"run": 1} for record, _ in results)
+
+    record, replayed = await requests.execute("key", "fp", work)
+    assert replayed
+    assert record.body == {"run": 1}
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_key_reused_for_other_request_is_rejected(requests):
+    """A different request under an in-flight key is a mismatch."""
+    release = asyncio.Event()
+    first = asyncio.create_task(requests.execute("key", "fp", make_work([], release)))
+    await asyncio.sleep(0)
+
+    with pytest.raises(IdempotencyConflict) as exc_info:
+        await requests.execute("key", "other", make_work([], release))
+    assert exc_info.value.reason == IdempotencyConflict.MISMATCH
+
+    release.set()
+    await first
+
+
+@pytest.mark.asyncio
+async def test_retryable_response_is_not_stored(requests):
+    """A 5xx response leaves the key free for a retry."""
+    calls = []
+    release = asyncio.Event()
+    release.set()
+
+    record, replayed = await requests.execute("key", "fp", make_work(calls, release, status_code=503))
+    assert record.status_code == 503
+    assert not replayed
+
+    record, replayed = await requests.execute("key", "fp", make_work(calls, release))
+    assert record.status_code == 200
+    assert not replayed
+    assert len(calls) == 2
@@ -0,0 +1,143 @@
+"""Tests for the JWKS store and JWT verification."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+import pytest_asyncio
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.auth import jwt as jwt_module
+from app.auth.jwt import ClaimsCache, JWKSStore, JWTAuth
+from app.config import settings
+
+
+def signing_key() -> rsa.RSAPrivateKey:
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+KEYS = {kid: signing_key() for kid in ("k1", "k2", "k3")}
+
+
+class FakeIssuer:
+    """Serves a JWKS of the current kids and counts the fetches."""
+
+    def __init__(self, *kids: str):
+        self.kids = list(kids)
+        self.fetches = 0
+        self.delay = 0.0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        await asyncio.sleep(self.delay)
+        keys = []
+        for kid in self.kids:
+            jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(KEYS[kid].public_key()))
+            keys.append({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+        return httpx.Response(200, json={"keys": keys})
+
+
+def token(kid: str, **claims) -> str:
+    payload = {
+        "sub": "user-1",
+        "iss": settings.oidc_issuer,
+        "aud": settings.oidc_audience,
+        "exp": int(time.time()) + 300,
+        **claims,
+    }
+    return jwt.encode(payload, KEYS[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def issuer():
+    return FakeIssuer("k1")
+
+
+@pytest_asyncio.fixture
+async def store(issuer):
+    store = JWKSStore()
+    store._http_client = httpx.AsyncClient(transport=httpx.MockTransport(issuer.handle))
+    yield store
+    await store.aclose()
+
+
+@pytest.mark.asyncio
+async def test_keys_are_refreshed_in_the_background(store, issuer, monkeypatch):
+    monkeypatch.setattr(settings, "jwks_refresh_interval_sec", 0.01)
+    retired = []
+    store.add_rotation_listener(retired.append)
+
+    await store.start()
+    assert (await store.get_signing_key(token("k1"))).key_id == "k1"
+
+    issuer.kids = ["k2"]
+    for _ in range(100):
+        if retired:
+            break
+        await asyncio.sleep(0.01)
+
+    assert retired == [{"k1"}]
+    fetches = issuer.fetches
+    assert (await store.get_signing_key(token("k2"))).key_id == "k2"
+    assert issuer.fetches == fetches
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_is_fetched_once_for_concurrent_callers(store, issuer, monkeypatch):
+    monkeypatch.setattr(settings, "jwks_refresh_interval_sec", 3600.0)
+    monkeypatch.setattr(settings, "jwks_min_refetch_interval_sec", 0.0)
+    await store.start()
+    assert issuer.fetches == 1
+
+    issuer.kids = ["k1", "k2"]
+    issuer.delay = 0.01
+    keys = await asyncio.gather(*(store.get_signing_key(token("k2")) for _ in range(10)))
+
+    assert {key.key_id for key in keys} == {"k2"}
+    assert issuer.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refetches_are_rate_limited(store, issuer, monkeypatch):
+    monkeypatch.setattr(settings, "jwks_refresh_interval_sec", 3600.0)
+    monkeypatch.setattr(settings, "jwks_min_refetch_interval_sec", 60.0)
+    await store.start()
+
+    # Fetched at startup, too recently to refetch for the unknown kid
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc_info:
+            await store.get_signing_key(token("k3"))
+        assert exc_info.value.status_code == 401
+    assert issuer.fetches == 1
+
+    monkeypatch.setattr(settings, "jwks_min_refetch_interval_sec", 0.0)
+    issuer.kids = ["k1", "k3"]
+    assert (await store.get_signing_key(token("k3"))).key_id == "k3"
+    assert issuer.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_verification_does_no_io(store, issuer, monkeypatch):
+    monkeypatch.setattr(settings, "jwks_refresh_interval_sec", 3600.0)
+    monkeypatch.setattr(jwt_module, "jwks_store", store)
+    monkeypatch.setattr(jwt_module, "claims_cache", ClaimsCache())
+    await store.start()
+    fetches = issuer.fetches
+
+    def request(bearer: str) -> Request:
+        headers = [(b"authorization", f"Bearer {bearer}".encode())]
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+    user = await JWTAuth()(request(token("k1")))
+    assert user.id == "user-1"
+
+    with pytest.raises(HTTPException) as exc_info:
+        await JWTAuth()(request(token("k1", aud="other-audience")))
+    assert exc_info.value.detail == "Invalid token audience"
+
+    assert issuer.fetches == fetches
@@ -0,0 +1,100 @@
+"""Tests for gateway-local credit leases."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.billing import lease as lease_module
+from app.billing.client import LeaseResult, SettleResult
+from app.billing.lease import RELEASE_ATTEMPTS, CreditLeaseManager
+
+
+class FakeBillingClient:
+    """Grants every lease; release fails the first ``release_failures`` times."""
+
+    def __init__(self, release_failures: int = 0):
+        self.release_failures = release_failures
+        self.releases: list[tuple[str, list[dict]]] = []
+
+    async def acquire_lease(self, instance_id: str, requested_amount: int, ttl_seconds: int) -> LeaseResult:
+        return LeaseResult(allowed=True, lease_id=f"lease-{instance_id}", amount=requested_amount, balance=10000)
+
+    async def release_lease(self, lease_id: str, usages: list[dict]) -> SettleResult:
+        self.releases.append((lease_id, list(usages)))
+        if len(self.releases) <= self.release_failures:
+            raise httpx.ReadTimeout("timed out")
+        return SettleResult(debited=len(usages), balance=10000, ledger_entry_id="entry", status="settled")
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    """Skip the release backoff, recording the delays."""
+    delays = []
+    sleep = asyncio.sleep
+
+    async def no_wait(delay):
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(lease_module.asyncio, "sleep", no_wait)
+    return delays
+
+
+@pytest.mark.asyncio
+async def test_release_is_retried_after_timeout(backoff):
+    """A release that times out is sent again with the same usages."""
+    client = FakeBillingClient(release_failures=1)
+    leases = CreditLeaseManager(client=client)
+
+    auth = await leases.authorize("instance", budget=10)
+    await leases.settle(auth, {"tokens": 5})
+    await leases.aclose()
+
+    assert client.releases == [("lease-instance", [{"tokens": 5}])] * 2
+    assert backoff == [2]
+
+
+@pytest.mark.asyncio
+async def test_release_gives_up_after_attempts(backoff):
+    """Releases stop after RELEASE_ATTEMPTS failures."""
+    client = FakeBillingClient(release_failures=RELEASE_ATTEMPTS)
+    leases = CreditLeaseManager(client=client)
+
+    auth = await leases.authorize("instance", budget=10)
+    await leases.settle(auth, None)
+    await leases.aclose()
+
+    assert len(client.releases) == RELEASE_ATTEMPTS
+    assert backoff == [2 ** attempt for attempt in range(1, RELEASE_ATTEMPTS)]
+
+
+@pytest.mark.asyncio
+async def test_lease_is_released_once_runs_finish(backoff):
+    """A retired lease with runs in flight is released when the last one settles."""
+    client = FakeBillingClient()
+    leases = CreditLeaseManager(client=client)
+
+    auth = await leases.authorize("instance", budget=10)
+    leases._retire(leases._leases[auth.reservation_id])
+    await asyncio.sleep(0)
+    assert client.releases == []
+
+    await leases.settle(auth, {"tokens": 5})
+    await leases.aclose()
+    assert client.releases == [("lease-instance", [{"tokens": 5}])]
+
+
+@pytest.mark.asyncio
+async def test_unbilled_run_is_left_out_of_release(backoff):
+    """Runs settled without usage (failed or never dispatched) are not priced."""
+    client = FakeBillingClient()
+    leases = CreditLeaseManager(client=client)
+
+    billed = await leases.authorize("instance", budget=10)
+    failed = await leases.authorize("instance", budget=10)
+    assert (await leases.settle(failed, None)).debited == 0
+    await leases.settle(billed, {"requests": 1})
+    await leases.aclose()
+
+    assert client.releases == [("lease-instance", [{"requests": 1}])]
@@ -0,0 +1,94 @@
+"""Tests for the instance plan cache."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.billing.client import BillingClient
+from app.billing.plans import InstancePlanCache
+from app.config import settings
+
+
+class FakeControlPlane:
+    """Serves plan limits; requests wait for ``release``."""
+
+    def __init__(self):
+        self.tier = "free"
+        self.status = 200
+        self.requests = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        tier = self.tier
+        await self.release.wait()
+        if self.status != 200:
+            return httpx.Response(self.status)
+        return httpx.Response(200, json={
+            "instance_id": request.url.path.split("/")[2],
+            "org_id": "org-1",
+            "tier": tier,
+        })
+
+
+@pytest.fixture
+def control_plane():
+    return FakeControlPlane()
+
+
+@pytest.fixture
+def plans(control_plane):
+    client = BillingClient()
+    client._client = httpx.AsyncClient(
+        base_url="http://control-plane",
+        transport=httpx.MockTransport(control_plane.handle),
+    )
+    return InstancePlanCache(client=client)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch(plans, control_plane):
+    control_plane.release.clear()
+    callers = [asyncio.create_task(plans.get("instance-1")) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    control_plane.release.set()
+
+    assert {plan.tier for plan in await asyncio.gather(*callers)} == {"free"}
+    assert (await plans.get("instance-1")).org_id == "org-1"
+    assert control_plane.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_plan_loaded_before_invalidation_is_not_cached(plans, control_plane):
+    control_plane.release.clear()
+    caller = asyncio.create_task(plans.get("instance-1"))
+    await asyncio.sleep(0.01)
+
+    # Moved to another plan while the old one was being fetched
+    assert plans.invalidate("instance-1")
+    control_plane.tier = "pro"
+    control_plane.release.set()
+
+    assert (await caller).tier == "free"
+    assert (await plans.get("instance-1")).tier == "pro"
+    assert control_plane.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_last_plan_is_served_while_control_plane_fails(plans, control_plane, monkeypatch):
+    monkeypatch.setattr(settings, "plan_cache_ttl_sec", -1.0)
+    plan = await plans.get("instance-1")
+
+    control_plane.status = 503
+    assert await plans.get("instance-1") is plan
+
+
+@pytest.mark.asyncio
+async def test_unknown_instances_are_cached_as_none(plans, control_plane):
+    control_plane.status = 404
+
+    assert await plans.get("missing") is None
+    assert await plans.get("missing") is None
+    assert control_plane.requests == 1
@@ -0,0 +1,194 @@
+"""Tests for plan rate limits and their stores."""
+
+import asyncio
+import fcntl
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.billing.plans import InstancePlan
+from app.config import settings
+from app.ratelimit import limiter as limiter_module
+from app.ratelimit import store as store_module
+from app.ratelimit.limiter import RateLimited, RunLimiter
+from app.ratelimit.store import MemoryRateLimitStore, SharedMemoryRateLimitStore, take_token
+
+
+def test_take_token_refills_up_to_burst():
+    assert take_token(0.0, updated_at=0.0, now=10.0, rate=1.0, burst=3.0) == (2.0, 0.0)
+    tokens, wait = take_token(0.5, updated_at=0.0, now=0.0, rate=2.0, burst=3.0)
+    assert tokens == 0.5
+    assert wait == pytest.approx(0.25)
+
+
+@pytest.mark.parametrize("retry_after, header", [(0.0, "1"), (0.2, "1"), (1.0, "1"), (2.1, "3")])
+def test_retry_after_header_rounds_up_to_whole_seconds(retry_after, header):
+    assert RateLimited("rate", retry_after).retry_after_header == header
+
+
+@pytest.fixture
+def plan_limits(monkeypatch):
+    """Set the plan limits every instance gets."""
+    limits = {}
+
+    async def get_plan(instance_id):
+        return InstancePlan(instance_id=instance_id, org_id="org", plan="pro", tier="pro", limits=limits)
+
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(limiter_module.instance_plans, "get", get_plan)
+    return limits
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_allows_burst_then_asks_to_retry(plan_limits):
+    plan_limits.update(rate_limit_per_minute=60, rate_limit_burst=2)
+    limiter = RunLimiter(MemoryRateLimitStore())
+
+    await limiter.admit("instance")
+    await limiter.admit("instance")
+    with pytest.raises(RateLimited) as exc_info:
+        await limiter.admit("instance")
+
+    assert exc_info.value.limit == "rate"
+    assert 0 < exc_info.value.retry_after <= 1
+    assert exc_info.value.retry_after_header == "1"
+    await limiter.admit("other-instance")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_are_capped_until_released(plan_limits):
+    plan_limits.update(concurrent_runs=1)
+    limiter = RunLimiter(MemoryRateLimitStore())
+
+    permit = await limiter.admit("instance")
+    with pytest.raises(RateLimited) as exc_info:
+        await limiter.admit("instance")
+    assert exc_info.value.limit == "concurrency"
+
+    await permit.release()
+    await permit.release()  # Idempotent
+    await limiter.admit("instance")
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_run_gives_back_its_concurrency_permit(plan_limits):
+    plan_limits.update(concurrent_runs=1, rate_limit_per_minute=1, rate_limit_burst=1)
+    store = MemoryRateLimitStore()
+    limiter = RunLimiter(store)
+
+    permit = await limiter.admit("instance")
+    await permit.release()
+    with pytest.raises(RateLimited):
+        await limiter.admit("instance")
+
+    assert await store.acquire("runs:instance", 1)
+
+
+@pytest.fixture
+def shm_path(tmp_path):
+    return str(tmp_path / "rate-limits")
+
+
+def shm_store(path: str, slots: int = 64, run_ttl_sec: float = 300.0) -> SharedMemoryRateLimitStore:
+    return SharedMemoryRateLimitStore(path, slots=slots, run_ttl_sec=run_ttl_sec)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Host-wide monotonic clock of the store, advanced by tests."""
+    clock = SimpleNamespace(offset=0.0)
+    monkeypatch.setattr(
+        store_module, "time", SimpleNamespace(monotonic=lambda: time.monotonic() + clock.offset)
+    )
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_shm_limits_are_shared_between_workers(shm_path):
+    worker_a, worker_b = shm_store(shm_path), shm_store(shm_path)
+
+    assert await worker_a.take("rate:instance", rate=1.0, burst=1.0) == 0.0
+    assert await worker_b.take("rate:instance", rate=1.0, burst=1.0) > 0
+
+    assert await worker_a.acquire("runs:instance", 1)
+    assert not await worker_b.acquire("runs:instance", 1)
+    await worker_a.release("runs:instance")
+    assert await worker_b.acquire("runs:instance", 1)
+
+
+@pytest.mark.asyncio
+async def test_shm_drops_runs_of_exited_worker(shm_path):
+    script = (
+        "import asyncio, sys\n"
+        "from app.ratelimit.store import SharedMemoryRateLimitStore\n"
+        "store = SharedMemoryRateLimitStore(sys.argv[1], slots=64, run_ttl_sec=300.0)\n"
+        "assert asyncio.run(store.acquire('runs:instance', 1))\n"
+    )
+    gateway_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # The worker exits mid-run, without releasing
+    subprocess.run([sys.executable, "-c", script, shm_path], cwd=gateway_dir, check=True)
+
+    assert await shm_store(shm_path).acquire("runs:instance", 1)
+
+
+@pytest.mark.asyncio
+async def test_shm_run_counts_expire(shm_path, clock):
+    store = shm_store(shm_path, run_ttl_sec=60.0)
+    assert await store.acquire("runs:instance", 1)
+    assert not await store.acquire("runs:instance", 1)
+
+    clock.offset = 62.0
+    assert await store.acquire("runs:instance", 1)
+
+
+@pytest.mark.asyncio
+async def test_shm_reuses_entries_of_idle_keys(shm_path, clock):
+    store = shm_store(shm_path, slots=4)
+    for key in ("rate:a", "rate:b", "rate:c", "runs:d"):
+        if key.startswith("rate"):
+            await store.take(key, rate=1.0, burst=1.0)
+        else:
+            assert await store.acquire(key, 1)
+
+    # Table full of keys that are not idle: the new key is not limited
+    assert await store.take("rate:e", rate=1.0, burst=1.0) == 0.0
+    assert await store.take("rate:e", rate=1.0, burst=1.0) == 0.0
+
+    # Once the buckets have refilled, the new key takes over an entry
+    clock.offset = 2.0
+    assert await store.take("rate:e", rate=1.0, burst=1.0) == 0.0
+    assert await store.take("rate:e", rate=1.0, burst=1.0) > 0
+    # The key with a running run kept its entry
+    assert not await store.acquire("runs:d", 1)
+
+
+@pytest.mark.asyncio
+async def test_shm_contended_lock_does_not_block_the_loop(shm_path, monkeypatch):
+    monkeypatch.setattr(store_module, "LOCK_TIMEOUT_SEC", 0.05)
+    store = shm_store(shm_path)
+    holder = os.open(shm_path, os.O_RDWR)
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    ticker = asyncio.create_task(tick())
+    try:
+        # Stays locked: gives up without limiting
+        assert await store.acquire("runs:instance", 0)
+        assert ticks > 1
+
+        # Unlocked while waiting: goes ahead
+        asyncio.get_running_loop().call_later(0.01, fcntl.flock, holder, fcntl.LOCK_UN)
+        assert not await store.acquire("runs:instance", 0)
+    finally:
+        ticker.cancel()
+        os.close(holder)
@@ -0,0 +1,182 @@
+"""Tests for run execution and its settlement."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import runs
+from app.auth import AuthContext
+from app.billing.client import AuthorizeResult, SettleResult, billing_client
+from app.routing.runner import RunResult, runner_client
+from app.upstream import UpstreamUnavailable
+
+INSTANCE_ID = "instance-1"
+
+
+@pytest.fixture
+def settlements(monkeypatch):
+    """Settlements sent to the Control Plane, as (usage, billable)."""
+    calls = []
+
+    async def settle(reservation_id, instance_id, usage=None, token=None, billable=True):
+        calls.append((usage, billable))
+        return SettleResult(debited=1 if billable else 0, balance=90, ledger_entry_id="", status="settled")
+
+    monkeypatch.setattr(billing_client, "settle", settle)
+    return calls
+
+
+@pytest.fixture
+def auth_result():
+    return AuthorizeResult(allowed=True, reservation_id="reservation-1", budget=10, balance=100)
+
+
+def run_request() -> runs.RunRequest:
+    return runs.RunRequest(instance_id=INSTANCE_ID, input=runs.RunInput(query="hi"))
+
+
+@pytest.mark.asyncio
+async def test_completed_run_settles_its_usage(monkeypatch, settlements, auth_result):
+    async def execute(**kwargs):
+        return RunResult(run_id=kwargs["run_id"], output_json=b'{"text":"ok"}', usage={"requests": 1, "tool_calls": 2})
+
+    monkeypatch.setattr(runner_client, "execute", execute)
+
+    response = await runs._complete_run("run-1", run_request(), auth_result)
+
+    assert response.status_code == 200
+    assert settlements == [({"requests": 1, "tool_calls": 2}, True)]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_after_dispatch_settles_one_request(monkeypatch, settlements, auth_result):
+    dispatched = asyncio.Event()
+
+    async def execute(**kwargs):
+        dispatched.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(runner_client, "execute", execute)
+
+    run = asyncio.create_task(runs._complete_run("run-1", run_request(), auth_result))
+    await dispatched.wait()
+    run.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await run
+
+    assert settlements == [({"requests": 1}, True)]
+
+
+@pytest.mark.asyncio
+async def test_runner_failure_is_not_billed(monkeypatch, settlements, auth_result):
+    async def execute(**kwargs):
+        raise RuntimeError("flow crashed")
+
+    monkeypatch.setattr(runner_client, "execute", execute)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await runs._complete_run("run-1", run_request(), auth_result)
+
+    assert exc_info.value.status_code == 502
+    assert settlements == [(None, False)]
+
+
+@pytest.mark.asyncio
+async def test_run_rejected_upstream_is_not_billed(monkeypatch, settlements, auth_result):
+    async def execute(**kwargs):
+        raise UpstreamUnavailable("runner", "circuit_open", 5.0)
+
+    monkeypatch.setattr(runner_client, "execute", execute)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await runs._complete_run("run-1", run_request(), auth_result)
+
+    assert exc_info.value.status_code == 503
+    assert settlements == [(None, False)]
+
+
+@pytest.fixture
+def authorizations(monkeypatch, auth_result):
+    """Budgets authorized with the Control Plane."""
+    budgets = []
+
+    async def authorize(instance_id, requested_budget=0, token=None):
+        budgets.append(requested_budget)
+        return auth_result
+
+    monkeypatch.setattr(billing_client, "authorize", authorize)
+    return budgets
+
+
+def batch_request(size: int) -> runs.RunBatchRequest:
+    return runs.RunBatchRequest(
+        instance_id=INSTANCE_ID,
+        inputs=[runs.RunInput(query=str(index)) for index in range(size)],
+    )
+
+
+def api_key_auth(instance_id: str = INSTANCE_ID) -> AuthContext:
+    return AuthContext(auth_type="api_key", instance_id=instance_id, key_id="key-1")
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_results_in_completion_order(monkeypatch, settlements, authorizations):
+    finish_order = [2, 0, 1]
+    finished = {index: asyncio.Event() for index in finish_order}
+
+    async def execute(**kwargs):
+        index = int(kwargs["input_data"]["query"])
+        position = finish_order.index(index)
+        if position > 0:
+            await finished[finish_order[position - 1]].wait()
+        finished[index].set()
+        return RunResult(run_id=kwargs["run_id"], output_json=b'{"text":"ok"}', usage={"requests": 1, "tool_calls": index})
+
+    monkeypatch.setattr(runner_client, "execute", execute)
+
+    response = await runs.batch_run(batch_request(3), api_key_auth())
+    lines = [json.loads(line) async for line in response.body_iterator]
+
+    assert [line["index"] for line in lines[:-1]] == finish_order
+    assert all(line["status"] == "succeeded" for line in lines[:-1])
+    summary = lines[-1]
+    assert (summary["type"], summary["succeeded"], summary["failed"]) == ("summary", 3, 0)
+    assert authorizations == [runs.RUN_BUDGET * 3]
+    assert settlements == [({"requests": 3, "tool_calls": 3}, True)]
+
+
+@pytest.mark.asyncio
+async def test_batch_disconnect_cancels_remaining_items(monkeypatch, settlements, authorizations):
+    cancelled = []
+
+    async def execute(**kwargs):
+        if kwargs["input_data"]["query"] == "0":
+            return RunResult(run_id=kwargs["run_id"], output_json=b'{"text":"ok"}', usage={"requests": 1})
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(kwargs["input_data"]["query"])
+            raise
+
+    monkeypatch.setattr(runner_client, "execute", execute)
+
+    response = await runs.batch_run(batch_request(3), api_key_auth())
+    body = response.body_iterator
+    assert json.loads(await body.__anext__())["index"] == 0
+    await body.aclose()  # Client went away
+    await asyncio.sleep(0)
+
+    assert sorted(cancelled) == ["1", "2"]
+    assert settlements == [({"requests": 1}, True)]
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_credentials_of_another_instance(settlements, authorizations):
+    with pytest.raises(HTTPException) as exc_info:
+        await runs.batch_run(batch_request(1), api_key_auth("instance-2"))
+
+    assert exc_info.value.status_code == 403
+    assert authorizations == []
+    assert settlements == []
@@ -0,0 +1,117 @@
+"""Tests for weighted fair admission of runs."""
+
+import asyncio
+
+import pytest
+
+from app.billing.plans import InstancePlan
+from app.config import settings
+from app.routing import scheduler as scheduler_module
+from app.routing.scheduler import RunScheduler, parse_tier_weights
+from app.upstream import AIMDLimiter, UpstreamUnavailable
+
+# instance -> (org, tier)
+INSTANCES = {
+    "free-instance": ("org-free", "free"),
+    "other-free-instance": ("org-free-2", "free"),
+    "pro-instance": ("org-pro", "pro"),
+    "holder-instance": ("org-holder", "free"),
+}
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    async def get_plan(instance_id):
+        org_id, tier = INSTANCES[instance_id]
+        return InstancePlan(instance_id=instance_id, org_id=org_id, plan=tier, tier=tier, limits={})
+
+    monkeypatch.setattr(settings, "run_scheduler_enabled", True)
+    monkeypatch.setattr(scheduler_module.instance_plans, "get", get_plan)
+    limiter = AIMDLimiter("test-runner", initial=1, min_limit=1, max_limit=1)
+    return RunScheduler(limiter=limiter, tier_weights={"free": 1.0, "pro": 4.0})
+
+
+async def run(scheduler: RunScheduler, instance_id: str, order: list) -> None:
+    async with scheduler.slot(instance_id):
+        order.append(INSTANCES[instance_id][0])
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_backlogged_orgs_share_slots_by_weight(scheduler):
+    """While both orgs are queued, weight 4 gets four slots per slot of weight 1."""
+    order = []
+    holder_done = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("holder-instance"):
+            await holder_done.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    runs = []
+    for _ in range(5):
+        runs.append(asyncio.create_task(run(scheduler, "free-instance", order)))
+        runs.append(asyncio.create_task(run(scheduler, "pro-instance", order)))
+    await asyncio.sleep(0)
+
+    holder_done.set()
+    await asyncio.gather(holder, *runs)
+
+    assert order[:5].count("org-pro") == 4
+    assert order[-3:] == ["org-free"] * 3
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_does_not_queue_other_orgs_behind_it(scheduler):
+    """With equal weights, another org's run goes next rather than after the batch."""
+    order = []
+    holder_done = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("holder-instance"):
+            await holder_done.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    runs = [asyncio.create_task(run(scheduler, "free-instance", order)) for _ in range(4)]
+    runs.append(asyncio.create_task(run(scheduler, "other-free-instance", order)))
+    await asyncio.sleep(0)
+
+    holder_done.set()
+    await asyncio.gather(holder, *runs)
+
+    assert order == ["org-free", "org-free-2", "org-free", "org-free", "org-free"]
+
+
+@pytest.mark.asyncio
+async def test_full_org_queue_is_rejected(scheduler, monkeypatch):
+    """Runs beyond run_queue_max_per_org are rejected, not queued."""
+    monkeypatch.setattr(settings, "run_queue_max_per_org", 1)
+    holder_done = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("holder-instance"):
+            await holder_done.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(run(scheduler, "pro-instance", []))
+    await asyncio.sleep(0)
+
+    with pytest.raises(UpstreamUnavailable):
+        await run(scheduler, "pro-instance", [])
+
+    holder_done.set()
+    await asyncio.gather(holder, queued)
+
+
+def test_parse_tier_weights():
+    assert parse_tier_weights("free:1, pro:4") == {"free": 1.0, "pro": 4.0}
+    with pytest.raises(ValueError):
+        parse_tier_weights("free")
+    with pytest.raises(ValueError):
+        parse_tier_weights("free:0")
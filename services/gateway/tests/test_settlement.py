@@ -0,0 +1,135 @@
+"""Tests for batched settlement and its local spool."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.billing import settlement as settlement_module
+from app.billing.client import SettleResult
+from app.billing.settlement import SettlementQueue
+from app.config import settings
+
+
+class FakeBillingClient:
+    """Records settle batches; fails while ``down``, or hangs while ``hang`` is set."""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+        self.inline: list[str] = []
+        self.down = False
+        self.fail_after: int | None = None  # Fail once this many batches went through
+        self.hang = False
+        self.called = asyncio.Event()
+
+    async def settle_batch(self, items: list[dict]) -> list[dict]:
+        self.called.set()
+        if self.hang:
+            await asyncio.Event().wait()
+        if self.down or (self.fail_after is not None and len(self.batches) >= self.fail_after):
+            raise httpx.ConnectError("connection refused")
+        self.batches.append([item["reservation_id"] for item in items])
+        return [{"reservation_id": item["reservation_id"], "status": "settled"} for item in items]
+
+    async def settle(self, reservation_id, instance_id, usage=None, token=None, billable=True):
+        self.inline.append(reservation_id)
+        return SettleResult(debited=1, balance=99, ledger_entry_id="entry", status="settled")
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    path = tmp_path / "settlements.jsonl"
+    monkeypatch.setattr(settings, "settlement_spool_path", str(path))
+    monkeypatch.setattr(settings, "settlement_batch_size", 2)
+    monkeypatch.setattr(settings, "settlement_flush_interval_sec", 0.01)
+    monkeypatch.setattr(settings, "settlement_max_retries", 1)  # No backoff
+    return path
+
+
+def spooled(path) -> list[str]:
+    return [json.loads(line)["reservation_id"] for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_spooled_and_replayed(spool):
+    client = FakeBillingClient()
+    client.down = True
+    queue = SettlementQueue(client=client)
+
+    await queue._flush([settlement_module.PendingSettlement("r1", "i1", {"requests": 1})])
+    assert spooled(spool) == ["r1"]
+
+    # Replayed once the Control Plane is back, before new settlements
+    client.down = False
+    queue.start()
+    queue.submit("r2", "i1", {"requests": 1})
+    for _ in range(100):
+        if len(client.batches) == 2:
+            break
+        await asyncio.sleep(0.01)
+    await queue.aclose()
+
+    assert client.batches == [["r1"], ["r2"]]
+    assert not spool.exists()
+
+
+@pytest.mark.asyncio
+async def test_partial_replay_keeps_unsent_settlements(spool):
+    client = FakeBillingClient()
+    client.down = True
+    queue = SettlementQueue(client=client)
+    await queue._flush([
+        settlement_module.PendingSettlement(f"r{index}", "i1") for index in range(1, 4)
+    ])
+
+    client.down = False
+    client.fail_after = 1
+    await queue._replay_spool()
+
+    assert client.batches == [["r1", "r2"]]
+    assert spooled(spool) == ["r3"]
+
+
+@pytest.mark.asyncio
+async def test_batch_in_flight_at_shutdown_is_flushed_again(spool):
+    client = FakeBillingClient()
+    client.hang = True
+    queue = SettlementQueue(client=client)
+    queue.start()
+    queue.submit("r1", "i1", {"requests": 1}, billable=False)
+
+    await asyncio.wait_for(client.called.wait(), 1.0)
+    client.hang = False
+    await queue.aclose()
+
+    # Settling is idempotent per reservation, so resending is safe
+    assert client.batches == [["r1"]]
+    assert not spool.exists()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_spools_what_cannot_be_flushed(spool):
+    client = FakeBillingClient()
+    client.down = True
+    queue = SettlementQueue(client=client)
+    for index in range(3):
+        queue.submit(f"r{index}", "i1")
+
+    await queue.aclose()
+
+    assert spooled(spool) == ["r0", "r1", "r2"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_settles_inline(spool, monkeypatch):
+    monkeypatch.setattr(settings, "settlement_queue_size", 1)
+    client = FakeBillingClient()
+    queue = SettlementQueue(client=client)
+
+    queued = await queue.settle("r1", "i1", {"requests": 1}, budget=10, balance=100)
+    unbilled = await queue.settle("r2", "i1", None, budget=10, balance=100, billable=False)
+
+    assert (queued.debited, queued.status) == (10, "pending_reconciliation")
+    assert unbilled.status == "settled"
+    assert client.inline == ["r2"]
@@ -0,0 +1,169 @@
+"""Tests for upstream circuit breakers and adaptive concurrency limits."""
+
+import httpx
+import pytest
+
+from app.upstream import guard as guard_module
+from app.upstream.guard import (
+    DECREASE_COOLDOWN_SEC,
+    AIMDLimiter,
+    CircuitBreaker,
+    UpstreamGuard,
+    UpstreamUnavailable,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock advanced by hand."""
+
+    class Clock:
+        now = 1000.0
+
+        def __call__(self) -> float:
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(guard_module.time, "monotonic", clock)
+    return clock
+
+
+def make_guard(failure_threshold: int = 3, initial_limit: int = 10) -> UpstreamGuard:
+    return UpstreamGuard(
+        "test",
+        breaker=CircuitBreaker("test", failure_threshold, reset_timeout_sec=5.0),
+        limiter=AIMDLimiter("test", initial=initial_limit, min_limit=1, max_limit=20),
+    )
+
+
+def server_error() -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "http://upstream/")
+    response = httpx.Response(503, request=request)
+    return httpx.HTTPStatusError("unavailable", request=request, response=response)
+
+
+async def fail(guard: UpstreamGuard) -> None:
+    with pytest.raises(httpx.HTTPStatusError):
+        async with guard.call():
+            raise server_error()
+
+
+async def succeed(guard: UpstreamGuard) -> None:
+    async with guard.call():
+        pass
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_consecutive_failures(clock):
+    guard = make_guard(failure_threshold=3)
+
+    await fail(guard)
+    await fail(guard)
+    await succeed(guard)  # Resets the count
+    for _ in range(3):
+        await fail(guard)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(UpstreamUnavailable) as exc_info:
+        await succeed(guard)
+    assert exc_info.value.reason == "circuit_open"
+    assert exc_info.value.retry_after_header == "5"
+
+
+@pytest.mark.asyncio
+async def test_half_open_circuit_lets_one_trial_through(clock):
+    guard = make_guard(failure_threshold=1)
+    await fail(guard)
+
+    clock.now += 5.0
+    async with guard.call():
+        assert guard.breaker.state == CircuitBreaker.HALF_OPEN
+        # Only the trial call is let through
+        with pytest.raises(UpstreamUnavailable):
+            await succeed(guard)
+
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    await succeed(guard)
+
+
+@pytest.mark.asyncio
+async def test_failed_trial_reopens_the_circuit(clock):
+    guard = make_guard(failure_threshold=3)
+    for _ in range(3):
+        await fail(guard)
+
+    clock.now += 5.0
+    await fail(guard)
+
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(UpstreamUnavailable):
+        await succeed(guard)
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_count_as_failures(clock):
+    guard = make_guard(failure_threshold=1)
+    request = httpx.Request("GET", "http://upstream/")
+    not_found = httpx.HTTPStatusError(
+        "not found", request=request, response=httpx.Response(404, request=request)
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        async with guard.call():
+            raise not_found
+
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_calls_beyond_the_limit_are_rejected(clock):
+    guard = make_guard(initial_limit=2)
+
+    async with guard.call():
+        async with guard.call():
+            with pytest.raises(UpstreamUnavailable) as exc_info:
+                await succeed(guard)
+    assert exc_info.value.reason == "concurrency_limit"
+    assert guard.limiter.in_flight == 0
+
+
+def test_limit_decreases_multiplicatively_once_per_cooldown(clock):
+    limiter = AIMDLimiter("test", initial=10, min_limit=2, max_limit=20, backoff_ratio=0.5)
+
+    for _ in range(3):
+        assert limiter.try_acquire()
+        limiter.release(False, 0.1)
+    assert limiter.limit == 5
+
+    clock.now += DECREASE_COOLDOWN_SEC
+    limiter.try_acquire()
+    limiter.release(False, 0.1)
+    assert limiter.limit == 2.5
+
+    clock.now += DECREASE_COOLDOWN_SEC
+    limiter.try_acquire()
+    limiter.release(False, 0.1)
+    assert limiter.limit == 2  # Floor
+
+
+def test_limit_grows_additively_only_when_used(clock):
+    limiter = AIMDLimiter("test", initial=4, min_limit=1, max_limit=20)
+
+    # One call in flight out of 4 does not use the limit
+    limiter.try_acquire()
+    limiter.release(True, 0.1)
+    assert limiter.limit == 4
+
+    for _ in range(2):
+        limiter.try_acquire()
+    limiter.release(True, 0.1)
+    assert limiter.limit == 4.25
+
+
+def test_slow_calls_shrink_the_limit(clock):
+    limiter = AIMDLimiter("test", initial=10, min_limit=1, max_limit=20, latency_target_sec=0.5)
+
+    limiter.try_acquire()
+    limiter.release(True, 2.0)
+
+    assert limiter.limit == 9
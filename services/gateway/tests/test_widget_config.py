@@ -0,0 +1,83 @@
+"""Tests for the widget config cache."""
+
+import httpx
+import pytest
+
+from app.billing.client import BillingClient
+from app.config import settings
+from app.widget.config_cache import WidgetConfigCache
+
+
+class FakeControlPlane:
+    """Serves widget configs, or fails with ``status`` when set."""
+
+    def __init__(self):
+        self.branding = {"brand_name": "Acme"}
+        self.status = 200
+        self.requests = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.status != 200:
+            return httpx.Response(self.status)
+        instance_id = request.url.path.split("/")[2]
+        return httpx.Response(200, json={
+            "instance_id": instance_id,
+            "branding": self.branding,
+            "allowed_origins": ["https://*.acme.com"],
+        })
+
+
+@pytest.fixture
+def control_plane():
+    return FakeControlPlane()
+
+
+@pytest.fixture
+def cache(control_plane):
+    client = BillingClient()
+    client._client = httpx.AsyncClient(
+        base_url="http://control-plane",
+        transport=httpx.MockTransport(control_plane.handle),
+    )
+    return WidgetConfigCache(client=client)
+
+
+@pytest.mark.asyncio
+async def test_config_is_loaded_once_per_ttl(cache, control_plane):
+    config = await cache.get("instance-1")
+    assert config.branding.brand_name == "Acme"
+    assert config.origins.matches("https://shop.acme.com")
+
+    assert await cache.get("instance-1") is config
+    assert control_plane.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_instances_are_cached_as_none(cache, control_plane):
+    control_plane.status = 404
+
+    assert await cache.get("missing") is None
+    assert await cache.get("missing") is None
+    assert control_plane.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reloads_the_config(cache, control_plane):
+    await cache.get("instance-1")
+    control_plane.branding = {"brand_name": "Acme 2"}
+
+    assert cache.invalidate("instance-1")
+    assert (await cache.get("instance-1")).branding.brand_name == "Acme 2"
+    assert control_plane.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_last_config_is_served_while_control_plane_fails(cache, control_plane, monkeypatch):
+    monkeypatch.setattr(settings, "widget_config_cache_ttl_sec", -1.0)
+    config = await cache.get("instance-1")
+
+    control_plane.status = 500
+    assert await cache.get("instance-1") is config
+    with pytest.raises(httpx.HTTPStatusError):
+        await cache.get("instance-2")
@@ -0,0 +1,112 @@
+"""Tests for widget session tokens."""
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth import widget_token
+from app.auth.widget_token import WidgetTokenAuth, WidgetTokenClaims, WidgetTokenSigner
+from app.config import settings
+
+ORIGIN = "https://shop.example.com"
+
+
+@pytest.fixture
+def signer():
+    return WidgetTokenSigner({"k1": b"secret-one"})
+
+
+def test_issued_token_verifies(signer):
+    token, claims = signer.issue("instance-1", ORIGIN, ttl_sec=60)
+
+    assert token.startswith("wt1.k1.")
+    assert signer.verify(token) == claims
+    assert claims.instance_id == "instance-1"
+    assert claims.origin == ORIGIN
+
+
+def test_token_verifies_in_another_process_with_the_same_keyring(signer):
+    token, claims = signer.issue("instance-1", ORIGIN, ttl_sec=60)
+
+    assert WidgetTokenSigner({"k1": b"secret-one"}).verify(token) == claims
+
+
+def test_rotated_keyring_verifies_old_tokens_and_signs_with_new_key(signer):
+    old_token, old_claims = signer.issue("instance-1", ORIGIN, ttl_sec=60)
+    rotated = WidgetTokenSigner({"k2": b"secret-two", "k1": b"secret-one"})
+
+    assert rotated.verify(old_token) == old_claims
+    new_token, _ = rotated.issue("instance-1", ORIGIN, ttl_sec=60)
+    assert new_token.startswith("wt1.k2.")
+
+    with pytest.raises(ValueError, match="unknown signing key"):
+        signer.verify(new_token)
+    with pytest.raises(ValueError, match="unknown signing key"):
+        WidgetTokenSigner({"k2": b"secret-two"}).verify(old_token)
+
+
+def test_expired_token_is_rejected(signer):
+    token, _ = signer.issue("instance-1", ORIGIN, ttl_sec=-1)
+
+    with pytest.raises(ValueError, match="expired"):
+        signer.verify(token)
+
+
+def test_tampered_payload_is_rejected(signer):
+    token, _ = signer.issue("instance-1", ORIGIN, ttl_sec=60)
+    other, _ = signer.issue("instance-2", ORIGIN, ttl_sec=60)
+    version, kid, _, signature = token.split(".")
+    other_payload = other.split(".")[2]
+
+    with pytest.raises(ValueError, match="bad signature"):
+        signer.verify(f"{version}.{kid}.{other_payload}.{signature}")
+    with pytest.raises(ValueError, match="bad signature"):
+        WidgetTokenSigner({"k1": b"other-secret"}).verify(token)
+    with pytest.raises(ValueError, match="malformed"):
+        signer.verify("wt1.k1.payload")
+
+
+def test_unset_keyring_fails_closed(monkeypatch):
+    monkeypatch.setattr(settings, "widget_token_keys", "")
+    monkeypatch.setattr(settings, "widget_token_ephemeral_key", False)
+
+    with pytest.raises(ValueError, match="widget_token_keys must be set"):
+        widget_token._create_signer()
+
+    monkeypatch.setattr(settings, "widget_token_ephemeral_key", True)
+    assert widget_token._create_signer().signing_kid == "ephemeral"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/claims")
+    async def claims(claims: WidgetTokenClaims = Depends(WidgetTokenAuth())):
+        return {"instance_id": claims.instance_id}
+
+    return TestClient(app)
+
+
+def test_auth_accepts_token_from_its_origin(client):
+    token, _ = widget_token.widget_token_signer.issue("instance-1", ORIGIN, ttl_sec=60)
+
+    response = client.get("/claims", headers={"X-Widget-Token": token, "Origin": ORIGIN})
+
+    assert response.status_code == 200
+    assert response.json() == {"instance_id": "instance-1"}
+
+
+def test_auth_rejects_other_origin(client):
+    token, _ = widget_token.widget_token_signer.issue("instance-1", ORIGIN, ttl_sec=60)
+
+    response = client.get(
+        "/claims", headers={"X-Widget-Token": token, "Origin": "https://evil.example.com"}
+    )
+
+    assert response.status_code == 403
+
+
+def test_auth_rejects_missing_and_invalid_tokens(client):
+    assert client.get("/claims").status_code == 401
+    assert client.get("/claims", headers={"X-Widget-Token": "wt1.x.y.z"}).status_code == 401
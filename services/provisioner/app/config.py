@@ -18,6 +18,14 @@ class Settings(BaseSettings):
     saleor_api_url: str = "http://cmp-commerce-api:8000/graphql/"
     saleor_webhook_secret: str = ""
 
+    # Event loop monitoring: lag is sampled every loop_monitor_interval_sec
+    # and the loop thread's stack is logged when it is blocked for longer
+    # than loop_slow_callback_sec (0 disables). While the lag exceeds
+    # loop_lag_shed_threshold_sec, new requests get 503 (0 disables).
+    loop_monitor_interval_sec: float = 0.1
+    loop_slow_callback_sec: float = 0.25
+    loop_lag_shed_threshold_sec: float = 0.0
+
     class Config:
         env_prefix = ""
         case_sensitive = False
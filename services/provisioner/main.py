@@ -2,9 +2,11 @@
 
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
 from app.config import settings
+from app.loop_monitor import LoadSheddingMiddleware, loop_monitor
 from app.webhooks import saleor_router
 
 # Configure logging
@@ -21,6 +23,9 @@ app = FastAPI(
     version="0.1.0",
 )
 
+# Reject new requests with 503 while the event loop lags
+app.add_middleware(LoadSheddingMiddleware)
+
 # Include routers
 app.include_router(saleor_router)
 
@@ -31,12 +36,23 @@ async def health_check():
     return {"status": "healthy", "service": "provisioner"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose Prometheus metrics."""
+    return Response(
+        content=generate_latest(REGISTRY),
+        media_type=CONTENT_TYPE_LATEST,
+    )
+
+
 @app.on_event("startup")
 async def startup():
     logger.info("Provisioner service starting...")
+    loop_monitor.start()
     logger.info(f"Control Plane URL: {settings.control_plane_url}")
 
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Provisioner service shutting down...")
+    await loop_monitor.aclose()
@@ -1,3 +1,4 @@
+from .metrics import router as metrics_router
 from .run import router as run_router
 
-__all__ = ["run_router"]
+__all__ = ["metrics_router", "run_router"]
@@ -1,19 +1,34 @@
 """Run API endpoint - Gateway calls this to execute agent runs."""
 
+import asyncio
+import json
 import logging
 import uuid
-from typing import Any, Optional
+from dataclasses import dataclass
+from typing import Any, Awaitable, Optional, TypeVar
 
-from fastapi import APIRouter, HTTPException, status
+import httpx
+import orjson
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.config import settings
 from app.langflow import langflow_client
+from app.tracing import set_run_attributes
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["run"])
 
+T = TypeVar("T")
+
+# Accept type of Gateways taking the bare output as the body, with the run
+# ID and usage in headers (no envelope to parse around a large output)
+OUTPUT_MEDIA_TYPE = "application/vnd.cmp.run-output+json"
+RUN_ID_HEADER = "X-CMP-Run-Id"
+USAGE_HEADER = "X-CMP-Usage"
+
 
 class RunRequest(BaseModel):
     """Request from Gateway to execute a run."""
@@ -21,6 +36,7 @@ class RunRequest(BaseModel):
     instance_id: str
     input: dict[str, Any]
     metadata: Optional[dict[str, Any]] = None
+    run_id: Optional[str] = None  # Gateway's run ID, reused for correlation
 
 
 class RunResponse(BaseModel):
@@ -31,21 +47,18 @@ class RunResponse(BaseModel):
     usage: dict[str, int]
 
 
-@router.post("/run", response_model=RunResponse)
-async def execute_run(request: RunRequest):
-    """
-    Execute an agent run.
+@dataclass
+class FlowInvocation:
+    """Langflow call parameters derived from a run request."""
 
-    Called by Gateway after billing authorization.
-    Flow:
-    1. Look up instance -> offering -> flow_id mapping (from metadata or CP)
-    2. Fetch flow artifact from storage (optional, if needed)
-    3. Call Langflow Runtime with the flow
-    4. Return response with usage metrics
-    """
-    run_id = str(uuid.uuid4())
-    logger.info(f"Executing run {run_id} for instance {request.instance_id}")
+    flow_id: str
+    query: str
+    session_id: Optional[str]
+    tweaks: Optional[dict[str, Any]]
 
+
+def _prepare_invocation(request: RunRequest) -> FlowInvocation:
+    """Resolve the flow, query and runtime tweaks for a run request."""
     # Extract input
     input_data = request.input
     query = input_data.get("query", "")
@@ -79,13 +92,117 @@ async def execute_run(request: RunRequest):
         # The component ID pattern is OpenAIModelComponent-*
         tweaks["OpenAI"] = {"api_key": settings.openai_api_key}
 
+    return FlowInvocation(
+        flow_id=flow_id,
+        query=query,
+        session_id=session_id,
+        tweaks=tweaks if tweaks else None,
+    )
+
+
+def _usage() -> dict[str, int]:
+    """Build usage metrics for a completed run."""
+    # In production, parse from Langflow response
+    # Langflow doesn't provide token counts directly, so we estimate or get from callbacks
+    return {
+        "llm_tokens_in": 0,
+        "llm_tokens_out": 0,
+        "tool_calls": 0,
+        "requests": 1,
+    }
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _run_timeout(timeout_ms: Optional[int]) -> float:
+    """Seconds left for a run: the Gateway's budget, capped by langflow_timeout."""
+    if timeout_ms is None:
+        return settings.langflow_timeout
+    return min(settings.langflow_timeout, timeout_ms / 1000)
+
+
+async def _until_disconnected(http_request: Request, work: Awaitable[T]) -> T:
+    """Await ``work``, cancelling it if the Gateway disconnects first."""
+    task = asyncio.ensure_future(work)
+
+    async def disconnected() -> None:
+        # The body was read already, so the next message is the disconnect
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.create_task(disconnected())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    if task.cancelled():
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return task.result()
+
+
+@router.post("/run", response_model=RunResponse)
+async def execute_run(
+    request: RunRequest,
+    http_request: Request,
+    x_cmp_timeout_ms: Optional[int] = Header(default=None),
+    accept: Optional[str] = Header(default=None),
+):
+    """
+    Execute an agent run.
+
+    Called by Gateway after billing authorization.
+    Flow:
+    1. Look up instance -> offering -> flow_id mapping (from metadata or CP)
+    2. Fetch flow artifact from storage (optional, if needed)
+    3. Call Langflow Runtime with the flow
+    4. Return response with usage metrics
+
+    The Langflow call is bounded by the time left in X-CMP-Timeout-Ms
+    (504 when it runs out) and cancelled if the Gateway disconnects.
+
+    If the Gateway accepts OUTPUT_MEDIA_TYPE, the body is the output
+    ({"text", "data"}) alone and the run ID and usage are sent in the
+    X-CMP-Run-Id and X-CMP-Usage headers.
+    """
+    run_id = request.run_id or str(uuid.uuid4())
+    set_run_attributes(run_id, request.instance_id)
+    logger.info(f"Executing run {run_id} for instance {request.instance_id}")
+
+    invocation = _prepare_invocation(request)
+    timeout = _run_timeout(x_cmp_timeout_ms)
+    if timeout <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Run deadline exceeded",
+        )
+
     # Execute via Langflow
     try:
-        result = await langflow_client.run_flow(
-            flow_id=flow_id,
-            input_value=query,
-            session_id=session_id,
-            tweaks=tweaks if tweaks else None,
+        result = await _until_disconnected(
+            http_request,
+            langflow_client.run_flow(
+                flow_id=invocation.flow_id,
+                input_value=invocation.query,
+                session_id=invocation.session_id,
+                tweaks=invocation.tweaks,
+                timeout=timeout,
+            ),
+        )
+    except HTTPException:
+        logger.info(f"Run {run_id} cancelled, Gateway disconnected")
+        raise
+    except (TimeoutError, httpx.TimeoutException):
+        logger.warning(f"Run {run_id} passed its deadline")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Run deadline exceeded",
         )
     except Exception as e:
         logger.error(f"Langflow execution failed: {e}")
@@ -94,21 +211,92 @@ async def execute_run(request: RunRequest):
             detail=f"Agent execution failed: {str(e)}",
         )
 
-    # Build usage metrics (in production, parse from Langflow response)
-    # Langflow doesn't provide token counts directly, so we estimate or get from callbacks
-    usage = {
-        "llm_tokens_in": 0,
-        "llm_tokens_out": 0,
-        "tool_calls": 0,
-        "requests": 1,
-    }
-
     logger.info(f"Run {run_id} completed successfully")
 
+    if accept and OUTPUT_MEDIA_TYPE in accept:
+        # Encode Langflow's parsed output once, without model validation
+        return Response(
+            content=orjson.dumps({
+                "text": result.outputs.get("text"),
+                "data": result.outputs.get("data"),
+            }),
+            media_type=OUTPUT_MEDIA_TYPE,
+            headers={
+                RUN_ID_HEADER: run_id,
+                USAGE_HEADER: orjson.dumps(_usage()).decode(),
+            },
+        )
+
     return RunResponse(
         run_id=run_id,
         output=result.outputs,
-        usage=usage,
+        usage=_usage(),
+    )
+
+
+@router.post("/run:stream")
+async def stream_run(
+    request: RunRequest,
+    x_cmp_timeout_ms: Optional[int] = Header(default=None),
+):
+    """
+    Execute an agent run, relaying tokens as Server-Sent Events.
+
+    Events:
+    - token: {"chunk": "..."} for each generated chunk
+    - end: {"run_id", "output", "usage"} once the flow completes
+    - error: {"message": "..."} if the flow fails mid-stream or passes
+      the deadline in X-CMP-Timeout-Ms
+
+    The Langflow stream is closed as soon as the Gateway disconnects.
+    """
+    run_id = request.run_id or str(uuid.uuid4())
+    set_run_attributes(run_id, request.instance_id)
+    logger.info(f"Streaming run {run_id} for instance {request.instance_id}")
+
+    invocation = _prepare_invocation(request)
+    timeout = _run_timeout(x_cmp_timeout_ms)
+
+    async def events():
+        try:
+            async for event in langflow_client.stream_flow(
+                flow_id=invocation.flow_id,
+                input_value=invocation.query,
+                session_id=invocation.session_id,
+                tweaks=invocation.tweaks,
+                timeout=timeout,
+            ):
+                if event.event == "token":
+                    chunk = event.data.get("chunk", "")
+                    if chunk:
+                        yield _sse("token", {"chunk": chunk})
+                elif event.event == "error":
+                    message = event.data.get("error") or event.data.get("text") or ""
+                    logger.error(f"Langflow stream error in run {run_id}: {message}")
+                    yield _sse("error", {"message": f"Agent execution failed: {message}"})
+                    return
+                elif event.event == "end":
+                    logger.info(f"Run {run_id} stream completed successfully")
+                    yield _sse(
+                        "end",
+                        {
+                            "run_id": run_id,
+                            "output": event.data.get("outputs", {}),
+                            "usage": _usage(),
+                        },
+                    )
+                    return
+        except (TimeoutError, httpx.TimeoutException):
+            logger.warning(f"Run {run_id} passed its deadline")
+            yield _sse("error", {"message": "Run deadline exceeded"})
+        except Exception as e:
+            logger.error(f"Langflow stream failed: {e}")
+            yield _sse("error", {"message": f"Agent execution failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
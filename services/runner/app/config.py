@@ -30,6 +30,19 @@ class Settings(BaseSettings):
     langflow_timeout: int = 120
     control_plane_timeout: int = 10
 
+    # Tracing: span exporter ("none", "file" or "otlp")
+    tracing_exporter: str = "none"
+    tracing_file_path: str = "/tmp/cmp-runner-spans.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+
+    # Event loop monitoring: lag is sampled every loop_monitor_interval_sec
+    # and the loop thread's stack is logged when it is blocked for longer
+    # than loop_slow_callback_sec (0 disables). While the lag exceeds
+    # loop_lag_shed_threshold_sec, new requests get 503 (0 disables).
+    loop_monitor_interval_sec: float = 0.1
+    loop_slow_callback_sec: float = 0.25
+    loop_lag_shed_threshold_sec: float = 0.0
+
     class Config:
         env_prefix = ""
         case_sensitive = False
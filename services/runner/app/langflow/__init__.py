@@ -1,3 +1,3 @@
-from .client import LangflowClient, langflow_client
+from .client import LangflowClient, LangflowStreamEvent, langflow_client
 
-__all__ = ["LangflowClient", "langflow_client"]
+__all__ = ["LangflowClient", "LangflowStreamEvent", "langflow_client"]
@@ -1,15 +1,23 @@
 """Langflow Runtime client."""
 
+import asyncio
+import json
 import logging
-from dataclasses import dataclass
-from typing import Any, Optional
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional
 
 import httpx
+import orjson
 
 from app.config import settings
+from app.tracing import TracingTransport
 
 logger = logging.getLogger(__name__)
 
+# Time left for a run in milliseconds, decremented at every hop
+DEADLINE_HEADER = "X-CMP-Timeout-Ms"
+
 
 @dataclass
 class LangflowRunResult:
@@ -20,6 +28,20 @@ class LangflowRunResult:
     session_id: Optional[str] = None
 
 
+@dataclass
+class LangflowStreamEvent:
+    """A single event from a streaming Langflow run.
+
+    Langflow emits ``token`` events carrying a ``chunk`` of generated text,
+    ``add_message``/``end_vertex`` progress events, an ``error`` event on
+    failure and a final ``end`` event whose ``result`` holds the full run
+    response.
+    """
+
+    event: str
+    data: dict[str, Any] = field(default_factory=dict)
+
+
 class LangflowClient:
     """Client for Langflow Runtime API.
 
@@ -34,9 +56,12 @@ class LangflowClient:
         self.api_key = settings.langflow_api_key
         self.timeout = settings.langflow_timeout
 
-    def _headers(self) -> dict[str, str]:
-        """Build request headers."""
-        headers = {"Content-Type": "application/json"}
+    def _headers(self, timeout: float) -> dict[str, str]:
+        """Build request headers, passing the time left on."""
+        headers = {
+            "Content-Type": "application/json",
+            DEADLINE_HEADER: str(max(1, int(timeout * 1000))),
+        }
         if self.api_key:
             headers["x-api-key"] = self.api_key
         return headers
@@ -50,6 +75,7 @@ class LangflowClient:
         tweaks: Optional[dict[str, Any]] = None,
         session_id: Optional[str] = None,
         stream: bool = False,
+        timeout: Optional[float] = None,
     ) -> LangflowRunResult:
         """
         Execute a Langflow flow.
@@ -62,14 +88,133 @@ class LangflowClient:
             tweaks: Runtime parameter overrides
             session_id: Session ID for conversation continuity
             stream: Whether to stream LLM responses
+            timeout: Seconds left until the run's deadline (default:
+                langflow_timeout)
 
         Returns:
             LangflowRunResult with outputs and metadata
+
+        Raises:
+            TimeoutError: If the flow did not complete within ``timeout``
         """
         url = f"{self.base_url}/api/v1/run/{flow_id}"
         if stream:
             url += "?stream=true"
 
+        payload = self._build_payload(
+            input_value, input_type, output_type, tweaks, session_id
+        )
+
+        logger.info(f"Calling Langflow flow {flow_id}")
+        logger.debug(f"Payload: {payload}")
+
+        timeout = timeout or self.timeout
+        async with asyncio.timeout(timeout), httpx.AsyncClient(
+            timeout=timeout, transport=TracingTransport("langflow")
+        ) as client:
+            response = await client.post(
+                url,
+                json=payload,
+                headers=self._headers(timeout),
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+
+        result = self._parse_run_response(data)
+        logger.info(f"Langflow flow {flow_id} completed, run_id={result.run_id}")
+        return result
+
+    async def stream_flow(
+        self,
+        flow_id: str,
+        input_value: str,
+        input_type: str = "chat",
+        output_type: str = "chat",
+        tweaks: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[LangflowStreamEvent]:
+        """
+        Execute a Langflow flow and yield events as they are produced.
+
+        Args:
+            flow_id: The flow UUID or endpoint name
+            input_value: The input text/query
+            input_type: Type of input (chat, text, etc.)
+            output_type: Type of output (chat, text, etc.)
+            tweaks: Runtime parameter overrides
+            session_id: Session ID for conversation continuity
+            timeout: Seconds left until the run's deadline (default:
+                langflow_timeout)
+
+        Yields:
+            LangflowStreamEvent for each event. The final ``end`` event's
+            data is replaced by the parsed LangflowRunResult fields.
+
+        Raises:
+            TimeoutError: If the deadline passes before the flow completes
+        """
+        url = f"{self.base_url}/api/v1/run/{flow_id}?stream=true"
+        payload = self._build_payload(
+            input_value, input_type, output_type, tweaks, session_id
+        )
+
+        logger.info(f"Streaming Langflow flow {flow_id}")
+
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(timeout=timeout, transport=TracingTransport("langflow")) as client:
+            async with client.stream(
+                "POST",
+                url,
+                json=payload,
+                headers=self._headers(timeout),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Langflow flow {flow_id} passed its deadline")
+                    line = line.strip()
+                    if line.startswith("data:"):
+                        line = line[len("data:"):].strip()
+                    if not line:
+                        continue
+                    try:
+                        message = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.debug(f"Skipping non-JSON stream line: {line[:100]}")
+                        continue
+
+                    event = message.get("event", "")
+                    data = message.get("data") or {}
+
+                    if event == "end":
+                        result = self._parse_run_response(data.get("result") or {})
+                        logger.info(
+                            f"Langflow flow {flow_id} stream completed, "
+                            f"run_id={result.run_id}"
+                        )
+                        yield LangflowStreamEvent(
+                            event="end",
+                            data={
+                                "run_id": result.run_id,
+                                "outputs": result.outputs,
+                                "session_id": result.session_id,
+                            },
+                        )
+                        return
+
+                    yield LangflowStreamEvent(event=event, data=data)
+
+    def _build_payload(
+        self,
+        input_value: str,
+        input_type: str,
+        output_type: str,
+        tweaks: Optional[dict[str, Any]],
+        session_id: Optional[str],
+    ) -> dict[str, Any]:
+        """Build the run request payload."""
         payload: dict[str, Any] = {
             "input_value": input_value,
             "input_type": input_type,
@@ -81,19 +226,10 @@ class LangflowClient:
         if session_id:
             payload["session_id"] = session_id
 
-        logger.info(f"Calling Langflow flow {flow_id}")
-        logger.debug(f"Payload: {payload}")
+        return payload
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                url,
-                json=payload,
-                headers=self._headers(),
-            )
-            response.raise_for_status()
-            data = response.json()
-
-        # Parse Langflow response
+    def _parse_run_response(self, data: dict[str, Any]) -> LangflowRunResult:
+        """Parse a Langflow run response into a LangflowRunResult."""
         # Response format: {"outputs": [{"outputs": [{"results": {...}}]}]}
         outputs = {}
         result_session_id = None
@@ -120,8 +256,6 @@ class LangflowClient:
             # Try to get from session
             run_id = result_session_id or ""
 
-        logger.info(f"Langflow flow {flow_id} completed, run_id={run_id}")
-
         return LangflowRunResult(
             run_id=run_id,
             outputs=outputs,
@@ -131,7 +265,7 @@ class LangflowClient:
     async def health_check(self) -> bool:
         """Check if Langflow is healthy."""
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
+            async with httpx.AsyncClient(timeout=5, transport=TracingTransport("langflow")) as client:
                 response = await client.get(f"{self.base_url}/health")
                 return response.status_code == 200
         except Exception as e:
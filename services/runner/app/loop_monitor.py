@@ -0,0 +1,151 @@
+"""Event loop lag monitoring and load shedding.
+
+Every request of a worker shares one event loop, so a blocking call in any
+handler (sync I/O, CPU-heavy parsing) delays all of them. The monitor
+measures how late the loop runs a periodic timer, which is the delay every
+ready callback currently sees, and exports it as a metric. A watchdog
+thread logs the stack of the loop thread whenever the loop is stuck for
+longer than ``loop_slow_callback_sec``, pointing at the blocking call.
+
+With ``loop_lag_shed_threshold_sec`` set, new requests are rejected with
+503 while the lag is above it, so an overloaded worker degrades early
+instead of every queued request timing out together. Health, readiness and
+metrics endpoints are never shed.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = Histogram(
+    "runner_event_loop_lag_seconds",
+    "Delay of event loop timer callbacks",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_LAG_CURRENT = Gauge(
+    "runner_event_loop_lag_current_seconds",
+    "Latest event loop lag",
+)
+SLOW_CALLBACKS = Counter(
+    "runner_event_loop_slow_callbacks_total",
+    "Times the event loop was blocked for longer than loop_slow_callback_sec",
+)
+SHED_REQUESTS = Counter(
+    "runner_shed_requests_total",
+    "Requests rejected with 503 because of event loop lag",
+)
+
+# Paths served even while shedding
+UNSHED_PATHS = frozenset({"/health", "/ready", "/metrics"})
+
+
+class LoopMonitor:
+    """Samples the lag of the running event loop and watches for stalls."""
+
+    def __init__(self, interval_sec: float, slow_callback_sec: float):
+        self.interval_sec = interval_sec
+        self.slow_callback_sec = slow_callback_sec
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._lag = 0.0
+        self._due = 0.0  # time.monotonic() when the next sample is due
+
+    @property
+    def lag(self) -> float:
+        """Current lag: the latest sample, or more if the next one is overdue."""
+        if self._task is None:
+            return 0.0
+        return max(self._lag, time.monotonic() - self._due)
+
+    def start(self) -> None:
+        """Start sampling on the running loop (called on startup)."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._due = time.monotonic() + self.interval_sec
+        self._task = asyncio.create_task(self._sample())
+        if self.slow_callback_sec > 0:
+            self._stop.clear()
+            threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    async def aclose(self) -> None:
+        """Stop sampling and the watchdog."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sample(self) -> None:
+        """Measure how late each timer fires."""
+        while True:
+            self._due = time.monotonic() + self.interval_sec
+            await asyncio.sleep(self.interval_sec)
+            self._lag = max(0.0, time.monotonic() - self._due)
+            LOOP_LAG.observe(self._lag)
+            LOOP_LAG_CURRENT.set(self._lag)
+
+    def _watch(self) -> None:
+        """Log the loop thread's stack once per stall (watchdog thread)."""
+        reported_due = None
+        while not self._stop.wait(self.slow_callback_sec / 2):
+            due = self._due
+            if due == reported_due or time.monotonic() - due < self.slow_callback_sec:
+                continue
+            reported_due = due
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            SLOW_CALLBACKS.inc()
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                f"Event loop blocked for over {self.slow_callback_sec}s, "
+                f"loop thread stack:\n{stack}"
+            )
+
+
+# Process-wide monitor
+loop_monitor = LoopMonitor(settings.loop_monitor_interval_sec, settings.loop_slow_callback_sec)
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware rejecting new requests while the event loop lags."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        threshold = settings.loop_lag_shed_threshold_sec
+        if (
+            scope["type"] == "http"
+            and threshold > 0
+            and scope["path"] not in UNSHED_PATHS
+            and loop_monitor.lag > threshold
+        ):
+            SHED_REQUESTS.inc()
+            response = JSONResponse(
+                status_code=503,
+                content={
+                    "error": {
+                        "code": "overloaded",
+                        "message": "Service temporarily overloaded",
+                    }
+                },
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -4,8 +4,10 @@ import logging
 
 from fastapi import FastAPI
 
-from app.api import run_router
+from app.api import metrics_router, run_router
 from app.config import settings
+from app.loop_monitor import LoadSheddingMiddleware, loop_monitor
+from app.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
 
 # Configure logging
 logging.basicConfig(
@@ -21,13 +23,22 @@ app = FastAPI(
     version="0.1.0",
 )
 
+# Reject new requests with 503 while the event loop lags
+app.add_middleware(LoadSheddingMiddleware)
+
+# Continue the Gateway's trace for every request
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(run_router)
+app.include_router(metrics_router)
 
 
 @app.on_event("startup")
 async def startup():
     logger.info("Runner service starting...")
+    setup_tracing()
+    loop_monitor.start()
     logger.info(f"Langflow URL: {settings.langflow_url}")
     logger.info(f"Control Plane URL: {settings.control_plane_url}")
 
@@ -35,3 +46,5 @@ async def startup():
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Runner service shutting down...")
+    await loop_monitor.aclose()
+    shutdown_tracing()